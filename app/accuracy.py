@@ -0,0 +1,169 @@
+import bisect
+import threading
+
+# Market cap buckets in Cr as (label, upper bound); "small" matches the scorer's small-cap threshold
+MARKET_CAP_BUCKETS = [("small", 500), ("mid", 5000), ("large", None)]
+
+# GMP bands as % of the issue price, as (label, upper bound)
+GMP_BANDS = [("negative", 0), ("0-10%", 10), ("10-25%", 25), ("25-50%", 50), ("50%+", None)]
+
+UNKNOWN = "unknown"
+
+
+def _number(value):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if value != value else value
+
+
+def _bucket(buckets, value):
+    """Label of the bucket holding ``value`` (upper bounds are exclusive)"""
+    if value is None:
+        return UNKNOWN
+    bounds = [bound for _, bound in buckets[:-1]]
+    return buckets[bisect.bisect_right(bounds, value)][0]
+
+
+class _Aggregate:
+    """Running sums of one group of priced predictions"""
+
+    __slots__ = ("count", "abs_error", "error", "pct_error", "pct_count", "hits", "direction_count")
+
+    def __init__(self):
+        self.count = 0
+        self.abs_error = 0.0
+        self.error = 0.0
+        self.pct_error = 0.0
+        self.pct_count = 0
+        self.hits = 0
+        self.direction_count = 0
+
+    def add(self, contribution, sign=1):
+        error, pct_error, hit = contribution
+        self.count += sign
+        self.abs_error += sign * abs(error)
+        self.error += sign * error
+        if pct_error is not None:
+            self.pct_error += sign * pct_error
+            self.pct_count += sign
+        if hit is not None:
+            self.hits += sign * hit
+            self.direction_count += sign
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mae": round(self.abs_error / self.count, 4) if self.count else None,
+            "bias": round(self.error / self.count, 4) if self.count else None,
+            "mape": round(self.pct_error / self.pct_count, 4) if self.pct_count else None,
+            "hit_rate": round(self.hits / self.direction_count, 4) if self.direction_count else None
+        }
+
+
+class AccuracyTracker:
+    """
+    Running accuracy of logged predictions against actual listing prices.
+
+    Observes a ``PredictionLogStore`` (see ``add_observer``): whenever a row
+    gains, changes or loses its actual price, its previous contribution is
+    subtracted from the running sums and the new one added, so ``summary``
+    costs the same however long the history is.
+
+    Per priced prediction it tracks the error (predicted - actual in ₹), the
+    absolute percentage error against the actual price, and whether the
+    predicted and actual prices fall on the same side of the issue price
+    (directional hit). Figures are reported overall and by market-cap bucket
+    and GMP band (GMP as % of the issue price).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._contributions = {}
+        self._overall = _Aggregate()
+        self._by_market_cap = {label: _Aggregate() for label, _ in MARKET_CAP_BUCKETS + [(UNKNOWN, None)]}
+        self._by_gmp = {label: _Aggregate() for label, _ in GMP_BANDS + [(UNKNOWN, None)]}
+
+    @staticmethod
+    def _contribution(row):
+        """(market cap bucket, GMP band, (error, pct error, hit)) for a priced row, else None"""
+        actual = _number(row.get("actual_price"))
+        predicted = _number(row.get("predicted_price"))
+        if actual is None or predicted is None:
+            return None
+
+        issue = _number(row.get("issue_price"))
+        gmp = _number(row.get("gmp"))
+        gmp_pct = gmp / issue * 100 if gmp is not None and issue else None
+
+        error = predicted - actual
+        pct_error = abs(error) / actual * 100 if actual > 0 else None
+        hit = None
+        if issue:
+            hit = int((predicted > issue) == (actual > issue))
+        return (
+            _bucket(MARKET_CAP_BUCKETS, _number(row.get("market_cap"))),
+            _bucket(GMP_BANDS, gmp_pct),
+            (error, pct_error, hit)
+        )
+
+    def _add(self, row_id, row):
+        entry = self._contribution(row)
+        if entry is None:
+            return
+        self._contributions[row_id] = entry
+        market_cap_bucket, gmp_band, contribution = entry
+        self._overall.add(contribution)
+        self._by_market_cap[market_cap_bucket].add(contribution)
+        self._by_gmp[gmp_band].add(contribution)
+
+    def _remove(self, row_id):
+        entry = self._contributions.pop(row_id, None)
+        if entry is None:
+            return
+        market_cap_bucket, gmp_band, contribution = entry
+        self._overall.add(contribution, -1)
+        self._by_market_cap[market_cap_bucket].add(contribution, -1)
+        self._by_gmp[gmp_band].add(contribution, -1)
+
+    # ------------------------------------------------------------------
+    # Store observer
+    # ------------------------------------------------------------------
+
+    def load(self, rows):
+        """Recompute the sums from the store's ``{row_id: row}`` dict"""
+        with self._lock:
+            self._reset()
+            for row_id, row in rows.items():
+                self._add(row_id, row)
+
+    def apply(self, record, rows):
+        """Update the sums for the rows touched by one record"""
+        with self._lock:
+            if record["op"] == "insert":
+                self._add(record["id"], record["row"])
+                return
+            for row_id in record["ids"]:
+                row = rows.get(row_id)
+                if row is not None:
+                    self._remove(row_id)
+                    self._add(row_id, row)
+
+    def summary(self):
+        """
+        Get the accuracy figures.
+
+        Returns:
+            dict: ``overall`` plus ``by_market_cap`` and ``by_gmp_band`` groups,
+                each with count, mae and bias (₹), mape (%) and hit_rate (0-1)
+        """
+        with self._lock:
+            return {
+                "overall": self._overall.summary(),
+                "by_market_cap": {label: agg.summary() for label, agg in self._by_market_cap.items() if agg.count},
+                "by_gmp_band": {label: agg.summary() for label, agg in self._by_gmp.items() if agg.count}
+            }
@@ -0,0 +1,179 @@
+import os
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the batch size histogram buckets
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+# Upper bounds (seconds) of the queue wait histogram buckets
+WAIT_BUCKETS = (0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1)
+
+
+class MicroBatcher:
+    """
+    Background worker that coalesces concurrent calls into batches.
+
+    Items submitted within ``window`` seconds of the first pending one (or
+    until ``max_batch`` are queued) are handed to ``process`` together, and
+    each caller's future resolves to its own result. If a batch fails,
+    every caller in it sees the error, unless ``retry_items`` is set: then
+    its items are retried one at a time, so only the failing ones see it.
+    Only set it for a ``process`` without side effects, since a failure can
+    come after part of the work was done. Batch sizes and queue waits are
+    recorded for ``stats``.
+
+    Args:
+        process (callable): Function taking a list of items and returning one result per item
+        window (float): Seconds to wait for more items after the first arrives
+        max_batch (int): Maximum items per batch
+        name (str): Name of the worker thread, also used in log messages
+        retry_items (bool): Retry the items of a failed batch one at a time
+    """
+
+    def __init__(self, process, window=0.002, max_batch=256, name="micro-batcher", retry_items=False):
+        self.process = process
+        self.window = window
+        self.max_batch = max_batch
+        self.name = name
+        self.retry_items = retry_items
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self._batches = 0
+        self._items = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._size_counts = [0] * (len(BATCH_SIZE_BUCKETS) + 1)
+        self._wait_counts = [0] * (len(WAIT_BUCKETS) + 1)
+
+    def _ensure_started(self):
+        # Threads do not survive fork(), so each worker process starts its own
+        if self._pid == os.getpid() and self._thread is not None:
+            return
+        with self._start_lock:
+            if self._pid == os.getpid() and self._thread is not None:
+                return
+            self._queue = queue.Queue()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._pid = os.getpid()
+            self._reset_stats()
+            self._thread.start()
+
+    def submit(self, item):
+        """
+        Queue an item for the next batch.
+
+        Returns:
+            Future: Resolves to the item's result once its batch is processed
+        """
+        self._ensure_started()
+        future = Future()
+        self._queue.put((item, future, time.perf_counter()))
+        return future
+
+    def _collect(self):
+        pending = self._queue
+        batch = [pending.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(pending.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _record(self, batch, started):
+        with self._stats_lock:
+            self._batches += 1
+            self._items += len(batch)
+            self._size_counts[_bucket(BATCH_SIZE_BUCKETS, len(batch))] += 1
+            for _, _, submitted in batch:
+                wait = started - submitted
+                self._wait_total += wait
+                self._wait_max = max(self._wait_max, wait)
+                self._wait_counts[_bucket(WAIT_BUCKETS, wait)] += 1
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            self._record(batch, started)
+
+            try:
+                self._resolve(batch, self.process([item for item, _, _ in batch]))
+            except Exception as e:
+                if len(batch) == 1 or not self.retry_items:
+                    logger.error(f"Error processing {self.name} batch: {str(e)}")
+                    for _, future, _ in batch:
+                        future.set_exception(e)
+                    continue
+                # Retry each item on its own, so only the items that fail get the error
+                logger.warning(f"Error processing {self.name} batch of {len(batch)}, retrying items one by one: {str(e)}")
+                for entry in batch:
+                    try:
+                        self._resolve([entry], self.process([entry[0]]))
+                    except Exception as item_error:
+                        logger.error(f"Error processing {self.name} item: {str(item_error)}")
+                        entry[1].set_exception(item_error)
+
+    def _resolve(self, batch, results):
+        """
+        Hand each caller its result.
+
+        Raises:
+            RuntimeError: If ``process`` returned a different number of results
+                than items (no future is resolved then)
+        """
+        results = list(results)
+        if len(results) != len(batch):
+            raise RuntimeError(f"{self.name} returned {len(results)} results for {len(batch)} items")
+        for (_, future, _), result in zip(batch, results):
+            future.set_result(result)
+
+    def stats(self):
+        """
+        Get batching metrics for this process.
+
+        Returns:
+            dict: Batch and item counts, mean batch size, queue wait summary and
+                cumulative histograms keyed by bucket upper bound
+        """
+        with self._stats_lock:
+            return {
+                "batches": self._batches,
+                "items": self._items,
+                "mean_batch_size": round(self._items / self._batches, 2) if self._batches else 0.0,
+                "mean_wait_ms": round(self._wait_total / self._items * 1000, 3) if self._items else 0.0,
+                "max_wait_ms": round(self._wait_max * 1000, 3),
+                "batch_size_histogram": _cumulative(BATCH_SIZE_BUCKETS, self._size_counts),
+                "wait_seconds_histogram": _cumulative(WAIT_BUCKETS, self._wait_counts)
+            }
+
+
+def _bucket(bounds, value):
+    for i, bound in enumerate(bounds):
+        if value <= bound:
+            return i
+    return len(bounds)
+
+
+def _cumulative(bounds, counts):
+    histogram = {}
+    total = 0
+    for bound, count in zip(list(bounds) + ["+Inf"], counts):
+        total += count
+        histogram[str(bound)] = total
+    return histogram
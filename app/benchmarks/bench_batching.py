@@ -0,0 +1,79 @@
+"""
+Throughput of model-backed prediction with and without request coalescing.
+
+Concurrent clients each score one IPO at a time, either calling ``predict``
+directly (one 1 x 6 matrix per request) or through ``predict_price`` and the
+inference micro-batcher. Run from the ``app`` directory:
+
+    python -m benchmarks.bench_batching [--clients 32] [--requests 4000]
+"""
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from model_serving import ModelServer, inference_batcher, predict_price, prepare_features
+
+
+def synthetic_model(n_estimators=100, rows=2000, seed=0):
+    """Fit a model on synthetic rows shaped like the prediction log"""
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.preprocessing import StandardScaler
+
+    rng = np.random.default_rng(seed)
+    features = np.column_stack([
+        rng.uniform(50, 1500, rows),
+        rng.uniform(100, 20000, rows),
+        rng.uniform(-20, 100, rows),
+        rng.uniform(-10, 40, rows),
+        rng.uniform(-10, 40, rows),
+        rng.uniform(0, 30, rows)
+    ])
+    target = features[:, 2] / 100 * 0.8 + rng.normal(0, 0.05, rows)
+    scaler = StandardScaler()
+    model = RandomForestRegressor(n_estimators=n_estimators, random_state=seed, n_jobs=1)
+    model.fit(scaler.fit_transform(features), target)
+    return ModelServer({'scaler': scaler, 'model': model, 'version': 'benchmark'})
+
+
+def run(score, requests, clients):
+    request = {'issue_price': 250, 'gmp': 60, 'market_cap': 900, 'roce': 18, 'roe': 15, 'industry_growth': 11}
+
+    def one(_):
+        start = time.perf_counter()
+        score(prepare_features(request))
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(clients) as executor:
+        latencies = sorted(executor.map(one, range(requests)))
+    elapsed = time.perf_counter() - start
+    return {
+        "requests_per_sec": requests / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99)] * 1000
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=4000)
+    args = parser.parse_args()
+
+    model = synthetic_model()
+    results = {
+        "per-request predict": run(lambda f: model.predict_prices(f), args.requests, args.clients),
+        "micro-batched predict": run(lambda f: predict_price(model, f), args.requests, args.clients)
+    }
+
+    for name, stats in results.items():
+        print(f"{name:<24} {stats['requests_per_sec']:>10,.0f} req/s  p50 {stats['p50_ms']:>7.2f} ms  p99 {stats['p99_ms']:>7.2f} ms")
+
+    stats = inference_batcher.stats()
+    print(f"mean batch size {stats['mean_batch_size']}, mean queue wait {stats['mean_wait_ms']} ms, max {stats['max_wait_ms']} ms")
+
+
+if __name__ == "__main__":
+    main()
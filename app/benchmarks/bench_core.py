@@ -0,0 +1,112 @@
+"""
+Micro-benchmarks of the core prediction, sentiment and logging functions.
+
+``calculate_predicted_price``, the scoring kernel's full and GMP-only
+scores, ``prepare_features`` and ``analyze_sentiment`` are timed once;
+``log_prediction``, ``update_actual_price``, reading the history and
+polling ``/api/history`` (uncached, cached and revalidated) are timed
+against a synthetic log of each size, opened through ``ipo_logger`` in a
+temporary directory exactly as the API opens it (so the ``IPO_LOG_*``
+settings apply). Results are appended to
+``benchmarks/results/core.jsonl`` with the commit they were measured on.
+Run from the ``app`` directory:
+
+    python -m benchmarks.bench_core [--sizes 1000 10000 100000] [--no-save]
+"""
+import os
+import json
+import shutil
+import functools
+import argparse
+import tempfile
+
+import handlers
+import ipo_logger
+from accuracy import AccuracyTracker
+from api import calculate_predicted_price
+from benchmarks.bench_storage import synthetic_history
+from benchmarks.common import bench, report, save_results
+from model_serving import prepare_features
+from scoring import get_kernel
+from sentiment_analysis import analyze_sentiment
+
+REQUEST = {'company_name': 'Bench Ltd', 'issue_price': 250, 'gmp': 60, 'market_cap': 900, 'roce': 18, 'roe': 15, 'industry_growth': 11}
+
+ARTICLES = [
+    {'title': f'Bench Ltd IPO subscribed {i + 2} times on day {i % 3 + 1}',
+     'description': 'Strong demand from institutional investors lifts the grey market premium' if i % 2 else
+                    'Analysts warn the valuation leaves little room for listing gains'}
+    for i in range(20)
+]
+
+
+def open_log(directory, rows):
+    """Point ``ipo_logger`` at a fresh store holding ``rows`` synthetic predictions"""
+    if ipo_logger._store is not None:
+        ipo_logger._store.close()
+    csv_path = os.path.join(directory, f"history-{rows}.csv")
+    synthetic_history(csv_path, rows)
+    ipo_logger.LOG_FILE = csv_path
+    ipo_logger.STORE_DIR = os.path.join(directory, f"store-{rows}")
+    ipo_logger._store = None
+    ipo_logger._accuracy = AccuracyTracker()
+    ipo_logger.get_store()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000], help="History sizes in rows")
+    parser.add_argument("--no-save", action="store_true", help="Do not record the results")
+    args = parser.parse_args()
+
+    results = {}
+
+    def run(name, *bench_args, **bench_kwargs):
+        stats = bench(*bench_args, **bench_kwargs)
+        report(name, stats)
+        results[name] = stats
+
+    run("calculate_predicted_price", calculate_predicted_price, 250.0, 60.0, 900.0, 18.0, 15.0, 11.0)
+    # Re-scoring an open IPO at a new GMP reuses its other contributions
+    kernel = get_kernel()
+    contributions = kernel.score(250.0, 60.0, 900.0, 18.0, 15.0, 11.0)[2]
+    run("kernel.score", kernel.score, 250.0, 60.0, 900.0, 18.0, 15.0, 11.0)
+    run("kernel.rescore_gmp", kernel.rescore_gmp, 250.0, 75.0, 900.0, contributions)
+    run("prepare_features 1 row", prepare_features, REQUEST)
+    run("prepare_features 1000 rows", prepare_features, [REQUEST] * 1000, number=100)
+    # The sentiment memo is warm after the first call, as it is for repeated headlines
+    run("analyze_sentiment 20 articles", analyze_sentiment, ARTICLES, number=200)
+
+    directory = tempfile.mkdtemp(prefix="ipo-core-")
+    try:
+        for rows in args.sizes:
+            open_log(directory, rows)
+            counter = iter(range(10**9))
+            run(f"log_prediction @{rows}",
+                lambda: ipo_logger.log_prediction({**REQUEST, 'company_name': f"Bench {next(counter)} Ltd"}),
+                number=200, repeat=3)
+            run(f"update_actual_price @{rows}",
+                lambda: ipo_logger.update_actual_price(f"Company {next(counter) % 5000} Ltd", 300.0),
+                number=200, repeat=3)
+            run(f"get_prediction_history @{rows}", ipo_logger.get_prediction_history, number=5, repeat=3)
+
+            # An idle poll of /api/history: built and serialised, served from the
+            # response cache (gzipped), and revalidated with the current ETag
+            query, limit, _ = handlers.parse_history_args({})
+            build = functools.partial(handlers.history_page, query, limit)
+            key = handlers.history_key(query, limit)
+            etag = handlers.cached_read(key, build)[2]["ETag"]
+            run(f"history poll uncached @{rows}", lambda: json.dumps(build()[0]).encode(), number=200, repeat=3)
+            run(f"history poll cached @{rows}", handlers.cached_read, key, build, None, "gzip", number=2000, repeat=3)
+            run(f"history poll 304 @{rows}", handlers.cached_read, key, build, etag, number=2000, repeat=3)
+    finally:
+        if ipo_logger._store is not None:
+            ipo_logger._store.close()
+        shutil.rmtree(directory, ignore_errors=True)
+
+    if not args.no_save:
+        save_results("core", results)
+
+
+if __name__ == "__main__":
+    main()
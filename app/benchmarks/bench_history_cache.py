@@ -0,0 +1,96 @@
+"""
+Read cost of the in-memory history cache against reloading the store.
+
+Several processes append predictions and record listing prices in one store
+(with compactions along the way) while this process keeps a ``HistoryCache``
+on its own store handle and polls it. It then times reads served from the
+cache against reloading the store. That the cache stays consistent with
+the store under concurrent writers is checked by
+``tests/test_history_cache.py``. Run from the ``app`` directory:
+
+    python -m benchmarks.bench_history_cache [--writers 4] [--rows 2000]
+"""
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import multiprocessing
+
+from benchmarks.common import bench, report
+from history_cache import HistoryCache
+from log_store import PredictionLogStore
+
+
+def writer(directory, worker, rows):
+    store = PredictionLogStore(directory, fsync=False, compact_threshold=500, group_commit=False).open()
+    for i in range(rows):
+        store.append({
+            "company_name": f"Writer {worker} Company {i}",
+            "issue_price": 100 + i % 50,
+            "predicted_price": 120 + i % 70,
+            "prediction_date": f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}",
+            "gmp": i % 40
+        })
+        if i % 5 == 4:
+            store.update_company(f"writer {worker} company {i - 2}", {"actual_price": 150 + i % 30})
+    store.close()
+
+
+def cached_store(directory):
+    store = PredictionLogStore(directory, group_commit=False).open()
+    cache = HistoryCache()
+    store.add_observer(cache)
+    return store, cache
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--rows", type=int, default=2000, help="Rows appended by each writer")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="ipo-cache-")
+    try:
+        store, cache = cached_store(directory)
+        processes = [
+            multiprocessing.Process(target=writer, args=(directory, worker, args.rows))
+            for worker in range(args.writers)
+        ]
+        for process in processes:
+            process.start()
+
+        polls = 0
+        while any(process.is_alive() for process in processes):
+            store.refresh()
+            cache.open_companies()
+            polls += 1
+            time.sleep(0.005)
+        for process in processes:
+            process.join()
+            if process.exitcode != 0:
+                print(f"writer exited with {process.exitcode}")
+                return 1
+
+        store.refresh()
+        stats = cache.stats()
+        print(f"{stats['rows']} rows after {polls} polls, {stats['loads']} reloads, "
+              f"cache memory {stats['memory_bytes'] / 2**20:.2f} MB (limit {stats['max_bytes'] / 2**20:.0f} MB)")
+
+        def cached_read():
+            store.refresh()
+            return cache.column("predicted_price")
+
+        def uncached_read():
+            return PredictionLogStore(directory, group_commit=False).open().rows()
+
+        report("cached column read", bench(cached_read, number=1000))
+        report("cached open companies", bench(lambda: (store.refresh(), cache.open_companies()), number=100))
+        report("reload store", bench(uncached_read, number=3, repeat=3))
+        return 0
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
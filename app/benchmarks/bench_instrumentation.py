@@ -0,0 +1,31 @@
+"""
+Micro-benchmark of the cost of a ``stage()`` timer, disabled and enabled.
+
+Run from the ``app`` directory:
+
+    python -m benchmarks.bench_instrumentation
+"""
+import instrumentation
+from benchmarks.common import bench, report
+
+
+def empty():
+    pass
+
+def timed_stage():
+    with instrumentation.stage("bench"):
+        pass
+
+
+def main():
+    report("no instrumentation", bench(empty, number=200000))
+
+    instrumentation.STAGES_ENABLED = False
+    report("stage() disabled", bench(timed_stage, number=200000))
+
+    instrumentation.STAGES_ENABLED = True
+    report("stage() enabled", bench(timed_stage, number=200000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Micro-benchmark of the per-call overhead of the scoring kernel.
+
+Run from the ``app`` directory:
+
+    python -m benchmarks.bench_kernel
+"""
+import numpy as np
+
+from api import calculate_predicted_price
+from benchmarks.common import bench, report
+from scoring import ScoringKernel, get_kernel
+
+ARGS = (100.0, 35.0, 420.0, 18.5, 14.2, 12.0)
+
+
+def legacy_score(issue_price, gmp, market_cap, roce, roe, industry_growth):
+    """The per-request inline scoring that /api/predict used before the kernel"""
+    weights = {'gmp': 0.60, 'market_cap': 0.20, 'roce': 0.10, 'roe': 0.05, 'industry_growth': 0.05}
+    gmp_percentage = (gmp / issue_price) * 100
+    gmp_contribution = min(max(gmp_percentage, -50), 100) * weights['gmp']
+    market_cap_contribution = (1 / max(market_cap, 1)) * 2000 * weights['market_cap']
+    roce_contribution = (max(roce, -50) / 100) * weights['roce'] * 100
+    roe_contribution = (max(roe, -50) / 100) * weights['roe'] * 100
+    industry_growth_contribution = (industry_growth / 100) * weights['industry_growth'] * 100
+    weighted_score = (gmp_contribution + market_cap_contribution + roce_contribution +
+                      roe_contribution + industry_growth_contribution) / 100
+    if market_cap < 500:
+        weighted_score *= 1.10
+    weighted_score = max(-0.5, min(2, weighted_score))
+    predicted_price = issue_price * (1 + weighted_score)
+    return predicted_price, {
+        "gmp_contribution": round(gmp_contribution, 2),
+        "market_cap_contribution": round(market_cap_contribution, 2),
+        "roce_contribution": round(roce_contribution, 2),
+        "roe_contribution": round(roe_contribution, 2),
+        "industry_growth_contribution": round(industry_growth_contribution, 2),
+        "small_cap_bonus": "10%" if market_cap < 500 else "0%",
+        "total_contribution": round(weighted_score * 100, 2)
+    }
+
+
+def kernel_score_and_breakdown(kernel, *args):
+    predicted_price, weighted_score, contributions = kernel.score(*args)
+    return predicted_price, kernel.breakdown(args[2], weighted_score, contributions)
+
+
+def main():
+    kernel = ScoringKernel()
+
+    report("legacy inline scoring + breakdown", bench(legacy_score, *ARGS))
+    report("kernel.score", bench(kernel.score, *ARGS))
+    report("kernel.score + breakdown", bench(kernel_score_and_breakdown, kernel, *ARGS))
+    report("get_kernel (reload check)", bench(get_kernel))
+    report("calculate_predicted_price", bench(calculate_predicted_price, *ARGS))
+
+    rows = 1_000_000
+    columns = [np.full(rows, value) for value in ARGS]
+    stats = bench(kernel.score_batch, *columns, number=1, repeat=3)
+    per_row = {key: value / rows if key != "calls_per_sec" else value * rows for key, value in stats.items()}
+    report(f"kernel.score_batch ({rows:,} rows, per row)", per_row)
+
+
+if __name__ == "__main__":
+    main()
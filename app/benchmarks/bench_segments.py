@@ -0,0 +1,133 @@
+"""
+Disk usage and read times of the time-segmented prediction log.
+
+A synthetic history (spread over four years of prediction dates) is
+imported from CSV into a store in each snapshot format in turn. For every format the
+script reports:
+
+- disk usage of the history as one uncompressed snapshot against the
+  segmented store (closed segments compressed, plus company indexes)
+- opening the store, reading the whole live history and recording a
+  listing price, before and after older segments are archived
+- reading archived rows for one month and for one company, which skip
+  the segments that cannot match, against reading the whole archive
+
+Results are appended to ``benchmarks/results/segments.jsonl``. Run from
+the ``app`` directory:
+
+    python -m benchmarks.bench_segments [--rows 1000000] [--formats jsonl parquet] [--archive-before 2023-01-01]
+"""
+import os
+import time
+import shutil
+import datetime
+import argparse
+import tempfile
+
+from benchmarks.bench_storage import FORMATS, synthetic_history
+from benchmarks.common import save_results
+from log_store import PredictionLogStore
+from storage_backends import get_snapshot_format
+
+
+def timed(fn, repeat=3):
+    """Best wall time of ``fn()`` in seconds, and its last result"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def disk_usage(directory):
+    """Bytes of the files directly in ``directory`` and in its archive"""
+    live = sum(entry.stat().st_size for entry in os.scandir(directory) if entry.is_file())
+    archive = os.path.join(directory, "archive")
+    archived = sum(entry.stat().st_size for entry in os.scandir(archive) if entry.is_file()) if os.path.isdir(archive) else 0
+    return live, archived
+
+
+def open_store(store_dir, snapshot_format, archive_after_days=0):
+    return PredictionLogStore(store_dir, group_commit=False, fsync=False, snapshot_format=snapshot_format,
+                              archive_after_days=archive_after_days).open()
+
+
+def measure(csv_path, snapshot_format, archive_before, directory):
+    results = {}
+
+    store_dir = os.path.join(directory, f"store-{snapshot_format}")
+    start = time.perf_counter()
+    store = PredictionLogStore(store_dir, legacy_csv=csv_path, group_commit=False, fsync=False,
+                               snapshot_format=snapshot_format).open()
+    results["import_s"] = time.perf_counter() - start
+    unsegmented = os.path.join(directory, f"unsegmented.{snapshot_format}")
+    get_snapshot_format(snapshot_format).write(unsegmented, store.rows())
+    results["unsegmented_bytes"] = os.path.getsize(unsegmented)
+    os.remove(unsegmented)
+    # Release each store before opening the next; a 1M-row store holds gigabytes
+    store.close()
+    del store
+    results["segmented_bytes"], _ = disk_usage(store_dir)
+
+    results["open_s"], store = timed(lambda: open_store(store_dir, snapshot_format), repeat=1)
+    results["live_rows"] = len(store.rows())
+    results["history_s"], _ = timed(lambda: [row for _, row in store.rows()])
+    results["update_s"], _ = timed(lambda: store.update_company("Company 17 Ltd", {"actual_price": 321.0}))
+    store.close()
+    del store
+
+    # Archive every segment whose predictions all precede archive_before
+    archive_after_days = (datetime.date.today() - datetime.date.fromisoformat(archive_before)).days
+    store = open_store(store_dir, snapshot_format, archive_after_days)
+    results["archive_s"], _ = timed(store.compact, repeat=1)
+    store.close()
+    del store
+    results["archived_live_bytes"], results["archived_bytes"] = disk_usage(store_dir)
+
+    results["archived_open_s"], store = timed(lambda: open_store(store_dir, snapshot_format, archive_after_days), repeat=1)
+    results["archived_live_rows"] = len(store.rows())
+    results["archived_history_s"], _ = timed(lambda: [row for _, row in store.rows()])
+    results["archived_update_s"], _ = timed(lambda: store.update_company("Company 17 Ltd", {"actual_price": 321.0}))
+    results["read_archive_all_s"], rows = timed(store.read_archive, repeat=1)
+    results["archived_rows"] = len(rows)
+    results["read_archive_month_s"], _ = timed(lambda: store.read_archive("2021-06-01", "2021-06-30"))
+    results["read_archive_company_s"], _ = timed(lambda: store.read_archive(company_name="Company 17 Ltd"))
+    store.close()
+    shutil.rmtree(store_dir)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=FORMATS)
+    parser.add_argument("--archive-before", default="2023-01-01", help="Segments ending before this date are archived")
+    parser.add_argument("--no-save", action="store_true", help="Do not record the results")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="ipo-segments-")
+    try:
+        csv_path = os.path.join(directory, "history.csv")
+        synthetic_history(csv_path, args.rows)
+        results = {}
+        for snapshot_format in args.formats:
+            results[snapshot_format] = stats = measure(csv_path, snapshot_format, args.archive_before, directory)
+            print(f"{snapshot_format}: {stats['unsegmented_bytes'] / 2**20:.1f} MB unsegmented, "
+                  f"{stats['segmented_bytes'] / 2**20:.1f} MB segmented; after archiving "
+                  f"{stats['archived_live_bytes'] / 2**20:.1f} MB live, {stats['archived_bytes'] / 2**20:.1f} MB archived")
+            print(f"  open {stats['open_s']:.3f} s, history {stats['history_s'] * 1000:.1f} ms, "
+                  f"update {stats['update_s'] * 1000:.2f} ms ({stats['live_rows']:,} live rows)")
+            print(f"  archived: open {stats['archived_open_s']:.3f} s, history {stats['archived_history_s'] * 1000:.1f} ms, "
+                  f"update {stats['archived_update_s'] * 1000:.2f} ms ({stats['archived_live_rows']:,} live rows)")
+            print(f"  read archive: all {stats['read_archive_all_s']:.3f} s ({stats['archived_rows']:,} rows), "
+                  f"one month {stats['read_archive_month_s'] * 1000:.1f} ms, one company {stats['read_archive_company_s'] * 1000:.1f} ms")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    if not args.no_save:
+        save_results("segments", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Requests/sec per core of the async service against the Flask API.
+
+Each server is started with the same number of worker processes in its own
+temporary directory, with a prediction log seeded with ``--history``
+synthetic rows:
+
+- ``flask``: api.py under gunicorn with ``gunicorn.conf.py`` (threaded workers)
+- ``asgi``: service.py under uvicorn, with news served by a ``FakeNewsSource``;
+  its predictions also look up sentiment and queue background refreshes
+  for new companies, which api.py does not do
+
+and driven over HTTP by the load generator of ``load_test``. Throughput
+(served requests per second per core), p50/p99 latency and the number of
+429 responses are reported and appended to
+``benchmarks/results/service.jsonl``. Run from the ``app`` directory:
+
+    python -m benchmarks.bench_service [--workers 1] [--clients 32] [--requests 4000]
+"""
+import os
+import sys
+import time
+import shutil
+import socket
+import argparse
+import tempfile
+import subprocess
+import http.client
+
+from benchmarks.common import latency_stats, save_results
+from benchmarks.load_test import HTTPClient, parse_mix, run_load
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Seconds the stubbed news source takes to answer
+NEWS_DELAY = 0.05
+
+
+def stubbed_app():
+    """The async service with every news source replaced by a FakeNewsSource (a uvicorn factory)"""
+    import sentiment_analysis
+    import service
+    from benchmarks.bench_core import ARTICLES
+    from news_sources import FakeNewsSource
+
+    sentiment_analysis.news_fetcher.sources = [FakeNewsSource("stub", ARTICLES, delay=NEWS_DELAY)]
+    return service.create_app(warm=True)
+
+
+def server_command(kind, port, workers):
+    if kind == "flask":
+        return [
+            sys.executable, "-m", "gunicorn", "-c", os.path.join(APP_DIR, "gunicorn.conf.py"),
+            "--pythonpath", APP_DIR, "--workers", str(workers), "--bind", f"127.0.0.1:{port}", "--log-level", "warning"
+        ]
+    return [
+        sys.executable, "-m", "uvicorn", "benchmarks.bench_service:stubbed_app", "--factory", "--app-dir", APP_DIR,
+        "--workers", str(workers), "--port", str(port), "--log-level", "warning"
+    ]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_ready(port, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited with {process.returncode}")
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+            connection.request("GET", "/api/model/stats")
+            if connection.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"server on port {port} did not start within {timeout}s")
+
+
+def run_server(kind, args):
+    """Start one server, load it and stop it; returns its results"""
+    from benchmarks.bench_storage import synthetic_history
+
+    directory = tempfile.mkdtemp(prefix=f"ipo-{kind}-")
+    os.makedirs(os.path.join(directory, "data"))
+    synthetic_history(os.path.join(directory, "data", "ipo_predictions.csv"), args.history)
+
+    port = free_port()
+    env = {**os.environ, "IPO_SENTIMENT_SCHEDULER": "0", "PYTHONPATH": APP_DIR}
+    log = open(os.path.join(directory, "server.log"), "w")
+    process = subprocess.Popen(server_command(kind, port, args.workers), cwd=directory, env=env, stdout=log, stderr=subprocess.STDOUT)
+    try:
+        wait_ready(port, process)
+        send = HTTPClient(f"http://127.0.0.1:{port}")
+        run_load(send, args.mix, args.warmup, args.clients, seed=1)
+        latencies, statuses, elapsed = run_load(send, args.mix, args.requests, args.clients)
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+        log.close()
+        shutil.rmtree(directory, ignore_errors=True)
+
+    stats = latency_stats([t for times in latencies.values() for t in times], elapsed)
+    stats["rejected"] = statuses.get(429, 0)
+    # Rejected requests are cheap, so throughput per core only counts served ones
+    stats["served_per_sec_per_core"] = (stats["requests"] - stats["rejected"]) / elapsed / min(args.workers, os.cpu_count() or 1)
+    stats["errors"] = sum(count for status, count in statuses.items() if status is None or status >= 500)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--servers", nargs="+", choices=["flask", "asgi"], default=["flask", "asgi"])
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes per server")
+    parser.add_argument("--clients", type=int, default=32, help="Concurrent clients")
+    parser.add_argument("--requests", type=int, default=4000, help="Timed requests")
+    parser.add_argument("--warmup", type=int, default=200, help="Untimed requests sent first")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("predict=5,history=4,update=1"))
+    parser.add_argument("--history", type=int, default=10000, help="Rows in each server's prediction log")
+    parser.add_argument("--no-save", action="store_true", help="Do not record the results")
+    args = parser.parse_args()
+
+    results = {}
+    for kind in args.servers:
+        stats = results[kind] = run_server(kind, args)
+        print(f"{kind:<6} {stats['requests_per_sec']:>8,.0f} req/s  {stats['served_per_sec_per_core']:>8,.0f} served/s/core  "
+              f"p50 {stats['p50_ms']:>7.2f} ms  p99 {stats['p99_ms']:>7.2f} ms  "
+              f"{stats['rejected']} rejected (429), {stats['errors']} errors")
+
+    if not args.no_save:
+        save_results("service", results)
+
+
+if __name__ == "__main__":
+    main()
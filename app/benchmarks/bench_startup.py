@@ -0,0 +1,94 @@
+"""
+Import-time budget of the service entry points.
+
+Each module is imported in a fresh interpreter with ``python -X importtime``
+and its cumulative import time (best of several runs) is compared against
+``import_budget.json``. The script also checks that no module on the lazy
+list (pandas, scikit-learn, TextBlob, ...) is imported at startup. It exits
+non-zero when a module is over budget by more than the tolerance or pulls
+in a lazy module. Run from the ``app`` directory:
+
+    python -m benchmarks.bench_startup [--runs 5] [--tolerance 0.5] [--slack-ms 10] [--update]
+
+``--update`` records the median of the runs as the new budget; checks
+compare the fastest run against it. Import times on shared or throttled
+hosts vary by a third or more between runs, so the default tolerance only
+flags regressions well beyond that noise.
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+BUDGET_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "import_budget.json")
+
+# Modules that must only be imported on first use
+LAZY_MODULES = ["pandas", "numpy", "sklearn", "joblib", "textblob", "gnews", "nltk", "pyarrow", "feedparser"]
+
+
+def import_time(module):
+    """
+    Import ``module`` in a fresh interpreter.
+
+    Returns:
+        tuple: (cumulative import time in ms, lazy modules that were imported)
+    """
+    code = (
+        f"import sys, {module}; "
+        f"print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        check=True, capture_output=True, text=True
+    )
+
+    cumulative = None
+    for line in result.stderr.splitlines():
+        parts = [part.strip() for part in line.split("|")]
+        if len(parts) == 3 and parts[2] == module:
+            cumulative = int(parts[1]) / 1000
+    loaded = [name for name in result.stdout.strip().split(",") if name]
+    return cumulative, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5, help="Imports per module; the fastest is checked, the median recorded")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Allowed slowdown over the budget")
+    parser.add_argument("--slack-ms", type=float, default=10, help="Allowed slowdown in ms, for small budgets")
+    parser.add_argument("--update", action="store_true", help="Write the measured times as the budget")
+    args = parser.parse_args()
+
+    with open(BUDGET_FILE) as f:
+        budget = json.load(f)
+
+    failures = []
+    measured = {}
+    for module, budget_ms in budget.items():
+        runs = [import_time(module) for _ in range(args.runs)]
+        best = min(ms for ms, _ in runs)
+        loaded = runs[0][1]
+        measured[module] = round(statistics.median(ms for ms, _ in runs), 1)
+
+        status = "ok"
+        if loaded:
+            status = "IMPORTS " + ", ".join(loaded)
+            failures.append(module)
+        elif not args.update and best > budget_ms * (1 + args.tolerance) + args.slack_ms:
+            status = "OVER BUDGET"
+            failures.append(module)
+        print(f"{module:<24} {best:>8.1f} ms  budget {budget_ms:>8.1f} ms  {status}")
+
+    if args.update:
+        with open(BUDGET_FILE, "w") as f:
+            json.dump(measured, f, indent=2)
+            f.write("\n")
+        print(f"Budget written to {BUDGET_FILE}")
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,162 @@
+"""
+Load time and memory of the prediction history in CSV and each snapshot format.
+
+For every size a synthetic history is written as the legacy CSV and as a
+store in each snapshot format. Each measurement runs in a fresh process and
+reports wall time and peak RSS for:
+
+- ``csv``: ``pandas.read_csv`` of the legacy log
+- ``open``: opening the store (snapshot, indexes and WAL replay)
+- ``table``: reading two price columns from the live segment files as a
+  pyarrow Table, the analytics path of ``read_table`` (memory-mapped for
+  arrow, column pushdown for parquet)
+
+Run from the ``app`` directory:
+
+    python -m benchmarks.bench_storage [--sizes 10000 100000 1000000] [--dir /tmp/ipo-bench]
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import subprocess
+import tempfile
+
+FORMATS = ["jsonl", "arrow", "parquet"]
+
+
+def synthetic_history(path, rows, seed=0):
+    """Write ``rows`` synthetic predictions as a legacy CSV log"""
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    issue = rng.uniform(50, 1500, rows).round(2)
+    dates = pd.Timestamp("2020-01-01") + pd.to_timedelta(rng.integers(0, 1500, rows), unit="D")
+    actual = (issue * rng.uniform(0.7, 1.8, rows)).round(2)
+    actual[rng.random(rows) < 0.2] = np.nan
+    pd.DataFrame({
+        "company_name": [f"Company {i % 5000} Ltd" for i in range(rows)],
+        "issue_price": issue,
+        "predicted_price": (issue * rng.uniform(0.9, 1.6, rows)).round(2),
+        "actual_price": actual,
+        "prediction_date": dates.strftime("%Y-%m-%d"),
+        "listing_date": None,
+        "market_cap": rng.uniform(100, 20000, rows).round(1),
+        "gmp": rng.uniform(-20, 100, rows).round(1),
+        "industry_growth": rng.uniform(0, 30, rows).round(1),
+        "roce": rng.uniform(-10, 40, rows).round(1),
+        "roe": rng.uniform(-10, 40, rows).round(1),
+        "sentiment_score": rng.uniform(-1, 1, rows).round(3)
+    }).to_csv(path, index=False)
+
+
+def prepare(directory, rows):
+    """Write the CSV and one store per format; returns their paths"""
+    from log_store import PredictionLogStore
+    from migrate_history import migrate
+
+    csv_path = os.path.join(directory, f"history-{rows}.csv")
+    synthetic_history(csv_path, rows)
+
+    stores = {}
+    for snapshot_format in FORMATS:
+        store_dir = os.path.join(directory, f"store-{rows}-{snapshot_format}")
+        if snapshot_format == "jsonl":
+            PredictionLogStore(store_dir, legacy_csv=csv_path, group_commit=False).open().close()
+        else:
+            shutil.copytree(stores["jsonl"], store_dir)
+            migrate(store_dir, snapshot_format)
+        stores[snapshot_format] = store_dir
+    return csv_path, stores
+
+
+def _memory_mb(field):
+    """Current (VmRSS) or peak (VmHWM) resident memory of this process in MB"""
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def child(mode, path):
+    """Run one measurement in this (fresh) process and print it as JSON"""
+    import pandas as pd
+    from log_store import PredictionLogStore
+    from storage_backends import arrow_schema, get_snapshot_format
+
+    # Import pyarrow up front so neither its import time nor memory is counted
+    arrow_schema()
+
+    baseline = _memory_mb("VmRSS")
+    start = time.perf_counter()
+    # Keep the loaded object alive so the RSS growth reflects what it holds
+    if mode == "csv":
+        loaded = pd.read_csv(path)
+    elif mode == "table":
+        import pyarrow as pa
+
+        manifest = max(name for name in os.listdir(path) if name.startswith("manifest-"))
+        with open(os.path.join(path, manifest)) as f:
+            segments = json.load(f)["segments"]
+        loaded = pa.concat_tables([
+            get_snapshot_format(segment["format"]).read_table(
+                os.path.join(path, segment["file"]), columns=["predicted_price", "actual_price"]
+            )
+            for segment in segments
+        ])
+    else:
+        loaded = PredictionLogStore(path, group_commit=False).open()
+    elapsed = time.perf_counter() - start
+
+    print(json.dumps({
+        "seconds": elapsed,
+        "peak_rss_mb": _memory_mb("VmHWM"),
+        "rss_growth_mb": _memory_mb("VmRSS") - baseline
+    }))
+    del loaded
+
+
+def measure(mode, path):
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_storage", "--child", mode, path],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--dir", help="Working directory (a temporary one by default)")
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(*args.child)
+        return
+
+    directory = args.dir or tempfile.mkdtemp(prefix="ipo-bench-")
+    os.makedirs(directory, exist_ok=True)
+    try:
+        for rows in args.sizes:
+            csv_path, stores = prepare(directory, rows)
+            results = {"csv read_csv": measure("csv", csv_path)}
+            for snapshot_format, store_dir in stores.items():
+                results[f"{snapshot_format} open"] = measure("open", store_dir)
+                results[f"{snapshot_format} table"] = measure("table", store_dir)
+
+            print(f"{rows:,} rows")
+            for name, stats in results.items():
+                print(f"  {name:<16} {stats['seconds']:>8.3f} s  peak RSS {stats['peak_rss_mb']:>8.1f} MB  "
+                      f"growth {stats['rss_growth_mb']:>8.1f} MB")
+    finally:
+        if not args.dir:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
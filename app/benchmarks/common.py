@@ -0,0 +1,110 @@
+import os
+import json
+import time
+import statistics
+import subprocess
+
+
+def bench(fn, *args, number=10000, repeat=5, **kwargs):
+    """
+    Time ``fn(*args, **kwargs)``.
+
+    Args:
+        fn (callable): Function to time
+        number (int): Calls per timing run
+        repeat (int): Number of timing runs
+
+    Returns:
+        dict: Per-call time in microseconds (best and median run) and calls/sec
+    """
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn(*args, **kwargs)
+        runs.append((time.perf_counter() - start) / number)
+
+    best = min(runs)
+    return {
+        "best_us": best * 1e6,
+        "median_us": statistics.median(runs) * 1e6,
+        "calls_per_sec": 1 / best if best else float("inf")
+    }
+
+
+def report(name, stats):
+    """Print one benchmark result line"""
+    print(f"{name:<40} {stats['best_us']:>10.2f} us/call  {stats['median_us']:>10.2f} us median  {stats['calls_per_sec']:>12,.0f} calls/s")
+
+
+def latency_stats(latencies, elapsed):
+    """
+    Throughput and latency percentiles of a load run.
+
+    Args:
+        latencies (list): Per-request latencies in seconds
+        elapsed (float): Wall time of the whole run in seconds
+
+    Returns:
+        dict: requests/sec, p50 and p99 latency in ms
+    """
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "requests_per_sec": len(latencies) / elapsed if elapsed else float("inf"),
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+    }
+
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+def git_commit():
+    """Short hash of the checked-out commit, with ``-dirty`` for uncommitted changes"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True).stdout.strip()
+        return commit + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def save_results(suite, results, directory=RESULTS_DIR):
+    """
+    Append a run to ``<directory>/<suite>.jsonl`` and print the change from the previous commit.
+
+    Each line holds the commit, the time and ``results`` (a dict of benchmark
+    name to a dict of metrics), so regressions between commits can be read
+    off the file or from the comparison printed here.
+
+    Args:
+        suite (str): Name of the benchmark suite
+        results (dict): Metrics per benchmark
+        directory (str): Where result files are kept
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{suite}.jsonl")
+    commit = git_commit()
+
+    previous = None
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                run = json.loads(line)
+                if run["commit"] != commit:
+                    previous = run
+
+    with open(path, "a") as f:
+        f.write(json.dumps({"commit": commit, "time": time.strftime("%Y-%m-%dT%H:%M:%S"), "results": results}) + "\n")
+    print(f"Results for {commit} appended to {path}")
+
+    if previous is not None:
+        print(f"Change from {previous['commit']}:")
+        for name, metrics in results.items():
+            before = previous["results"].get(name, {})
+            changes = [
+                f"{metric} {(value / before[metric] - 1) * 100:+.1f}%"
+                for metric, value in metrics.items()
+                if isinstance(value, (int, float)) and before.get(metric)
+            ]
+            if changes:
+                print(f"  {name:<38} " + ", ".join(changes))
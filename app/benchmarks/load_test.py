@@ -0,0 +1,209 @@
+"""
+Load generator for the prediction API.
+
+Concurrent clients send a weighted mix of ``POST /api/predict``,
+``POST /api/update-price`` and ``GET /api/history`` requests, either
+in-process through the Flask test client (the default, against a
+temporary prediction log seeded with ``--history`` rows and with news
+served by a ``FakeNewsSource``) or to a running server with ``--url``.
+Throughput and p50/p99 latency are reported overall and per endpoint and
+appended to ``benchmarks/results/load.jsonl``. Run from the ``app``
+directory:
+
+    python -m benchmarks.load_test [--clients 8] [--requests 2000] [--mix predict=5,history=4,update=1]
+    python -m benchmarks.load_test --url http://127.0.0.1:10000
+"""
+import json
+import time
+import random
+import shutil
+import argparse
+import importlib
+import tempfile
+import threading
+import http.client
+from urllib.parse import urlsplit
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import latency_stats, save_results
+
+# Companies the generated predictions and listing prices are spread over
+COMPANIES = 500
+
+
+def make_request(kind, rng):
+    """Method, path and JSON body of one generated request"""
+    company = f"Load {rng.randrange(COMPANIES)} Ltd"
+    if kind == "predict":
+        issue_price = rng.uniform(50, 1500)
+        return "POST", "/api/predict", {
+            'company_name': company,
+            'issue_price': round(issue_price, 2),
+            'gmp': round(issue_price * rng.uniform(-0.1, 0.8), 2),
+            'market_cap': round(rng.uniform(100, 20000), 1),
+            'roce': round(rng.uniform(-10, 40), 1),
+            'roe': round(rng.uniform(-10, 40), 1),
+            'industry_growth': round(rng.uniform(0, 30), 1)
+        }
+    if kind == "update":
+        return "POST", "/api/update-price", {'company_name': company, 'actual_price': round(rng.uniform(50, 2000), 2)}
+    return "GET", "/api/history?limit=100", None
+
+
+class InProcessClient:
+    """Sends requests through a Flask test client, one per thread"""
+
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def __call__(self, method, path, body):
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        response = client.open(path, method=method, json=body)
+        response.get_data()
+        return response.status_code
+
+
+class HTTPClient:
+    """Sends requests to a running server over one keep-alive connection per thread"""
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self._local = threading.local()
+
+    def __call__(self, method, path, body):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = http.client.HTTPConnection(self.host, self.port, timeout=30)
+        payload = None if body is None else json.dumps(body)
+        headers = {} if body is None else {"Content-Type": "application/json"}
+        try:
+            connection.request(method, path, body=payload, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            return response.status
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            self._local.connection = None
+            raise
+
+
+def in_process_app(spec, history, directory, news_delay):
+    """
+    Import the app named by ``module:attribute`` with an isolated log and stubbed news.
+
+    The prediction log lives in ``directory`` (seeded with ``history``
+    synthetic rows) and every news source is replaced by a ``FakeNewsSource``
+    answering after ``news_delay`` seconds, so no request leaves the machine.
+    """
+    import sentiment_analysis
+    from benchmarks.bench_core import ARTICLES, open_log
+    from news_sources import FakeNewsSource
+
+    sentiment_analysis.news_fetcher.sources = [FakeNewsSource("stub", ARTICLES, delay=news_delay)]
+    open_log(directory, history)
+
+    module_name, _, attribute = spec.partition(":")
+    app = getattr(importlib.import_module(module_name), attribute or "app")
+    return app() if callable(app) and not hasattr(app, "test_client") else app
+
+
+def run_load(send, mix, requests, clients, seed=0):
+    """
+    Send ``requests`` requests from ``clients`` threads.
+
+    Returns:
+        tuple: (latencies per endpoint kind, Counter of response statuses
+            with None for failed connections, wall time in seconds)
+    """
+    kinds = [kind for kind, weight in mix.items() for _ in range(weight)]
+    rng = random.Random(seed)
+    plan = [rng.choice(kinds) for _ in range(requests)]
+    latencies = defaultdict(list)
+    statuses = Counter()
+    lock = threading.Lock()
+
+    def one(i):
+        kind = plan[i]
+        method, path, body = make_request(kind, random.Random(seed * 1_000_003 + i))
+        start = time.perf_counter()
+        try:
+            status = send(method, path, body)
+        except Exception:
+            status = None
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies[kind].append(elapsed)
+            statuses[status] += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(clients) as executor:
+        list(executor.map(one, range(requests)))
+    return latencies, statuses, time.perf_counter() - start
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        kind, _, weight = part.partition("=")
+        if kind not in ("predict", "history", "update"):
+            raise argparse.ArgumentTypeError(f"unknown request kind {kind!r}")
+        mix[kind] = int(weight or 1)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", help="Base URL of a running server; in-process when omitted")
+    parser.add_argument("--app", default="api:create_app", help="module:attribute of the in-process app or factory")
+    parser.add_argument("--clients", type=int, default=8, help="Concurrent clients")
+    parser.add_argument("--requests", type=int, default=2000, help="Timed requests")
+    parser.add_argument("--warmup", type=int, default=100, help="Untimed requests sent first")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("predict=5,history=4,update=1"))
+    parser.add_argument("--history", type=int, default=10000, help="Rows in the in-process prediction log")
+    parser.add_argument("--news-delay", type=float, default=0.05, help="Seconds the stubbed news source takes")
+    parser.add_argument("--no-save", action="store_true", help="Do not record the results")
+    args = parser.parse_args()
+
+    directory = None
+    if args.url:
+        send = HTTPClient(args.url)
+        target = args.url
+    else:
+        directory = tempfile.mkdtemp(prefix="ipo-load-")
+        send = InProcessClient(in_process_app(args.app, args.history, directory, args.news_delay))
+        target = f"{args.app} (in-process, {args.history} rows)"
+
+    try:
+        run_load(send, args.mix, args.warmup, args.clients, seed=1)
+        latencies, statuses, elapsed = run_load(send, args.mix, args.requests, args.clients)
+    finally:
+        if directory is not None:
+            import ipo_logger
+
+            if ipo_logger._store is not None:
+                ipo_logger._store.close()
+            shutil.rmtree(directory, ignore_errors=True)
+
+    # update-price answers 404 for companies not predicted yet, so only
+    # failed connections and server errors count as errors
+    errors = sum(count for status, count in statuses.items() if status is None or status >= 500)
+    results = {"all": {**latency_stats([t for kind in latencies.values() for t in kind], elapsed), "errors": errors}}
+    for kind, times in sorted(latencies.items()):
+        results[kind] = latency_stats(times, elapsed)
+
+    print(f"{args.requests} requests from {args.clients} clients to {target} in {elapsed:.2f}s, {errors} errors")
+    for name, stats in results.items():
+        print(f"{name:<10} {stats['requests']:>7} requests  {stats['requests_per_sec']:>9,.0f} req/s  "
+              f"p50 {stats['p50_ms']:>8.2f} ms  p99 {stats['p99_ms']:>8.2f} ms")
+
+    if not args.no_save:
+        save_results("load", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+"""
+Calibrate the heuristic scorer's weights by backtesting on logged predictions.
+
+Every logged IPO with a known actual listing price is replayed through a
+vectorized form of the scorer for each candidate weight vector, and the
+candidate with the lowest mean absolute error of the listing gain is
+written as a weights config that the API picks up.
+
+Usage (from the app directory):
+
+    python calibrate.py [--search random|grid|coordinate] [--candidates 20000]
+                        [--workers 4] [--output weights.json] [--dry-run]
+"""
+import os
+import json
+import time
+import argparse
+import itertools
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+from scoring import FACTORS, WEIGHTS_FILE, ScoringKernel, load_config
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Searched parameters and their ranges; the market cap weight multiplies the
+# config's market_cap_scaling, clamps and thresholds stay as configured
+PARAMETERS = ["gmp", "market_cap", "roce", "roe", "industry_growth", "small_cap_bonus"]
+RANGES = np.array([[0, 1], [0, 1], [0, 0.5], [0, 0.5], [0, 0.5], [1, 1.3]], dtype=np.float64)
+
+# Candidates scored per matrix product; bounds the size of the rows x candidates block
+CHUNK_SIZE = 256
+
+def load_backtest_rows():
+    """
+    Get the scorer inputs and actual price of logged IPOs with a known listing price.
+
+    Returns:
+        dict: float64 arrays keyed by the ``FACTORS`` and ``actual_price``
+    """
+    from ipo_logger import get_history_cache, get_prediction_history, get_store
+
+    columns = FACTORS + ["actual_price"]
+    cache = get_history_cache()
+    if cache is not None:
+        # Archived rows are not cached; they are read once and appended
+        archived = [row for _, row in get_store().read_archive()]
+        data = {
+            c: np.concatenate([np.array([np.nan if r.get(c) is None else float(r[c]) for r in archived]), cache.column(c)])
+            for c in columns
+        }
+    else:
+        rows = get_prediction_history(include_archived=True)
+        data = {c: np.array([np.nan if r.get(c) is None else float(r[c]) for r in rows]) for c in columns}
+
+    usable = np.all([np.isfinite(data[c]) for c in columns], axis=0)
+    usable &= (data["issue_price"] > 0) & (data["actual_price"] > 0)
+    return {c: data[c][usable] for c in columns}
+
+
+class Backtest:
+    """
+    Vectorized evaluation of candidate weight vectors over a fixed history.
+
+    The per-factor terms that do not depend on the weights (clamped GMP %,
+    scaled inverse market cap, floored ROCE/ROE, industry growth) are
+    precomputed once, so scoring C candidates over N IPOs is one N x 5 by
+    5 x C matrix product followed by the small-cap bonus and the clamp.
+
+    Args:
+        data (dict): Arrays from ``load_backtest_rows``
+        config (dict): Weights config supplying the fixed clamps and thresholds
+    """
+
+    def __init__(self, data, config):
+        kernel = ScoringKernel(config)
+        self.config = kernel.config
+        issue_price = data["issue_price"]
+        self.terms = np.column_stack([
+            np.clip(data["gmp"] / issue_price * 100, kernel.gmp_min, kernel.gmp_max),
+            float(kernel.config["market_cap_scaling"]) / np.maximum(data["market_cap"], 1),
+            np.maximum(data["roce"], kernel.metric_floor),
+            np.maximum(data["roe"], kernel.metric_floor),
+            data["industry_growth"]
+        ]) / 100
+        self.small_cap = data["market_cap"] < kernel.small_cap_threshold
+        self.score_min, self.score_max = kernel.score_min, kernel.score_max
+        self.actual_return = data["actual_price"] / issue_price - 1
+        self.data = data
+
+    def __len__(self):
+        return len(self.actual_return)
+
+    def evaluate(self, candidates):
+        """
+        Mean absolute error of the listing gain for each candidate.
+
+        Args:
+            candidates (numpy.ndarray): C x len(PARAMETERS) parameter vectors
+
+        Returns:
+            numpy.ndarray: C losses (0.05 = 5 percentage points off on average)
+        """
+        candidates = np.atleast_2d(candidates)
+        losses = np.empty(len(candidates))
+        for start in range(0, len(candidates), CHUNK_SIZE):
+            chunk = candidates[start:start + CHUNK_SIZE]
+            scores = self.terms @ chunk[:, :5].T
+            scores[self.small_cap] *= chunk[:, 5]
+            np.clip(scores, self.score_min, self.score_max, out=scores)
+            scores -= self.actual_return[:, None]
+            losses[start:start + CHUNK_SIZE] = np.abs(scores).mean(axis=0)
+        return losses
+
+    def config_for(self, candidate):
+        """Weights config for a parameter vector"""
+        weights = {name: round(float(value), 6) for name, value in zip(PARAMETERS[:5], candidate[:5])}
+        return {
+            **self.config,
+            "version": "calibrated-" + datetime.now().strftime("%Y%m%d%H%M%S"),
+            "weights": weights,
+            "small_cap_bonus": round(float(candidate[5]), 6)
+        }
+
+    def kernel_loss(self, config):
+        """Loss of a config scored by ``ScoringKernel`` itself, to check the vectorized path"""
+        result = ScoringKernel(config).score_batch(*(self.data[c] for c in FACTORS))
+        return float(np.abs(result["weighted_score"] - self.actual_return).mean())
+
+
+def base_candidate(config):
+    """Parameter vector of an existing weights config"""
+    kernel = ScoringKernel(config)
+    return np.array([kernel.weights[name] for name in PARAMETERS[:5]] + [kernel.small_cap_bonus], dtype=np.float64)
+
+
+_worker_backtest = None
+
+def _init_worker(backtest):
+    global _worker_backtest
+    _worker_backtest = backtest
+
+def _evaluate_chunk(candidates):
+    return _worker_backtest.evaluate(candidates)
+
+
+class Evaluator:
+    """
+    Scores candidates on the backtest, split across worker processes.
+
+    Args:
+        backtest (Backtest): History to score on
+        workers (int): Worker processes; 1 evaluates in this process
+    """
+
+    def __init__(self, backtest, workers=1):
+        self.backtest = backtest
+        self.workers = workers
+        self.evaluated = 0
+        self._pool = None
+        if workers > 1:
+            self._pool = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(backtest,))
+
+    def __call__(self, candidates):
+        self.evaluated += len(candidates)
+        if self._pool is None or len(candidates) <= CHUNK_SIZE:
+            return self.backtest.evaluate(candidates)
+        size = max(CHUNK_SIZE, -(-len(candidates) // self.workers))
+        chunks = [candidates[i:i + size] for i in range(0, len(candidates), size)]
+        return np.concatenate(list(self._pool.map(_evaluate_chunk, chunks)))
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+
+
+def random_search(evaluate, start, candidates, seed=0):
+    """Score ``candidates`` uniform samples of the parameter ranges (plus ``start``)"""
+    rng = np.random.default_rng(seed)
+    samples = rng.uniform(RANGES[:, 0], RANGES[:, 1], size=(candidates, len(PARAMETERS)))
+    samples = np.vstack([start, samples])
+    losses = evaluate(samples)
+    best = int(np.argmin(losses))
+    return samples[best], float(losses[best])
+
+def grid_search(evaluate, start, steps):
+    """Score every point of a grid with ``steps`` values per parameter"""
+    axes = [np.linspace(low, high, steps) for low, high in RANGES]
+    grid = np.array(list(itertools.product(*axes)))
+    losses = evaluate(grid)
+    best = int(np.argmin(losses))
+    return grid[best], float(losses[best])
+
+def coordinate_descent(evaluate, start, rounds=20, points=41):
+    """
+    Optimise one parameter at a time along a line of ``points`` values.
+
+    The line spans the parameter's full range in the first round and is
+    halved around the current best every round after one without improvement.
+    """
+    best = np.array(start, dtype=np.float64)
+    best_loss = float(evaluate(best[None, :])[0])
+    width = RANGES[:, 1] - RANGES[:, 0]
+
+    for _ in range(rounds):
+        improved = False
+        for i in range(len(PARAMETERS)):
+            low = max(RANGES[i, 0], best[i] - width[i] / 2)
+            high = min(RANGES[i, 1], best[i] + width[i] / 2)
+            line = np.repeat(best[None, :], points, axis=0)
+            line[:, i] = np.linspace(low, high, points)
+            losses = evaluate(line)
+            j = int(np.argmin(losses))
+            if losses[j] < best_loss:
+                best, best_loss = line[j], float(losses[j])
+                improved = True
+        if not improved:
+            width /= 2
+    return best, best_loss
+
+def save_config(config, path):
+    """Write a weights config atomically, so workers never load a partial file"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(config, f, indent=2)
+        f.write("\n")
+    os.replace(tmp_path, path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate the scorer weights on logged IPOs")
+    parser.add_argument("--search", choices=["random", "grid", "coordinate"], default="random")
+    parser.add_argument("--candidates", type=int, default=20000, help="Samples for the random search")
+    parser.add_argument("--grid-steps", type=int, default=6, help="Values per parameter for the grid search")
+    parser.add_argument("--rounds", type=int, default=20, help="Rounds of coordinate descent")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--min-rows", type=int, default=20, help="Minimum labelled rows required")
+    parser.add_argument("--output", default=WEIGHTS_FILE, help="Path of the weights config to write")
+    parser.add_argument("--dry-run", action="store_true", help="Report the best weights without writing them")
+    args = parser.parse_args()
+
+    data = load_backtest_rows()
+    if len(data["actual_price"]) < args.min_rows:
+        logger.error(f"Only {len(data['actual_price'])} predictions have an actual price; need at least {args.min_rows}")
+        return 1
+
+    config = load_config()
+    backtest = Backtest(data, config)
+    start = base_candidate(config)
+    baseline = float(backtest.evaluate(start)[0])
+
+    evaluate = Evaluator(backtest, workers=args.workers)
+    began = time.perf_counter()
+    try:
+        if args.search == "random":
+            best, best_loss = random_search(evaluate, start, args.candidates, seed=args.seed)
+        elif args.search == "grid":
+            best, best_loss = grid_search(evaluate, start, args.grid_steps)
+        else:
+            best, best_loss = coordinate_descent(evaluate, start, rounds=args.rounds)
+    finally:
+        evaluate.close()
+    elapsed = time.perf_counter() - began
+
+    logger.info(
+        f"Evaluated {evaluate.evaluated} candidates on {len(backtest)} IPOs in {elapsed:.2f}s "
+        f"({evaluate.evaluated / elapsed:,.0f} candidates/s)"
+    )
+
+    if best_loss >= baseline:
+        logger.info(f"No candidate beats the current weights (listing gain MAE {baseline:.4f})")
+        return 0
+
+    calibrated = backtest.config_for(best)
+    calibrated["calibration"] = {
+        "search": args.search,
+        "rows": len(backtest),
+        "mae_listing_gain": round(backtest.kernel_loss(calibrated), 6),
+        "baseline_mae_listing_gain": round(baseline, 6)
+    }
+    logger.info(
+        f"Listing gain MAE {baseline:.4f} -> {calibrated['calibration']['mae_listing_gain']:.4f} "
+        f"with weights {calibrated['weights']}, small cap bonus {calibrated['small_cap_bonus']}"
+    )
+
+    if not args.dry_run:
+        save_config(calibrated, args.output)
+        logger.info(f"Saved weights version {calibrated['version']} to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,418 @@
+import os
+import json
+import logging
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+from ipo_logger import LOG_FSYNC, get_store
+from log_store import FileLock, normalize_company_name
+from model_serving import get_model, prepare_features
+from scoring import get_kernel
+
+logger = logging.getLogger(__name__)
+
+# Directory of the append-only GMP snapshot log
+GMP_DIR = os.environ.get("IPO_GMP_DIR", "data/gmp")
+
+# Snapshots allocated per company up front; capacity doubles as a series grows
+INITIAL_CAPACITY = 16
+
+# Log columns holding the re-scored price of an open prediction; the logged
+# gmp and predicted_price stay as they were at prediction time
+RESCORE_COLUMNS = ("latest_gmp", "rescored_price")
+
+
+class GmpSeries:
+    """
+    GMP snapshots of one company, ordered by time.
+
+    Timestamps (Unix seconds), GMPs (₹) and the predicted price at each
+    snapshot (NaN when the company had no open prediction) are kept in
+    float64 arrays, 24 bytes per snapshot.
+
+    Args:
+        company_name (str): Company name as last uploaded
+    """
+
+    __slots__ = ("company_name", "_size", "_timestamps", "_gmp", "_predicted")
+
+    def __init__(self, company_name):
+        self.company_name = company_name
+        self._size = 0
+        self._timestamps = np.empty(INITIAL_CAPACITY)
+        self._gmp = np.empty(INITIAL_CAPACITY)
+        self._predicted = np.empty(INITIAL_CAPACITY)
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def nbytes(self):
+        return self._timestamps.nbytes + self._gmp.nbytes + self._predicted.nbytes
+
+    def add(self, timestamp, gmp, predicted_price):
+        """Insert a snapshot, keeping the series in time order"""
+        if self._size == len(self._timestamps):
+            for name in ("_timestamps", "_gmp", "_predicted"):
+                grown = np.empty(2 * self._size)
+                grown[:self._size] = getattr(self, name)
+                setattr(self, name, grown)
+
+        size = self._size
+        # Snapshots almost always arrive in order; late ones are inserted in place
+        if size and timestamp < self._timestamps[size - 1]:
+            position = int(np.searchsorted(self._timestamps[:size], timestamp, side="right"))
+            for array in (self._timestamps, self._gmp, self._predicted):
+                array[position + 1:size + 1] = array[position:size]
+        else:
+            position = size
+        self._timestamps[position] = timestamp
+        self._gmp[position] = gmp
+        self._predicted[position] = np.nan if predicted_price is None else predicted_price
+        self._size += 1
+
+    def latest_timestamp(self):
+        return float(self._timestamps[self._size - 1]) if self._size else None
+
+    def points(self, start=None, end=None):
+        """
+        Snapshots between ``start`` and ``end`` (Unix seconds, inclusive).
+
+        Returns:
+            list: Dicts with timestamp, gmp and predicted_price (None when unknown)
+        """
+        timestamps = self._timestamps[:self._size]
+        lo = 0 if start is None else int(np.searchsorted(timestamps, start, side="left"))
+        hi = self._size if end is None else int(np.searchsorted(timestamps, end, side="right"))
+        predicted = self._predicted[lo:hi].tolist()
+        return [
+            {'timestamp': timestamp, 'gmp': gmp, 'predicted_price': None if price != price else round(price, 2)}
+            for timestamp, gmp, price in zip(timestamps[lo:hi].tolist(), self._gmp[lo:hi].tolist(), predicted)
+        ]
+
+
+class GmpSeriesStore:
+    """
+    Append-only log of GMP snapshots, with every company's series in memory.
+
+    Each upload is appended as one JSON line holding its snapshots, and the
+    re-scores of open predictions it caused, as column arrays. Every process
+    replays the lines it has not seen yet before reading (checked with
+    ``stat``, so an unchanged log costs no reads), and writers serialise on a
+    file lock, so gunicorn workers share one consistent set of series.
+
+    The re-scores are copied into the prediction log by ``replay_rescores``,
+    which records how far it got in the ``applied`` file. A writer that
+    dies between the append and the copy leaves the line unapplied, and the
+    next writer applies it; setting the re-score columns is idempotent, so
+    applying a line twice is harmless.
+
+    Args:
+        directory (str): Directory holding the snapshot log
+        fsync (bool): Fsync every append
+    """
+
+    def __init__(self, directory=GMP_DIR, fsync=True):
+        self.directory = directory
+        self.fsync = fsync
+        self._path = os.path.join(directory, "snapshots.jsonl")
+        self._applied_path = os.path.join(directory, "applied")
+        self._lock = threading.RLock()
+        self._file_lock = FileLock(os.path.join(directory, "LOCK"))
+        self._series = {}
+        self._offset = 0
+        self._snapshots = 0
+
+    def open(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self.refresh()
+        return self
+
+    def refresh(self, recover=False):
+        """Replay snapshots appended since the last read (by this or another process)"""
+        with self._lock:
+            try:
+                size = os.stat(self._path).st_size
+            except FileNotFoundError:
+                return
+            if size == self._offset:
+                return
+
+            with open(self._path, "rb") as f:
+                f.seek(self._offset)
+                data = f.read()
+            end = data.rfind(b"\n") + 1
+            for line in data[:end].splitlines():
+                if line:
+                    self._apply(json.loads(line))
+            self._offset += end
+
+            if recover and end < len(data):
+                logger.warning(f"Truncating torn record at end of {self._path}")
+                with open(self._path, "r+b") as f:
+                    f.truncate(self._offset)
+
+    def _apply(self, record):
+        # Records written before re-scores were logged hold the snapshot columns at the top level
+        record = record.get("snapshots", record)
+        for company_name, timestamp, gmp, predicted_price in zip(
+            record["company_name"], record["timestamp"], record["gmp"], record["predicted_price"]
+        ):
+            key = normalize_company_name(company_name)
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = GmpSeries(company_name)
+            series.company_name = company_name
+            series.add(timestamp, gmp, predicted_price)
+            self._snapshots += 1
+
+    @contextmanager
+    def writing(self):
+        """Hold the write locks, caught up with every other process's snapshots"""
+        with self._lock, self._file_lock:
+            self.refresh(recover=True)
+            yield self
+
+    def append(self, snapshots, rescores=()):
+        """
+        Append snapshots and the re-scores they caused in one durable write; call inside ``writing()``.
+
+        Args:
+            snapshots (list): Dicts with company_name, timestamp, gmp and predicted_price
+            rescores (list): (row_id, latest_gmp, rescored_price) of open predictions,
+                copied into the prediction log by ``replay_rescores``
+        """
+        if not snapshots:
+            return
+        record = {
+            "snapshots": {column: [s[column] for s in snapshots] for column in ("company_name", "timestamp", "gmp", "predicted_price")},
+            "rescores": {column: [r[i] for r in rescores] for i, column in enumerate(("id",) + RESCORE_COLUMNS)}
+        }
+        payload = (json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8")
+        with open(self._path, "ab") as f:
+            f.write(payload)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        self._apply(record)
+        self._offset += len(payload)
+
+    def _read_applied(self):
+        try:
+            with open(self._applied_path, "r") as f:
+                return int(f.read().strip() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def replay_rescores(self, update_rows):
+        """
+        Copy re-scores not yet applied into the prediction log; call inside ``writing()``.
+
+        Args:
+            update_rows (callable): Applies ``[(row_ids, fields)]`` in one write
+                (``PredictionLogStore.update_rows``)
+
+        Returns:
+            int: Number of predictions updated
+        """
+        applied = self._read_applied()
+        if applied >= self._offset:
+            return 0
+
+        with open(self._path, "rb") as f:
+            f.seek(applied)
+            data = f.read(self._offset - applied)
+        updates = []
+        for line in data.splitlines():
+            rescores = json.loads(line).get("rescores") if line else None
+            if rescores:
+                updates += [
+                    ([row_id], dict(zip(RESCORE_COLUMNS, values)))
+                    for row_id, *values in zip(rescores["id"], *(rescores[c] for c in RESCORE_COLUMNS))
+                ]
+        if updates:
+            update_rows(updates)
+
+        tmp_path = self._applied_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(str(self._offset))
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp_path, self._applied_path)
+        return len(updates)
+
+    def reading(self):
+        """Hold the lock while reading a series, so no snapshot is added meanwhile"""
+        return self._lock
+
+    def get(self, company_name):
+        """The series of a company (matched after normalisation), or None"""
+        with self._lock:
+            self.refresh()
+            return self._series.get(normalize_company_name(company_name))
+
+    def stats(self):
+        with self._lock:
+            self.refresh()
+            return {
+                'companies': len(self._series),
+                'snapshots': self._snapshots,
+                'memory_bytes': sum(series.nbytes for series in self._series.values())
+            }
+
+
+class OpenPredictionScorer:
+    """
+    Re-scores open predictions (no actual price yet) at a new GMP.
+
+    With the heuristic kernel only the GMP term of the weighted score is
+    recomputed: the other contributions of each open row are cached per
+    weights config, so a new GMP costs one clamp, multiply and sum
+    (``ScoringKernel.rescore_gmp``). A trained model is not additive, so
+    with one loaded the rows are re-predicted in one batched call.
+    """
+
+    def __init__(self):
+        self._contributions = {}
+        self._lock = threading.Lock()
+
+    def forget(self, row_ids):
+        """Drop the cached contributions of rows that are no longer open"""
+        with self._lock:
+            for row_id in row_ids:
+                self._contributions.pop(row_id, None)
+
+    def prices(self, items):
+        """
+        Predicted prices of open rows at new GMPs.
+
+        Args:
+            items (list): (row_id, row, gmp) tuples
+
+        Returns:
+            list: Predicted price in ₹ per item
+        """
+        if not items:
+            return []
+        model = get_model()
+        if model is not None:
+            features = prepare_features([{**row, 'gmp': gmp} for _, row, gmp in items])
+            return model.predict_prices(features).tolist()
+
+        kernel = get_kernel()
+        prices = []
+        with self._lock:
+            for row_id, row, gmp in items:
+                issue_price = float(row["issue_price"])
+                market_cap = float(row["market_cap"])
+                cached = self._contributions.get(row_id)
+                if cached is None or cached[0] is not kernel:
+                    _, _, contributions = kernel.score(
+                        issue_price, gmp, market_cap, float(row["roce"]), float(row["roe"]), float(row["industry_growth"])
+                    )
+                    cached = self._contributions[row_id] = (kernel, contributions)
+                prices.append(kernel.rescore_gmp(issue_price, gmp, market_cap, cached[1])[0])
+        return prices
+
+
+_store = None
+_store_lock = threading.Lock()
+_scorer = OpenPredictionScorer()
+
+def get_gmp_store():
+    """Get the process-wide GMP snapshot store, opening it on first use"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = GmpSeriesStore(GMP_DIR, fsync=LOG_FSYNC).open()
+    return _store
+
+def _open_rows(company_name):
+    """Logged predictions of a company without an actual price, oldest first"""
+    rows = get_store().company_rows(company_name)
+    _scorer.forget([row_id for row_id, row in rows if row.get("actual_price") is not None])
+    return [
+        (row_id, row) for row_id, row in rows
+        if row.get("actual_price") is None and row.get("issue_price")
+        and all(row.get(c) is not None for c in ("market_cap", "roce", "roe", "industry_growth"))
+    ]
+
+def record_snapshots(snapshots):
+    """
+    Store GMP snapshots and re-score the open predictions they affect.
+
+    Each snapshot is stored with the predicted price of the company's latest
+    open prediction at that GMP, which makes up the prediction trajectory.
+    When a company's newest snapshot is in this upload, its open predictions
+    get that GMP and the re-scored price in their ``latest_gmp`` and
+    ``rescored_price`` columns (one WAL write for the whole upload); the
+    GMP and price they were predicted with are kept. The snapshots and
+    re-scores are appended as one record first, so an interrupted upload
+    is completed by the next one (see ``GmpSeriesStore``).
+
+    Args:
+        snapshots (list): Dicts with company_name, timestamp (Unix seconds)
+            and gmp (₹), already validated
+
+    Returns:
+        dict: Numbers of snapshots stored, companies and predictions re-scored
+    """
+    by_company = {}
+    for snapshot in snapshots:
+        by_company.setdefault(normalize_company_name(snapshot["company_name"]), []).append(snapshot)
+
+    store = get_gmp_store()
+    with store.writing():
+        # Finish an upload whose writer stopped before updating the log
+        store.replay_rescores(get_store().update_rows)
+        stored = []
+        rescores = []
+        for company_snapshots in by_company.values():
+            company_name = company_snapshots[-1]["company_name"]
+            company_snapshots.sort(key=lambda s: s["timestamp"])
+            open_rows = _open_rows(company_name)
+
+            # Trajectory points follow the latest open prediction
+            if open_rows:
+                row_id, row = open_rows[-1]
+                prices = _scorer.prices([(row_id, row, s["gmp"]) for s in company_snapshots])
+            else:
+                prices = [None] * len(company_snapshots)
+            stored += [{**s, "predicted_price": price} for s, price in zip(company_snapshots, prices)]
+
+            # Older snapshots uploaded late only fill in the trajectory
+            series = store.get(company_name)
+            newest = company_snapshots[-1]
+            if open_rows and (series is None or newest["timestamp"] >= series.latest_timestamp()):
+                new_prices = _scorer.prices([(row_id, row, newest["gmp"]) for row_id, row in open_rows])
+                rescores += [
+                    (row_id, newest["gmp"], round(price, 2))
+                    for (row_id, _), price in zip(open_rows, new_prices)
+                ]
+
+        store.append(stored, rescores)
+        store.replay_rescores(get_store().update_rows)
+
+    return {'ingested': len(stored), 'companies': len(by_company), 'rescored': len(rescores)}
+
+def get_trajectory(company_name, start=None, end=None):
+    """
+    Get the GMP snapshots and predicted prices of a company over time.
+
+    Args:
+        company_name (str): Company name (case- and whitespace-insensitive)
+        start (float, optional): Earliest snapshot time, Unix seconds
+        end (float, optional): Latest snapshot time, Unix seconds
+
+    Returns:
+        dict: company_name and points, or None if no snapshot was uploaded
+    """
+    store = get_gmp_store()
+    with store.reading():
+        series = store.get(company_name)
+        if series is None:
+            return None
+        return {'company_name': series.company_name, 'points': series.points(start, end)}
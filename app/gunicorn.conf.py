@@ -0,0 +1,34 @@
+"""
+Gunicorn settings for the API. Run from the app directory:
+
+    gunicorn -c gunicorn.conf.py
+
+The app is built once in the master (``preload_app``), which then loads
+the heavy modules, model and prediction log before forking, and workers
+share those pages copy-on-write.
+"""
+import gc
+import os
+import multiprocessing
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 10000)}"  # 10000 is Render's default
+
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+
+# Threads per worker; concurrent requests share log writes and model calls
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+
+# api builds its app on import; naming create_app here would build a second one
+wsgi_app = "api:app"
+preload_app = True
+
+def when_ready(server):
+    # Runs in the master after the app is loaded and before workers are forked
+    import handlers
+
+    handlers.warm_up()
+
+    # Objects loaded by the master live for the whole process; freezing them
+    # keeps garbage collection in the workers from touching (and so copying)
+    # the shared pages
+    gc.freeze()
@@ -0,0 +1,589 @@
+"""
+Request handling shared by the Flask app (api.py) and the async service (service.py).
+
+Handlers take already-parsed request data and return ``(payload, status)``,
+so each web framework only decodes the request and encodes the response.
+All of them block (scoring, model calls, log reads and writes); the async
+service runs them on its executors.
+"""
+import json
+import math
+import time
+import logging
+import importlib
+from datetime import datetime
+
+from ipo_logger import get_store, log_prediction, update_actual_price, update_actual_prices, query_prediction_history, get_history_cache, get_accuracy
+from log_store import COLUMNS
+from scoring import FACTORS, get_kernel
+from model_serving import prepare_features, get_model, predict_price, inference_batcher
+from prediction_memo import prediction_memo
+from http_cache import response_cache
+from instrumentation import stage
+
+logger = logging.getLogger(__name__)
+
+# Page size limits for /api/history
+DEFAULT_HISTORY_LIMIT = 100
+MAX_HISTORY_LIMIT = 1000
+
+def warm_up():
+    """
+    Import the heavy modules and load the scoring kernel, model and
+    prediction log now.
+
+    Called in the gunicorn master when preloading, so workers inherit these
+    pages copy-on-write instead of each loading them on first use.
+    """
+    importlib.import_module("pandas")
+    get_kernel()
+    get_model()
+    get_store()
+
+def lookup_sentiment(company_name):
+    """
+    Precomputed news sentiment of a company as prediction response fields.
+
+    On a miss a background refresh is queued and the prediction proceeds
+    with neutral sentiment.
+
+    Returns:
+        dict: sentiment_score, sentiment_status, sentiment_age_seconds and news_articles
+    """
+    from sentiment_scheduler import get_precomputed_sentiment
+
+    with stage("sentiment"):
+        precomputed = get_precomputed_sentiment(company_name)
+    if precomputed is None:
+        return {'sentiment_score': 0.0, 'sentiment_status': 'pending', 'sentiment_age_seconds': None, 'news_articles': []}
+
+    sentiment_score, analyzed_articles, sentiment_age = precomputed
+    return {
+        'sentiment_score': sentiment_score,
+        'sentiment_status': 'precomputed',
+        'sentiment_age_seconds': round(sentiment_age, 1),
+        'news_articles': analyzed_articles or []
+    }
+
+def predict(data, sentiment=None):
+    """
+    Predict the listing price of one IPO and log the prediction.
+
+    Responses are memoized (see ``PredictionMemo``), so resubmitting the same
+    inputs returns the earlier result and only counts the repeat in the log.
+
+    Args:
+        data (dict): Request body with the company name and the scorer inputs
+        sentiment (dict, optional): Fields from ``lookup_sentiment`` to log and
+            include in the response
+
+    Returns:
+        tuple: (response payload, HTTP status)
+    """
+    try:
+        logger.info(f"Received prediction request: {data}")
+
+        with stage("validation"):
+            # Validate required fields
+            if not isinstance(data, dict):
+                return {'error': 'Request body must be a JSON object'}, 400
+            required_fields = ['company_name', 'issue_price', 'market_cap', 'gmp', 'roce', 'roe', 'industry_growth']
+            for field in required_fields:
+                if field not in data:
+                    return {'error': f'Missing required field: {field}'}, 400
+
+            # Convert all inputs to float
+            issue_price = float(data['issue_price'])
+            gmp = float(data['gmp'])
+            market_cap = float(data['market_cap'])
+            roce = float(data['roce'])
+            roe = float(data['roe'])
+            industry_growth = float(data['industry_growth'])
+
+        # Use the trained model when one is available; the breakdown still
+        # explains the heuristic factors
+        kernel = get_kernel()
+        model = get_model()
+        prediction_source = f"model:{model.version}" if model is not None else f"heuristic:{kernel.version}"
+
+        # A repeat of a memoized prediction skips scoring and only counts the repeat in the log;
+        # the key covers the weights' content, since the breakdown always comes from them
+        memo_key = prediction_memo.key(
+            data['company_name'], (issue_price, gmp, market_cap, roce, roe, industry_growth),
+            f"{prediction_source}:{kernel.fingerprint}"
+        )
+        memoized = prediction_memo.get(memo_key)
+        if memoized is not None:
+            predicted_price, response = memoized
+            response = dict(response)
+        else:
+            with stage("scoring"):
+                # Score with the shared kernel
+                predicted_price, weighted_score, contributions = kernel.score(
+                    issue_price, gmp, market_cap, roce, roe, industry_growth
+                )
+
+                # Prepare calculation breakdown
+                calculation_breakdown = kernel.breakdown(market_cap, weighted_score, contributions)
+
+            if model is not None:
+                with stage("model"):
+                    predicted_price = predict_price(model, prepare_features(data))
+
+            # Calculate expected return
+            expected_return = ((predicted_price - issue_price) / issue_price) * 100
+
+            logger.info(f"Calculation breakdown: {calculation_breakdown}")
+
+            response = {
+                'predicted_price': round(predicted_price, 2),
+                'expected_return': round(expected_return, 2),
+                'calculation_breakdown': calculation_breakdown,
+                'prediction_source': prediction_source
+            }
+            prediction_memo.put(memo_key, (predicted_price, dict(response)))
+
+        # Log prediction
+        prediction_data = {
+            "company_name": data['company_name'],
+            "issue_price": issue_price,
+            "predicted_price": predicted_price,
+            "market_cap": market_cap,
+            "gmp": gmp,
+            "industry_growth": industry_growth,
+            "roce": roce,
+            "roe": roe
+        }
+        if sentiment is not None:
+            prediction_data["sentiment_score"] = sentiment['sentiment_score']
+        with stage("log_write"):
+            # The first write of a memoized prediction already made it durable,
+            # so repeats are only queued
+            log_prediction(prediction_data, wait=memoized is None)
+
+        if sentiment is not None:
+            response.update(sentiment)
+        return response, 200
+
+    except Exception as e:
+        logger.error(f"Error in prediction: {str(e)}")
+        return {'error': str(e)}, 500
+
+def _round_list(values):
+    return [round(value, 2) for value in values.tolist()]
+
+def predict_batch(data=None, csv_file=None):
+    """
+    Score many IPOs in one vectorized pass.
+
+    Accepts a CSV file or JSON: a list of rows, ``{"rows": [...]}``, or
+    column arrays keyed by factor name. Batch predictions are not written
+    to the prediction log.
+
+    Args:
+        data (list or dict, optional): Parsed JSON body
+        csv_file (file, optional): Uploaded CSV, used instead of ``data``
+
+    Returns:
+        tuple: (response payload, HTTP status)
+    """
+    # pandas is only needed here, so it is not imported at startup
+    import pandas as pd
+
+    try:
+        # Load the input rows into a DataFrame
+        if csv_file is not None:
+            df = pd.read_csv(csv_file)
+        else:
+            if isinstance(data, dict) and 'rows' in data:
+                data = data['rows']
+            if not data:
+                return {'error': 'No rows to score'}, 400
+            df = pd.DataFrame(data)
+
+        # Validate required columns and values
+        missing = [field for field in FACTORS if field not in df.columns]
+        if missing:
+            return {'error': f"Missing required field: {', '.join(missing)}"}, 400
+
+        numeric = df[FACTORS].apply(pd.to_numeric, errors='coerce')
+        invalid = numeric.isna().any(axis=1) | (numeric['issue_price'] <= 0)
+        if invalid.any():
+            rows = invalid[invalid].index.tolist()[:10]
+            return {'error': f'Invalid numeric values in rows: {rows}'}, 400
+
+        kernel = get_kernel()
+        with stage("scoring"):
+            result = kernel.score_frame(numeric)
+
+        # A trained model replaces the heuristic price with one batched predict call
+        model = get_model()
+        if model is not None:
+            with stage("model"):
+                result['predicted_price'] = model.predict_prices(prepare_features(numeric))
+            result['expected_return'] = ((result['predicted_price'] - numeric['issue_price']) / numeric['issue_price']) * 100
+            prediction_source = f"model:{model.version}"
+        else:
+            prediction_source = f"heuristic:{kernel.version}"
+
+        # Build per-row responses matching the single prediction endpoint
+        columns = {
+            'predicted_price': _round_list(result['predicted_price']),
+            'expected_return': _round_list(result['expected_return']),
+            'gmp_contribution': _round_list(result['gmp_contribution']),
+            'market_cap_contribution': _round_list(result['market_cap_contribution']),
+            'roce_contribution': _round_list(result['roce_contribution']),
+            'roe_contribution': _round_list(result['roe_contribution']),
+            'industry_growth_contribution': _round_list(result['industry_growth_contribution']),
+            'total_contribution': _round_list(result['weighted_score'] * 100)
+        }
+        small_cap = result['small_cap'].tolist()
+        company_names = df['company_name'].tolist() if 'company_name' in df.columns else [None] * len(df)
+
+        predictions = []
+        for i in range(len(df)):
+            predictions.append({
+                'company_name': company_names[i],
+                'predicted_price': columns['predicted_price'][i],
+                'expected_return': columns['expected_return'][i],
+                'calculation_breakdown': {
+                    'gmp_contribution': columns['gmp_contribution'][i],
+                    'market_cap_contribution': columns['market_cap_contribution'][i],
+                    'roce_contribution': columns['roce_contribution'][i],
+                    'roe_contribution': columns['roe_contribution'][i],
+                    'industry_growth_contribution': columns['industry_growth_contribution'][i],
+                    'small_cap_bonus': kernel.small_cap_label if small_cap[i] else "0%",
+                    'total_contribution': columns['total_contribution'][i]
+                }
+            })
+
+        return {'count': len(predictions), 'prediction_source': prediction_source, 'predictions': predictions}, 200
+
+    except Exception as e:
+        logger.error(f"Error in batch prediction: {str(e)}")
+        return {'error': str(e)}, 500
+
+def model_stats():
+    model = get_model()
+    return {
+        'model_version': model.version if model is not None else None,
+        'weights_version': get_kernel().version,
+        'prediction_memo': prediction_memo.stats(),
+        'inference_batching': inference_batcher.stats()
+    }, 200
+
+def accuracy():
+    try:
+        return get_accuracy(), 200
+    except Exception as e:
+        logger.error(f"Error computing accuracy: {str(e)}")
+        return {'error': str(e)}, 500
+
+def history_stats():
+    cache = get_history_cache()
+    stats = {'enabled': False} if cache is None else cache.stats()
+    stats['response_cache'] = response_cache.stats()
+    # Row and byte totals of the live and archived log segments
+    stats['segments'] = {
+        kind: {
+            'count': len(segments),
+            'rows': sum(segment['rows'] for segment in segments),
+            'bytes': sum(segment['bytes'] for segment in segments)
+        }
+        for kind, segments in get_store().segments().items()
+    }
+    return stats, 200
+
+def update_price(data):
+    """
+    Record the actual listing price of one company.
+
+    Returns:
+        tuple: (response payload, HTTP status)
+    """
+    try:
+        company_name = data.get('company_name')
+        actual_price = float(data.get('actual_price', 0))
+        listing_date = data.get('listing_date')
+
+        if not company_name or not company_name.strip():
+            return {"error": "Please enter a valid company name."}, 400
+
+        if actual_price <= 0:
+            return {"error": "Please enter a valid listing price."}, 400
+
+        with stage("log_write"):
+            success, message = update_actual_price(company_name, actual_price, listing_date)
+
+        if success:
+            return {"message": message}, 200
+        else:
+            return {"error": message}, 404
+
+    except Exception as e:
+        logger.error(f"Error updating price: {str(e)}")
+        return {"error": str(e)}, 500
+
+def update_prices(data):
+    """
+    Record many listing prices with a single write.
+
+    Invalid entries are reported without blocking the rest.
+
+    Returns:
+        tuple: (response payload, HTTP status)
+    """
+    try:
+        updates = data.get('updates') if isinstance(data, dict) else data
+
+        if not isinstance(updates, list) or not updates:
+            return {"error": "Please provide a list of price updates."}, 400
+
+        # Validate each update; invalid entries are reported without blocking the rest
+        results = [None] * len(updates)
+        valid = []
+        positions = []
+        for i, update in enumerate(updates):
+            company_name = update.get('company_name') if isinstance(update, dict) else None
+            if not company_name or not str(company_name).strip():
+                results[i] = {"company_name": company_name, "success": False, "error": "Please enter a valid company name."}
+                continue
+            try:
+                actual_price = float(update.get('actual_price', 0))
+            except (TypeError, ValueError):
+                actual_price = 0
+            if actual_price <= 0:
+                results[i] = {"company_name": company_name, "success": False, "error": "Please enter a valid listing price."}
+                continue
+            valid.append({
+                "company_name": company_name,
+                "actual_price": actual_price,
+                "listing_date": update.get('listing_date')
+            })
+            positions.append(i)
+
+        # Apply all valid updates with a single write
+        with stage("log_write"):
+            outcomes = update_actual_prices(valid)
+        for i, (success, message) in zip(positions, outcomes):
+            key = "message" if success else "error"
+            results[i] = {"company_name": updates[i]['company_name'], "success": success, key: message}
+
+        return {
+            "updated": sum(1 for result in results if result["success"]),
+            "results": results
+        }, 200
+
+    except Exception as e:
+        logger.error(f"Error updating prices: {str(e)}")
+        return {"error": str(e)}, 500
+
+def parse_history_args(args):
+    """
+    Parse /api/history query parameters.
+
+    Args:
+        args (Mapping): Query parameters
+
+    Returns:
+        tuple: (query_prediction_history arguments, row limit or None, True for ndjson)
+
+    Raises:
+        ValueError: If a parameter is invalid
+    """
+    has_actual = args.get('has_actual')
+    if has_actual is not None:
+        if has_actual.lower() not in ('true', 'false', '1', '0'):
+            raise ValueError("has_actual must be true or false")
+        has_actual = has_actual.lower() in ('true', '1')
+
+    columns = None
+    if args.get('fields'):
+        columns = [field.strip() for field in args['fields'].split(',') if field.strip()]
+        unknown = [field for field in columns if field not in COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+
+    order = args.get('order', 'desc')
+    if order not in ('asc', 'desc'):
+        raise ValueError("order must be asc or desc")
+
+    ndjson = args.get('format') == 'ndjson'
+    cursor = _parse_int_arg(args, 'cursor', 0, None, "cursor must be the non-negative integer next_cursor of a previous page")
+    # ndjson streams every matching row, so only pages are capped
+    if ndjson:
+        limit = _parse_int_arg(args, 'limit', 1, None, "limit must be a positive integer")
+    else:
+        limit = _parse_int_arg(args, 'limit', 1, MAX_HISTORY_LIMIT, f"limit must be an integer between 1 and {MAX_HISTORY_LIMIT}")
+    query = {
+        'cursor': cursor,
+        'descending': order == 'desc',
+        'company_prefix': args.get('company') or None,
+        'date_from': args.get('from') or None,
+        'date_to': args.get('to') or None,
+        'has_actual': has_actual,
+        'columns': columns
+    }
+    return query, limit, ndjson
+
+def _parse_int_arg(args, name, minimum, maximum, message):
+    """Integer query parameter within [minimum, maximum] (None when absent or empty)"""
+    value = args.get(name)
+    if not value:
+        return None
+    try:
+        number = int(value)
+    except ValueError:
+        raise ValueError(message) from None
+    if number < minimum or (maximum is not None and number > maximum):
+        raise ValueError(message)
+    return number
+
+def history_page(query, limit=None):
+    """
+    One page of the prediction history.
+
+    Returns:
+        tuple: (response payload, HTTP status)
+    """
+    try:
+        limit = min(max(limit or DEFAULT_HISTORY_LIMIT, 1), MAX_HISTORY_LIMIT)
+        with stage("history_query"):
+            rows, next_cursor = query_prediction_history(limit=limit, **query)
+
+        return {
+            'history': rows,
+            'count': len(rows),
+            'next_cursor': next_cursor
+        }, 200
+    except Exception as e:
+        logger.error(f"Error fetching prediction history: {str(e)}")
+        return {'error': str(e)}, 500
+
+def history_key(query, limit=None):
+    """Response cache key of a history page: the parsed query, so equivalent URLs share it"""
+    return ('history', repr(sorted(query.items())), limit)
+
+def cached_read(key, build, if_none_match=None, accept_encoding=None):
+    """
+    Answer a read endpoint through the response cache.
+
+    The prediction log's version is checked first (two ``stat`` calls when
+    nothing was written), so a client holding the current ETag gets a 304
+    without the response being built.
+
+    Args:
+        key (tuple): Route and normalised query
+        build (callable): Handler returning (payload, HTTP status)
+        if_none_match (str, optional): If-None-Match request header
+        accept_encoding (str, optional): Accept-Encoding request header
+
+    Returns:
+        tuple: (HTTP status, body bytes, headers dict)
+    """
+    with stage("log_version"):
+        version = get_store().version()
+    return response_cache.respond(key, version, build, if_none_match, accept_encoding)
+
+def history_lines(query, limit=None):
+    """Every matching history row (up to ``limit``) as ndjson lines, read a page at a time"""
+    query = dict(query)
+    remaining = limit
+    cursor = query.pop('cursor')
+    while remaining is None or remaining > 0:
+        page_size = MAX_HISTORY_LIMIT if remaining is None else min(remaining, MAX_HISTORY_LIMIT)
+        rows, cursor = query_prediction_history(cursor=cursor, limit=page_size, **query)
+        for row in rows:
+            yield json.dumps(row) + "\n"
+        if remaining is not None:
+            remaining -= len(rows)
+        if cursor is None:
+            break
+
+def _parse_timestamp(value):
+    """Unix seconds from a number or an ISO 8601 string (None means now)"""
+    if value is None:
+        return time.time()
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+    return float(value)
+
+def ingest_gmp(data):
+    """
+    Store a bulk upload of GMP snapshots and re-score open predictions.
+
+    Accepts a list of snapshots or ``{"snapshots": [...]}``; each has a
+    company_name, a gmp (₹) and an optional timestamp (Unix seconds or
+    ISO 8601, default now). Invalid entries are reported without blocking
+    the rest.
+
+    Returns:
+        tuple: (response payload, HTTP status)
+    """
+    from gmp_series import record_snapshots
+
+    try:
+        snapshots = data.get('snapshots') if isinstance(data, dict) else data
+        if not isinstance(snapshots, list) or not snapshots:
+            return {'error': 'Please provide a list of GMP snapshots.'}, 400
+
+        valid = []
+        errors = []
+        for i, snapshot in enumerate(snapshots):
+            company_name = snapshot.get('company_name') if isinstance(snapshot, dict) else None
+            if not company_name or not str(company_name).strip():
+                errors.append({'index': i, 'error': 'Please enter a valid company name.'})
+                continue
+            try:
+                gmp = float(snapshot['gmp'])
+                timestamp = _parse_timestamp(snapshot.get('timestamp'))
+            except (KeyError, TypeError, ValueError):
+                errors.append({'index': i, 'error': 'Please enter a valid GMP and timestamp.'})
+                continue
+            if not (math.isfinite(gmp) and math.isfinite(timestamp)):
+                errors.append({'index': i, 'error': 'Please enter a valid GMP and timestamp.'})
+                continue
+            valid.append({'company_name': str(company_name), 'timestamp': timestamp, 'gmp': gmp})
+
+        result = {'ingested': 0, 'companies': 0, 'rescored': 0}
+        if valid:
+            with stage("log_write"):
+                result = record_snapshots(valid)
+        return {**result, 'errors': errors}, 200
+
+    except Exception as e:
+        logger.error(f"Error ingesting GMP snapshots: {str(e)}")
+        return {'error': str(e)}, 500
+
+def gmp_trajectory(args):
+    """
+    GMP snapshots and predicted prices of one company over time.
+
+    Query parameters: ``company`` (required) and ``from``/``to`` (Unix
+    seconds or ISO 8601).
+
+    Returns:
+        tuple: (response payload, HTTP status)
+    """
+    from gmp_series import get_trajectory
+
+    company_name = args.get('company')
+    if not company_name or not company_name.strip():
+        return {'error': 'Please enter a valid company name.'}, 400
+    try:
+        start = _parse_timestamp(args['from']) if args.get('from') else None
+        end = _parse_timestamp(args['to']) if args.get('to') else None
+    except ValueError:
+        return {'error': 'from and to must be Unix seconds or ISO 8601 times'}, 400
+
+    try:
+        trajectory = get_trajectory(company_name, start, end)
+        if trajectory is None:
+            return {'error': 'No GMP snapshots for this company'}, 404
+        return {**trajectory, 'count': len(trajectory['points'])}, 200
+    except Exception as e:
+        logger.error(f"Error reading GMP trajectory: {str(e)}")
+        return {'error': str(e)}, 500
@@ -0,0 +1,235 @@
+import os
+import sys
+import logging
+import threading
+
+import numpy as np
+
+from log_store import normalize_company_name
+from storage_backends import COLUMNS, STRING_COLUMNS, coerce_value
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on the memory of the cached history; past it the cache is dropped
+# and reads fall back to the store
+HISTORY_CACHE_MAX_MB = float(os.environ.get("IPO_HISTORY_CACHE_MAX_MB", 256))
+
+NUMERIC_COLUMNS = [c for c in COLUMNS if c not in STRING_COLUMNS]
+
+# Rows allocated up front; capacity doubles as the history grows
+INITIAL_CAPACITY = 1024
+
+
+class HistoryCache:
+    """
+    Memory-resident, typed view of the prediction history.
+
+    Numeric columns are float64 arrays (NaN for missing values) and string
+    columns are int32 codes into a table of distinct values, indexed by row
+    id minus the smallest live id (the store assigns ids sequentially, and
+    only archiving removes rows, mostly the oldest ones; a mask marks the
+    positions holding a row). The cache observes a ``PredictionLogStore`` (see
+    ``add_observer``), so it is rebuilt when the store loads a new generation
+    and updated in place for every insert and update, whether written by
+    this process or replayed from another one.
+
+    If the arrays would grow past ``max_bytes`` the cache disables itself
+    and ``enabled`` becomes False; callers then read from the store.
+
+    Args:
+        max_bytes (int, optional): Memory limit of the arrays and string
+            tables; defaults to ``IPO_HISTORY_CACHE_MAX_MB``
+    """
+
+    def __init__(self, max_bytes=None):
+        self.max_bytes = max_bytes if max_bytes is not None else int(HISTORY_CACHE_MAX_MB * 2**20)
+        self.enabled = True
+        self._lock = threading.RLock()
+        self._counters = {"loads": 0, "inserts": 0, "updates": 0}
+        self._reset(INITIAL_CAPACITY)
+
+    def _reset(self, capacity):
+        self._size = 0
+        self._base = None
+        self._present = np.zeros(capacity, dtype=bool)
+        self._numeric = {c: np.full(capacity, np.nan) for c in NUMERIC_COLUMNS}
+        self._codes = {c: np.zeros(capacity, dtype=np.int32) for c in STRING_COLUMNS}
+        # Code 0 is the missing value
+        self._values = {c: [None] for c in STRING_COLUMNS}
+        self._lookup = {c: {None: 0} for c in STRING_COLUMNS}
+        self._string_bytes = 0
+
+    @property
+    def capacity(self):
+        return len(self._numeric["issue_price"])
+
+    def memory_bytes(self):
+        """Approximate memory held by the arrays and string tables"""
+        arrays = sum(a.nbytes for a in self._numeric.values()) + sum(a.nbytes for a in self._codes.values()) + self._present.nbytes
+        return arrays + self._string_bytes
+
+    def _grow(self, needed):
+        capacity = self.capacity
+        while capacity < needed:
+            capacity *= 2
+        projected = capacity * (8 * len(NUMERIC_COLUMNS) + 4 * len(STRING_COLUMNS) + 1) + self._string_bytes
+        if projected > self.max_bytes:
+            self._disable(projected)
+            return False
+
+        for c in NUMERIC_COLUMNS:
+            grown = np.full(capacity, np.nan)
+            grown[:self._size] = self._numeric[c][:self._size]
+            self._numeric[c] = grown
+        for c in STRING_COLUMNS:
+            grown = np.zeros(capacity, dtype=np.int32)
+            grown[:self._size] = self._codes[c][:self._size]
+            self._codes[c] = grown
+        grown = np.zeros(capacity, dtype=bool)
+        grown[:self._size] = self._present[:self._size]
+        self._present = grown
+        return True
+
+    def _disable(self, projected):
+        logger.warning(
+            f"History cache needs {projected / 2**20:.1f} MB, over the {self.max_bytes / 2**20:.1f} MB limit; "
+            "serving history from the store"
+        )
+        self.enabled = False
+        self._reset(1)
+
+    def _code(self, column, value):
+        value = coerce_value(column, value)
+        code = self._lookup[column].get(value)
+        if code is None:
+            code = len(self._values[column])
+            self._values[column].append(value)
+            self._lookup[column][value] = code
+            self._string_bytes += sys.getsizeof(value) + 16
+        return code
+
+    def _set(self, row_id, fields):
+        for column, value in fields.items():
+            if column in self._codes:
+                self._codes[column][row_id] = self._code(column, value)
+            elif column in self._numeric:
+                value = coerce_value(column, value)
+                self._numeric[column][row_id] = np.nan if value is None else value
+
+    # ------------------------------------------------------------------
+    # Store observer
+    # ------------------------------------------------------------------
+
+    def load(self, rows):
+        """Rebuild from the store's ``{row_id: row}`` dict"""
+        with self._lock:
+            if not self.enabled:
+                return
+            self._reset(INITIAL_CAPACITY)
+            if rows:
+                self._base = min(rows)
+                size = max(rows) - self._base + 1
+                if size > self.capacity and not self._grow(size):
+                    return
+                for row_id, row in rows.items():
+                    self._set(row_id - self._base, row)
+                    self._present[row_id - self._base] = True
+                self._size = size
+            self._counters["loads"] += 1
+
+    def apply(self, record, rows):
+        """Apply one insert or update record"""
+        with self._lock:
+            if not self.enabled:
+                return
+            if record["op"] == "insert":
+                if self._base is None:
+                    self._base = record["id"]
+                position = record["id"] - self._base
+                if position >= self.capacity and not self._grow(position + 1):
+                    return
+                self._set(position, record["row"])
+                self._present[position] = True
+                self._size = max(self._size, position + 1)
+                self._counters["inserts"] += 1
+            else:
+                for row_id in record["ids"]:
+                    position = row_id - (self._base or 0)
+                    if 0 <= position < self._size and self._present[position]:
+                        self._set(position, record["fields"])
+                self._counters["updates"] += 1
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def column(self, name):
+        """
+        Get a copy of one column.
+
+        Returns:
+            numpy.ndarray: float64 values (NaN when missing) for numeric
+                columns, object array of strings (None when missing) otherwise
+        """
+        with self._lock:
+            present = self._present[:self._size]
+            if name in self._numeric:
+                return self._numeric[name][:self._size][present]
+            return np.array(self._values[name], dtype=object)[self._codes[name][:self._size][present]]
+
+    def rows(self):
+        """
+        Get every row as a dict, in id order.
+
+        Returns:
+            list: Row dicts with missing values as None
+        """
+        with self._lock:
+            present = self._present[:self._size]
+            numeric = {c: self._numeric[c][:self._size][present].tolist() for c in NUMERIC_COLUMNS}
+            strings = {c: [self._values[c][code] for code in self._codes[c][:self._size][present].tolist()] for c in STRING_COLUMNS}
+
+        rows = []
+        for i in range(len(numeric["issue_price"])):
+            row = {}
+            for c in COLUMNS:
+                value = numeric[c][i] if c in numeric else strings[c][i]
+                row[c] = None if value != value else value
+            rows.append(row)
+        return rows
+
+    def open_companies(self):
+        """
+        Get the companies without an actual listing price.
+
+        Returns:
+            list: Company names, one per normalised name (most recent spelling)
+        """
+        with self._lock:
+            codes = self._codes["company_name"][:self._size]
+            open_codes = codes[np.isnan(self._numeric["actual_price"][:self._size]) & (codes != 0) & self._present[:self._size]]
+            names = self._values["company_name"]
+            companies = {}
+            for code in open_codes.tolist():
+                if names[code]:
+                    companies[normalize_company_name(names[code])] = names[code]
+        return list(companies.values())
+
+    def stats(self):
+        """
+        Get the size and memory use of the cache.
+
+        Returns:
+            dict: enabled, rows, capacity, memory_bytes, max_bytes, distinct
+                company names and load/insert/update counters
+        """
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "rows": int(self._present[:self._size].sum()),
+                "capacity": self.capacity,
+                "memory_bytes": self.memory_bytes(),
+                "max_bytes": self.max_bytes,
+                "companies": len(self._values["company_name"]) - 1,
+                **self._counters
+            }
@@ -0,0 +1,191 @@
+import os
+import gzip
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:  # optional: responses fall back to gzip
+    brotli = None
+
+# Serialised read responses kept per process
+RESPONSE_CACHE_SIZE = int(os.environ.get("IPO_RESPONSE_CACHE_SIZE", 256))
+
+# Bodies smaller than this many bytes are sent uncompressed
+COMPRESS_MIN_BYTES = int(os.environ.get("IPO_COMPRESS_MIN_BYTES", 1024))
+
+# Browsers keep the body but revalidate it with If-None-Match on every poll
+CACHE_CONTROL = "no-cache"
+
+
+def make_etag(key, version):
+    """Weak ETag of a response: the same for every encoding of the same body"""
+    digest = hashlib.blake2b(repr((key, version)).encode("utf-8"), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+
+def etag_matches(if_none_match, etag):
+    """True if an If-None-Match header lists ``etag`` (compared weakly) or is ``*``"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:]
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+def negotiate_encoding(accept_encoding):
+    """Best content coding the client accepts: "br" (when brotli is installed), "gzip" or None"""
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if coding:
+            accepted[coding.strip().lower()] = quality
+    for coding in ("br", "gzip"):
+        if coding == "br" and brotli is None:
+            continue
+        if accepted.get(coding, accepted.get("*", 0)) > 0:
+            return coding
+    return None
+
+
+class CachedResponse:
+    """
+    One serialised JSON response and its compressed variants.
+
+    Each encoding is compressed the first time a client asks for it and
+    then served from memory until the response goes stale.
+    """
+
+    __slots__ = ("etag", "status", "body", "_encoded", "_lock")
+
+    def __init__(self, etag, status, body):
+        self.etag = etag
+        self.status = status
+        self.body = body
+        self._encoded = {}
+        self._lock = threading.Lock()
+
+    def encoded(self, encoding):
+        """The body in ``encoding`` ("br", "gzip" or None for identity)"""
+        if encoding is None or len(self.body) < COMPRESS_MIN_BYTES:
+            return self.body
+        with self._lock:
+            data = self._encoded.get(encoding)
+            if data is None:
+                if encoding == "br":
+                    data = brotli.compress(self.body, quality=5)
+                else:
+                    data = gzip.compress(self.body, compresslevel=6, mtime=0)
+                self._encoded[encoding] = data
+            return data
+
+
+class ResponseCache:
+    """
+    Conditional and pre-serialised responses for read endpoints.
+
+    Responses are tagged with a weak ETag derived from the request key and
+    the prediction log's version (``PredictionLogStore.version``), which
+    only changes when a prediction or listing price is written. A request
+    whose If-None-Match holds the current tag is answered 304 after the
+    version check alone, without building the response or reading the log.
+    Otherwise the JSON is serialised and compressed once per version and
+    kept in an LRU of ``size`` responses, so repeated polls of an unchanged
+    log cost no serialisation either.
+
+    Args:
+        size (int): Maximum cached responses (0 disables the cache; ETags
+            and 304s still work)
+    """
+
+    def __init__(self, size=RESPONSE_CACHE_SIZE):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self._responses = OrderedDict()
+        self._lock = threading.Lock()
+
+    def respond(self, key, version, build, if_none_match=None, accept_encoding=None):
+        """
+        Answer a read request.
+
+        The version is read by the caller before the response is built, so
+        a write in between only makes the cached copy newer than its tag,
+        which the next request rebuilds.
+
+        Args:
+            key (tuple): Route and normalised query identifying the response
+            version: Current log version, from ``PredictionLogStore.version``
+            build (callable): Returns the (payload, HTTP status) of a fresh response
+            if_none_match (str, optional): The request's If-None-Match header
+            accept_encoding (str, optional): The request's Accept-Encoding header
+
+        Returns:
+            tuple: (HTTP status, body bytes, headers dict)
+        """
+        etag = make_etag(key, version)
+        headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL, "Vary": "Accept-Encoding"}
+        if etag_matches(if_none_match, etag):
+            with self._lock:
+                self.not_modified += 1
+            return 304, b"", headers
+
+        with self._lock:
+            response = self._responses.get(key)
+            if response is not None and response.etag == etag:
+                self.hits += 1
+                self._responses.move_to_end(key)
+            else:
+                response = None
+                self.misses += 1
+
+        if response is None:
+            payload, status = build()
+            response = CachedResponse(etag, status, json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8"))
+            if status != 200:
+                # Errors are neither cached nor tagged
+                return status, response.body, {"Content-Type": "application/json"}
+            if self.size > 0:
+                with self._lock:
+                    self._responses[key] = response
+                    self._responses.move_to_end(key)
+                    while len(self._responses) > self.size:
+                        self._responses.popitem(last=False)
+
+        encoding = negotiate_encoding(accept_encoding)
+        body = response.encoded(encoding)
+        headers["Content-Type"] = "application/json"
+        if body is not response.body:
+            headers["Content-Encoding"] = encoding
+        return response.status, body, headers
+
+    def clear(self):
+        with self._lock:
+            self._responses.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._responses),
+                'max_size': self.size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'not_modified': self.not_modified,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'brotli': brotli is not None
+            }
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,359 @@
+import os
+import sys
+import time
+import uuid
+import bisect
+import logging
+import threading
+import contextvars
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+# Set IPO_METRICS=1 to time request stages and serve Prometheus histograms on /metrics
+METRICS_ENABLED = os.environ.get("IPO_METRICS", "0") == "1"
+
+# Set IPO_TRACE_HEADERS=1 to return X-Request-Id and per-stage Server-Timing headers
+TRACE_HEADERS = os.environ.get("IPO_TRACE_HEADERS", "0") == "1"
+
+# Requests slower than this many milliseconds get their sampled stacks dumped (0 disables sampling)
+PROFILE_SLOW_MS = float(os.environ.get("IPO_PROFILE_SLOW_MS", 0))
+
+# Milliseconds between stack samples of in-flight requests while profiling
+PROFILE_INTERVAL_MS = float(os.environ.get("IPO_PROFILE_INTERVAL_MS", 5))
+
+# Directory receiving one folded-stack file per slow request
+PROFILE_DIR = os.environ.get("IPO_PROFILE_DIR", "data/profiles")
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class Histogram:
+    """
+    Prometheus-style latency histogram with one series per label value.
+
+    Args:
+        name (str): Metric name
+        help (str): Metric description
+        label (str): Name of the label distinguishing the series
+        buckets (tuple): Bucket upper bounds in seconds
+    """
+
+    def __init__(self, name, help, label, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_value, seconds):
+        i = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][i] += 1
+            series[1] += seconds
+
+    def render(self):
+        """Exposition-format lines for this histogram"""
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: (list(counts), total) for key, (counts, total) in self._series.items()}
+        for label_value, (counts, total) in sorted(series.items()):
+            labels = f'{self.label}="{label_value}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            cumulative += counts[-1]
+            lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{labels}}} {total}")
+            lines.append(f"{self.name}_count{{{labels}}} {cumulative}")
+        return lines
+
+
+stage_seconds = Histogram("ipo_stage_seconds", "Time spent in each request stage", "stage")
+request_seconds = Histogram("ipo_request_seconds", "Request latency by endpoint", "endpoint")
+
+
+class Trace:
+    """Stage timings and stack samples of one request"""
+
+    __slots__ = ("request_id", "start", "stages", "samples")
+
+    def __init__(self, request_id):
+        self.request_id = request_id
+        self.start = time.perf_counter()
+        self.stages = []
+        self.samples = Counter()
+
+
+# Trace of the current request; a context variable so that work handed to
+# executor threads with a copied context still records its stages
+_current = contextvars.ContextVar("ipo_trace", default=None)
+
+# Traces of in-flight requests by thread id, read by the sampling profiler
+_active = {}
+
+
+class _Stage:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        stage_seconds.observe(self.name, elapsed)
+        trace = _current.get()
+        if trace is not None:
+            trace.stages.append((self.name, elapsed))
+
+
+class _NoopStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+
+_NOOP = _NoopStage()
+
+# Stages are timed for the histograms and for the Server-Timing header
+STAGES_ENABLED = METRICS_ENABLED or TRACE_HEADERS
+
+def stage(name):
+    """
+    Time a block of code as a named request stage.
+
+    Use as ``with stage("scoring"): ...``. When instrumentation is disabled
+    this returns a shared no-op context manager, so the cost is one function
+    call and an empty ``with``.
+    """
+    if not STAGES_ENABLED:
+        return _NOOP
+    return _Stage(name)
+
+
+class SamplingProfiler:
+    """
+    Samples the Python stacks of threads serving requests.
+
+    Every ``interval`` seconds the stack of each thread with an active trace
+    is recorded as a folded stack (``outer;inner`` frames) in that trace.
+    When a request takes longer than ``slow_seconds`` its samples are written
+    to ``directory`` in the folded format read by flamegraph.pl and speedscope.
+
+    Args:
+        interval (float): Seconds between samples
+        slow_seconds (float): Requests slower than this are dumped
+        directory (str): Where dumps are written
+    """
+
+    def __init__(self, interval, slow_seconds, directory):
+        self.interval = interval
+        self.slow_seconds = slow_seconds
+        self.directory = directory
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the sampler thread in this process (idempotent, fork-aware)"""
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            if not _active:
+                continue
+            frames = sys._current_frames()
+            for thread_id, trace in list(_active.items()):
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    trace.samples[self._fold(frame)] += 1
+
+    @staticmethod
+    def _fold(frame):
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    def finish(self, trace, endpoint, elapsed):
+        """Dump the samples of a finished request if it was slow"""
+        if elapsed < self.slow_seconds or not trace.samples:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{endpoint}-{trace.request_id}.folded")
+            with open(path, "w") as f:
+                for stack, count in trace.samples.most_common():
+                    f.write(f"{stack} {count}\n")
+            logger.info(f"Slow request {trace.request_id} to {endpoint} took {elapsed * 1000:.1f} ms; stacks in {path}")
+        except OSError as e:
+            logger.error(f"Error writing profile for request {trace.request_id}: {str(e)}")
+
+
+profiler = SamplingProfiler(PROFILE_INTERVAL_MS / 1000, PROFILE_SLOW_MS / 1000, PROFILE_DIR) if PROFILE_SLOW_MS > 0 else None
+
+def render_metrics():
+    """All histograms in the Prometheus text exposition format"""
+    return "\n".join(request_seconds.render() + stage_seconds.render()) + "\n"
+
+def begin_trace(request_id=None):
+    """
+    Start tracing the current request.
+
+    Args:
+        request_id (str, optional): Client-supplied X-Request-Id; kept only if
+            it is safe to use in a file name, otherwise a new id is generated
+
+    Returns:
+        Trace: The trace, also made current for ``stage``
+    """
+    if not (request_id and len(request_id) <= 64 and all(c.isalnum() or c in "-_" for c in request_id)):
+        request_id = uuid.uuid4().hex[:16]
+    trace = Trace(request_id)
+    _current.set(trace)
+    return trace
+
+def end_trace(trace, endpoint):
+    """
+    Record a finished request in the latency histogram.
+
+    Returns:
+        dict: Trace headers to add to the response (empty unless IPO_TRACE_HEADERS=1)
+    """
+    _current.set(None)
+    elapsed = time.perf_counter() - trace.start
+    if METRICS_ENABLED:
+        request_seconds.observe(endpoint, elapsed)
+    if profiler is not None:
+        profiler.finish(trace, endpoint, elapsed)
+    return _trace_headers(trace, elapsed)
+
+def trace_headers(trace):
+    """
+    Trace headers of a request whose response headers are sent before it ends.
+
+    Returns:
+        dict: As ``end_trace``, with the time so far as the total
+    """
+    return _trace_headers(trace, time.perf_counter() - trace.start)
+
+def _trace_headers(trace, elapsed):
+    if not TRACE_HEADERS:
+        return {}
+    timings = [f"{name};dur={seconds * 1000:.3f}" for name, seconds in trace.stages]
+    timings.append(f"total;dur={elapsed * 1000:.3f}")
+    return {"X-Request-Id": trace.request_id, "Server-Timing": ", ".join(timings)}
+
+def init_app(app):
+    """
+    Install the request hooks and the /metrics route on a Flask app.
+
+    Nothing is installed unless IPO_METRICS, IPO_TRACE_HEADERS or
+    IPO_PROFILE_SLOW_MS is set, so a disabled build adds no per-request work.
+    """
+    if not (METRICS_ENABLED or TRACE_HEADERS or profiler is not None):
+        return
+
+    from flask import Response, g, request
+
+    @app.before_request
+    def _start_trace():
+        trace = begin_trace(request.headers.get("X-Request-Id"))
+        g.trace = trace
+        if profiler is not None:
+            # Started per process, after any fork
+            profiler.start()
+            _active[threading.get_ident()] = trace
+
+    @app.after_request
+    def _finish_trace(response):
+        trace = g.pop("trace", None)
+        if trace is None:
+            return response
+        _active.pop(threading.get_ident(), None)
+        response.headers.update(end_trace(trace, request.endpoint or "unknown"))
+        return response
+
+    @app.teardown_request
+    def _clear_trace(exc):
+        _current.set(None)
+        _active.pop(threading.get_ident(), None)
+
+    if METRICS_ENABLED:
+        @app.route("/metrics")
+        def metrics():
+            return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
+class TraceMiddleware:
+    """
+    ASGI counterpart of ``init_app`` for the async service.
+
+    Traces each HTTP request, records it in the latency histogram under the
+    name of the matched endpoint and adds the trace headers. The request
+    ends when the last body chunk is sent, so streamed (ndjson) responses
+    are timed in full; their Server-Timing header, sent with the first
+    chunk, can only cover the time until then. Stages run on
+    executor threads are recorded when the work is submitted with a copy of
+    the request's context. The sampling profiler only covers the Flask app,
+    since concurrent requests of an event loop share one thread.
+
+    Args:
+        app: The ASGI app to wrap
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = dict(scope["headers"]).get(b"x-request-id", b"").decode("latin-1")
+        trace = begin_trace(request_id)
+        finished = False
+
+        def finish():
+            nonlocal finished
+            if not finished:
+                finished = True
+                end_trace(trace, getattr(scope.get("endpoint"), "__name__", "unknown"))
+
+        async def send_with_trace(message):
+            if message["type"] == "http.response.start":
+                headers = trace_headers(trace)
+                if headers:
+                    message = {**message, "headers": list(message.get("headers", [])) + [
+                        (name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers.items()
+                    ]}
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                finish()
+
+        try:
+            await self.app(scope, receive, send_with_trace)
+        finally:
+            # Requests that fail or are cut off before their last chunk
+            finish()
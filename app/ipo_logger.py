@@ -1,38 +1,95 @@
 import os
 import json
-import pandas as pd
+import time
 from datetime import datetime
+from log_store import PredictionLogStore, normalize_company_name
+from accuracy import AccuracyTracker
 
-# Define the path for the log file
+# Define the path for the legacy CSV log (imported into the store on first start)
 LOG_FILE = "data/ipo_predictions.csv"
 
-def ensure_log_file_exists():
-    """Ensure the log file exists, create it if it doesn't"""
-    if not os.path.exists(os.path.dirname(LOG_FILE)):
-        os.makedirs(os.path.dirname(LOG_FILE), exist_ok=True)
-    
-    if not os.path.exists(LOG_FILE):
-        # Create a new log file with headers
-        df = pd.DataFrame(columns=[
-            "company_name", "issue_price", "predicted_price", "actual_price", 
-            "prediction_date", "listing_date", "market_cap", "gmp", 
-            "industry_growth", "roce", "roe", "sentiment_score"
-        ])
-        df.to_csv(LOG_FILE, index=False)
-        return df
-    else:
-        # Load existing log file
-        return pd.read_csv(LOG_FILE)
+# Directory of the append-only prediction log store
+STORE_DIR = os.environ.get("IPO_LOG_DIR", "data/predictions")
+
+# Fsync every append (set IPO_LOG_FSYNC=0 to trade durability for latency)
+LOG_FSYNC = os.environ.get("IPO_LOG_FSYNC", "1") != "0"
+
+# Number of WAL records folded into a new snapshot at a time
+COMPACT_THRESHOLD = int(os.environ.get("IPO_LOG_COMPACT_THRESHOLD", 1000))
+
+# Seconds the background writer waits to batch concurrent writes into one fsync
+COMMIT_WINDOW = float(os.environ.get("IPO_LOG_COMMIT_WINDOW", 0.002))
+
+# Snapshot format written at compaction: jsonl, or the columnar arrow / parquet (needs pyarrow)
+LOG_FORMAT = os.environ.get("IPO_LOG_FORMAT", "jsonl")
+
+# Time span of a log segment by prediction date: day, week or month
+LOG_SEGMENT_PERIOD = os.environ.get("IPO_LOG_SEGMENT_PERIOD", "month")
+
+# Days after which closed segments move to the archive (0 keeps them live)
+LOG_ARCHIVE_AFTER_DAYS = int(os.environ.get("IPO_LOG_ARCHIVE_AFTER_DAYS", 0))
+
+# Days after which archived segments are deleted (0 keeps them forever)
+LOG_DELETE_AFTER_DAYS = int(os.environ.get("IPO_LOG_DELETE_AFTER_DAYS", 0))
+
+# Inputs and output that make a logged prediction distinct; repeats of the
+# same prediction for a company bump its hit_count instead of adding a row
+DISTINCT_COLUMNS = ["issue_price", "predicted_price", "market_cap", "gmp", "industry_growth", "roce", "roe"]
+
+_store = None
+_history_cache = None
+_accuracy = AccuracyTracker()
 
-def log_prediction(prediction_data):
+def get_store():
+    """Get the process-wide prediction log store, opening it on first use"""
+    global _store, _history_cache
+    if _store is None:
+        # Imported here so NumPy is loaded on first use rather than at startup
+        from history_cache import HistoryCache
+
+        _history_cache = HistoryCache()
+        store = PredictionLogStore(
+            STORE_DIR,
+            legacy_csv=LOG_FILE,
+            fsync=LOG_FSYNC,
+            compact_threshold=COMPACT_THRESHOLD,
+            commit_window=COMMIT_WINDOW,
+            snapshot_format=LOG_FORMAT,
+            segment_period=LOG_SEGMENT_PERIOD,
+            archive_after_days=LOG_ARCHIVE_AFTER_DAYS,
+            delete_after_days=LOG_DELETE_AFTER_DAYS
+        ).open()
+        store.add_observer(_history_cache)
+        store.add_observer(_accuracy)
+        _store = store
+    return _store
+
+def get_history_cache():
+    """
+    Get the in-memory history cache, brought up to date with the store
+
+    Writes by this process update the cache as they are applied; writes by
+    other processes are picked up here when the store's CURRENT and WAL
+    files have changed (checked with stat, so an idle log costs no reads).
+
+    Returns:
+        HistoryCache: The cache, or None if it outgrew IPO_HISTORY_CACHE_MAX_MB
+    """
+    get_store().refresh()
+    return _history_cache if _history_cache.enabled else None
+
+def log_prediction(prediction_data, wait=True):
     """
     Log a new IPO prediction
-    
+
+    A prediction equal to one already logged for the company (same
+    ``DISTINCT_COLUMNS``) is stored once: its hit_count and last_seen are
+    updated instead of appending a row.
+
     Args:
         prediction_data (dict): Dictionary containing prediction details
+        wait (bool): Wait until the write is durable; False only queues it
     """
-    df = ensure_log_file_exists()
-    
     # Create a new row with the prediction data
     new_row = {
         "company_name": prediction_data.get("company_name", ""),
@@ -46,51 +103,181 @@ def log_prediction(prediction_data):
         "industry_growth": prediction_data.get("industry_growth", 0),
         "roce": prediction_data.get("roce", 0),
         "roe": prediction_data.get("roe", 0),
-        "sentiment_score": prediction_data.get("sentiment_score", 0)
+        "sentiment_score": prediction_data.get("sentiment_score", 0),
+        "hit_count": 1,
+        "last_seen": time.time()
     }
-    
-    # Append the new row to the dataframe
-    df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-    
-    # Save the updated dataframe
-    df.to_csv(LOG_FILE, index=False)
-    
+
+    # Append the new row to the log, or count a repeat; this never rewrites existing rows
+    get_store().append_distinct(new_row, DISTINCT_COLUMNS, wait=wait)
+
     return new_row
 
 def update_actual_price(company_name, actual_price, listing_date=None):
     """
     Update the actual listing price for a company
-    
+
     Args:
         company_name (str): Name of the company
         actual_price (float): Actual listing price
         listing_date (str, optional): Date of listing in YYYY-MM-DD format
     """
-    df = ensure_log_file_exists()
-    
-    # Find the row with the matching company name
-    mask = df["company_name"] == company_name
-    
-    if not any(mask):
-        return False, "Company not found in logs"
-    
-    # Update the actual price and listing date
-    df.loc[mask, "actual_price"] = actual_price
-    
+    # Record the actual price and listing date as an update
+    fields = {"actual_price": actual_price}
+
     if listing_date:
-        df.loc[mask, "listing_date"] = listing_date
-    
-    # Save the updated dataframe
-    df.to_csv(LOG_FILE, index=False)
-    
+        fields["listing_date"] = listing_date
+
+    # Matching rows (case- and whitespace-insensitive) come from the company index
+    updated = get_store().update_company(company_name, fields)
+
+    if not updated:
+        return False, _not_found_message(company_name)
+
     return True, "Actual price updated successfully"
 
-def get_prediction_history():
+def update_actual_prices(updates):
+    """
+    Update the actual listing price for many companies with a single write
+
+    Args:
+        updates (list): List of dicts with company_name, actual_price and
+            optional listing_date
+
+    Returns:
+        list: (success, message) tuple for each update, in order
+    """
+    batch = []
+    for update in updates:
+        fields = {"actual_price": update["actual_price"]}
+        if update.get("listing_date"):
+            fields["listing_date"] = update["listing_date"]
+        batch.append((update["company_name"], fields))
+
+    results = []
+    for (company_name, _), updated in zip(batch, get_store().update_companies(batch)):
+        if updated:
+            results.append((True, "Actual price updated successfully"))
+        else:
+            results.append((False, _not_found_message(company_name)))
+
+    return results
+
+def _not_found_message(company_name):
+    """Why no live row matched: archived segments are only checked once the live index misses"""
+    if get_store().read_archive(company_name=company_name):
+        return "Company predictions are archived"
+    return "Company not found in logs"
+
+def get_prediction_history(include_archived=False, date_from=None, date_to=None):
     """
     Get the history of all predictions
-    
+
+    Live rows are served from memory. Archived rows are only read when
+    asked for, and then only from the archived segments whose prediction
+    dates overlap ``date_from``..``date_to``.
+
+    Args:
+        include_archived (bool): Also return rows from archived segments
+        date_from (str, optional): Earliest prediction date, YYYY-MM-DD
+        date_to (str, optional): Latest prediction date, YYYY-MM-DD
+
+    Returns:
+        list: List of dictionaries containing prediction history, oldest first
+    """
+    cache = get_history_cache()
+    if cache is not None:
+        rows = cache.rows()
+    else:
+        rows = [row for _, row in get_store().rows()]
+    if date_from or date_to:
+        rows = [
+            row for row in rows
+            if (not date_from or (row.get("prediction_date") or "") >= date_from)
+            and (not date_to or (row.get("prediction_date") or "") <= date_to)
+        ]
+    if include_archived:
+        rows = [row for _, row in get_store().read_archive(date_from, date_to)] + rows
+    return rows
+
+def query_prediction_history(cursor=None, limit=100, descending=False, company_prefix=None,
+                             date_from=None, date_to=None, has_actual=None, columns=None):
+    """
+    Get one page of the prediction history, filtered through the store's indexes
+
+    Args:
+        cursor (int, optional): Id of the last row of the previous page
+        limit (int): Maximum rows returned
+        descending (bool): Newest predictions first
+        company_prefix (str, optional): Company name prefix (case-insensitive)
+        date_from (str, optional): Earliest prediction date, YYYY-MM-DD
+        date_to (str, optional): Latest prediction date, YYYY-MM-DD
+        has_actual (bool, optional): Filter on whether the actual price is known
+        columns (list, optional): Columns to return
+
+    Returns:
+        tuple: (rows, next_cursor)
+    """
+    return get_store().query(
+        cursor=cursor, limit=limit, descending=descending, company_prefix=company_prefix,
+        date_from=date_from, date_to=date_to, has_actual=has_actual, columns=columns
+    )
+
+def get_history_table(columns=None, filter=None):
+    """
+    Get the prediction history as a pyarrow Table for analytics
+
+    With a columnar log format the snapshot is memory-mapped and only the
+    requested columns and matching rows are decoded.
+
+    Args:
+        columns (list, optional): Columns to return; all by default
+        filter (pyarrow.compute.Expression, optional): Row filter
+
     Returns:
-        list: List of dictionaries containing prediction history
+        pyarrow.Table: Matching rows with their ``id``
     """
-    df = ensure_log_file_exists()
-    return df.to_dict(orient="records") 
\ No newline at end of file
+    return get_store().read_table(columns=columns, filter=filter)
+
+def get_accuracy():
+    """
+    Get the accuracy of logged predictions against actual listing prices
+
+    The figures are running aggregates updated as actual prices are recorded
+    (here or by another worker), so this does not scan the history.
+
+    Returns:
+        dict: MAE, bias, MAPE and directional hit rate overall, by market-cap
+            bucket and by GMP band (see ``accuracy.AccuracyTracker.summary``)
+    """
+    get_store().refresh()
+    return _accuracy.summary()
+
+def is_open_company(company_name):
+    """
+    Check whether a company is one of those ``get_open_companies`` lists
+
+    Args:
+        company_name (str): Name of the company (matched after normalisation)
+
+    Returns:
+        bool: True if a logged prediction for it has no actual listing price
+    """
+    return any(row.get("actual_price") is None for _, row in get_store().company_rows(company_name))
+
+def get_open_companies():
+    """
+    Get the companies whose listing price is not known yet
+
+    Returns:
+        list: Company names (one per normalised name, most recent spelling)
+    """
+    cache = get_history_cache()
+    if cache is not None:
+        return cache.open_companies()
+
+    companies = {}
+    for _, row in get_store().rows():
+        if row.get("actual_price") is None and row.get("company_name"):
+            companies[normalize_company_name(row["company_name"])] = row["company_name"]
+    return list(companies.values())
@@ -0,0 +1,1198 @@
+import os
+import json
+import bisect
+import shutil
+import logging
+import datetime
+import threading
+
+from batching import MicroBatcher
+from storage_backends import COLUMNS, arrow_schema, arrow_table, coerce_value, get_snapshot_format
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+CURRENT_FILE = "CURRENT"
+LOCK_FILE = "LOCK"
+ARCHIVE_DIR = "archive"
+
+# Segment key of rows without a valid prediction date
+UNDATED = "undated"
+
+
+def _snapshot_name(generation, extension="jsonl"):
+    return f"snapshot-{generation:06d}.{extension}"
+
+
+def _wal_name(generation):
+    return f"wal-{generation:06d}.jsonl"
+
+
+def _index_name(generation):
+    return f"index-{generation:06d}.json"
+
+
+def _manifest_name(generation):
+    return f"manifest-{generation:06d}.json"
+
+
+def _segment_name(key, generation, extension):
+    return f"segment-{key}-{generation:06d}.{extension}"
+
+
+def segment_key(prediction_date, period="month"):
+    """
+    Key of the time segment holding a prediction date.
+
+    Args:
+        prediction_date (str): Date in YYYY-MM-DD format
+        period (str): "day", "week" (ISO week) or "month"
+
+    Returns:
+        str: e.g. "2024-06" for a month, sorting in time order; ``UNDATED``
+            when the date is missing or invalid
+    """
+    try:
+        day = datetime.date.fromisoformat(str(prediction_date)[:10])
+    except ValueError:
+        return UNDATED
+    if period == "month":
+        return f"{day.year:04d}-{day.month:02d}"
+    if period == "week":
+        year, week, _ = day.isocalendar()
+        return f"{year:04d}-W{week:02d}"
+    if period == "day":
+        return day.isoformat()
+    raise ValueError(f"Unknown log segment period: {period}")
+
+
+def normalize_company_name(name):
+    """Normalise a company name for lookups: case-folded with collapsed whitespace"""
+    return " ".join(str(name or "").split()).casefold()
+
+
+def _encode(record):
+    return (json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+def _fsync_directory(directory):
+    """Flush directory metadata so renames survive a crash (no-op where unsupported)"""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _log_failure(future):
+    """Log the error of a write nobody waited for"""
+    if future.exception() is not None:
+        logger.error(f"Prediction log write failed: {future.exception()}")
+
+
+def _clean_value(value):
+    """Convert pandas/numpy missing values and scalars into plain JSON values"""
+    if value is None:
+        return None
+    if isinstance(value, float) and value != value:
+        return None
+    if hasattr(value, "item"):
+        value = value.item()
+        if isinstance(value, float) and value != value:
+            return None
+    return value
+
+
+class FileLock:
+    """
+    Exclusive advisory lock on a file, shared by every process using the store.
+
+    Falls back to a no-op where ``fcntl`` is unavailable.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+
+    def __enter__(self):
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        os.close(self._fd)
+        self._fd = None
+
+
+class PredictionLogStore:
+    """
+    Append-only store for IPO prediction rows.
+
+    The store lives in a directory holding a manifest and a write-ahead log
+    (WAL) per generation, plus a CURRENT file naming the live generation.
+    New predictions are appended to the WAL as ``insert`` records and price
+    updates as ``update`` records, so a write never rewrites history. Once the
+    WAL grows past ``compact_threshold`` records, or the calendar moves into
+    a new segment period, it is folded into a new generation.
+
+    The snapshot of a generation is split into time segments by prediction
+    date (``segment_period``: one segment per day, ISO week or month). The
+    segment of the current period is the active one and is written
+    uncompressed; closed segments are compressed (gzip for jsonl, zstd for
+    arrow and parquet). The manifest records each segment's row count and
+    its id, prediction date and company name ranges. A compaction only
+    rewrites the segments whose rows changed, so its cost follows recent
+    activity rather than the size of the history. Closed segments whose
+    newest prediction is older than ``archive_after_days`` move to the
+    ``archive`` directory and leave memory; ``read_archive`` reads them back,
+    skipping segments by their date and company ranges. Archived segments
+    older than ``delete_after_days`` are deleted.
+
+    Writes from every process are serialised by an exclusive lock on the LOCK
+    file; under the lock the writer first catches up with records written by
+    other processes, so ids are never reused and no update is lost. With
+    ``group_commit`` enabled, writes from concurrent requests are batched by a
+    ``MicroBatcher`` so they share one lock acquisition, one write and one fsync.
+
+    Rows are indexed by normalised company name. The index is kept up to date
+    as records are applied and is persisted next to each snapshot, so updates
+    by company never scan the table. In-memory secondary indexes over company
+    name order, prediction date and priced rows back the filtered, paginated
+    ``query``.
+
+    Snapshots are written in ``snapshot_format``: "jsonl", or the columnar
+    "arrow" (Arrow IPC) and "parquet" formats from ``storage_backends``. The
+    format of the live snapshot is recorded in CURRENT, so a store switches
+    format at its next compaction. ``read_table`` serves analytics from the
+    columnar snapshot (memory-mapped, with column and filter pushdown) plus
+    the rows changed since.
+
+    Observers registered with ``add_observer`` see every change: ``load``
+    with the snapshot rows whenever the store is (re)loaded, then ``apply``
+    with each record (and the updated rows) as it is written here or
+    replayed from another process.
+
+    Args:
+        directory (str): Directory holding the store files
+        legacy_csv (str, optional): CSV log imported when the store is first created
+        fsync (bool): Whether appends are fsynced before returning
+        compact_threshold (int): WAL records after which the log is compacted
+        group_commit (bool): Batch concurrent writes through a background writer
+        commit_window (float): Seconds the writer waits to fill a batch
+        snapshot_format (str): Format of new snapshots: "jsonl", "arrow" or "parquet"
+        segment_period (str): Time span of a segment: "day", "week" or "month"
+        archive_after_days (int): Archive closed segments whose newest prediction
+            is older than this many days (0 keeps every segment live)
+        delete_after_days (int): Delete archived segments whose newest prediction
+            is older than this many days (0 keeps the archive forever)
+    """
+
+    def __init__(self, directory, legacy_csv=None, fsync=True, compact_threshold=1000,
+                 group_commit=True, commit_window=0.002, snapshot_format="jsonl",
+                 segment_period="month", archive_after_days=0, delete_after_days=0):
+        self.directory = directory
+        self.snapshot_format = get_snapshot_format(snapshot_format)
+        # Reject an unknown period now rather than at the first compaction
+        segment_key("2000-01-01", segment_period)
+        self.segment_period = segment_period
+        self.archive_after_days = archive_after_days
+        self.delete_after_days = delete_after_days
+        self.legacy_csv = legacy_csv
+        self.fsync = fsync
+        self.compact_threshold = compact_threshold
+        self._lock = threading.RLock()
+        self._file_lock = FileLock(os.path.join(directory, LOCK_FILE))
+        self._committer = None
+        if group_commit:
+            self._committer = MicroBatcher(self._commit, window=commit_window, name="prediction-log-writer")
+
+        self._generation = None
+        self._current_stamp = None
+        self._observers = []
+        self._format = None
+        self._segmented = False
+        self._segments = {}
+        self._archived = []
+        self._active_key = None
+        self._dirty = set()
+        self._moved_keys = set()
+        self._undated = set()
+        self._rows = {}
+        self._company_index = {}
+        self._company_keys = []
+        self._ids = []
+        self._date_index = {}
+        self._dates = []
+        self._priced = set()
+        self._next_id = 0
+        self._wal_offset = 0
+        self._wal_records = 0
+        self._wal_file = None
+
+    # ------------------------------------------------------------------
+    # Opening and replay
+    # ------------------------------------------------------------------
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def open(self):
+        """Create the store if needed and load its current state"""
+        os.makedirs(self.directory, exist_ok=True)
+
+        with self._lock:
+            if not os.path.exists(self._path(CURRENT_FILE)):
+                with self._file_lock:
+                    if not os.path.exists(self._path(CURRENT_FILE)):
+                        self._create()
+
+            self._load()
+        return self
+
+    def _create(self):
+        """Initialise generation 0, importing the legacy CSV log if present"""
+        rows = []
+        if self.legacy_csv and os.path.exists(self.legacy_csv):
+            rows = self._read_legacy_csv(self.legacy_csv)
+            logger.info(f"Importing {len(rows)} rows from {self.legacy_csv}")
+
+        self._rows = dict(enumerate(rows))
+        self._company_index = {}
+        for row_id, row in self._rows.items():
+            self._company_index.setdefault(normalize_company_name(row.get("company_name")), []).append(row_id)
+        self._build_secondary_indexes()
+        self._next_id = len(rows)
+        self._segments = {}
+        self._archived = []
+        self._write_generation(0)
+        open(self._path(_wal_name(0)), "ab").close()
+        self._write_current(0, self.snapshot_format)
+
+    @staticmethod
+    def _read_legacy_csv(path):
+        import pandas as pd
+
+        df = pd.read_csv(path)
+        rows = []
+        for record in df.to_dict(orient="records"):
+            rows.append({column: _clean_value(record.get(column)) for column in COLUMNS})
+        return rows
+
+    def _read_current(self):
+        """
+        Read the live generation and its snapshot format.
+
+        Returns:
+            tuple: (generation, snapshot format); stores written before
+                formats were configurable hold just the generation (jsonl)
+        """
+        with open(self._path(CURRENT_FILE), "r") as f:
+            parts = f.read().split()
+        return int(parts[0]), get_snapshot_format(parts[1] if len(parts) > 1 else "jsonl")
+
+    def _write_current(self, generation, snapshot_format):
+        tmp_path = self._path(CURRENT_FILE + ".tmp")
+        with open(tmp_path, "w") as f:
+            f.write(f"{generation} {snapshot_format.name}")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._path(CURRENT_FILE))
+        _fsync_directory(self.directory)
+
+    def _segment_groups(self):
+        """
+        Live row ids grouped by segment key, from the date index.
+
+        Returns:
+            dict: key -> [row ids, earliest prediction date, latest prediction date]
+        """
+        groups = {}
+        for day in self._dates:
+            key = segment_key(day, self.segment_period)
+            group = groups.get(key)
+            if group is None:
+                groups[key] = group = [[], None, None]
+            group[0].extend(self._date_index[day])
+            if key != UNDATED:
+                group[1] = group[1] or day
+                group[2] = day
+        if self._undated:
+            groups.setdefault(UNDATED, [[], None, None])[0].extend(self._undated)
+        return groups
+
+    def _write_json(self, name, value):
+        path = self._path(name)
+        with open(path + ".tmp", "wb") as f:
+            f.write(_encode(value))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+
+    def _write_segment(self, generation, key, row_ids, min_date, max_date, compressed, archive=False):
+        """Write one segment and its company index; returns its manifest entry"""
+        row_ids = sorted(row_ids)
+        rows = [(row_id, self._rows[row_id]) for row_id in row_ids]
+        name = _segment_name(key, generation, self.snapshot_format.file_extension(compressed))
+        if archive:
+            name = os.path.join(ARCHIVE_DIR, name)
+        path = self._path(name)
+        self.snapshot_format.write(path + ".tmp", rows, compressed=compressed)
+        os.replace(path + ".tmp", path)
+
+        index = {}
+        for row_id, row in rows:
+            index.setdefault(normalize_company_name(row.get("company_name")), []).append(row_id)
+        self._write_json(name + ".index", index)
+
+        return {
+            "key": key,
+            "file": name,
+            "format": self.snapshot_format.name,
+            "compressed": compressed,
+            "rows": len(row_ids),
+            "bytes": os.path.getsize(path),
+            "min_id": row_ids[0],
+            "max_id": row_ids[-1],
+            "min_date": min_date,
+            "max_date": max_date,
+            "min_company": min(index),
+            "max_company": max(index)
+        }
+
+    def _archive_segment(self, segment):
+        """Link an unchanged segment into the archive; the live copy is removed with the old generation"""
+        archived = dict(segment, file=os.path.join(ARCHIVE_DIR, os.path.basename(segment["file"])))
+        for suffix in ("", ".index"):
+            source, target = self._path(segment["file"] + suffix), self._path(archived["file"] + suffix)
+            try:
+                os.link(source, target)
+            except FileExistsError:
+                pass
+            except OSError:
+                shutil.copyfile(source, target)
+        return archived
+
+    def _write_generation(self, generation):
+        """
+        Write the segments and manifest of ``generation`` from the live rows.
+
+        Only segments that are new, have changed rows or are in the wrong
+        format or compression are rewritten; the others keep their files.
+        Closed segments past the archive age move to the archive.
+
+        Returns:
+            tuple: (manifest, ids of the rows archived, files no longer referenced)
+        """
+        today = datetime.date.today()
+        active = segment_key(today.isoformat(), self.segment_period)
+        changed = set(self._moved_keys)
+        changed.update(segment_key(self._rows[row_id].get("prediction_date"), self.segment_period)
+                       for row_id in self._dirty if row_id in self._rows)
+        archive_before = (today - datetime.timedelta(days=self.archive_after_days)).isoformat() if self.archive_after_days else None
+
+        segments = []
+        archived = list(self._archived)
+        archived_ids = []
+        os.makedirs(self._path(ARCHIVE_DIR), exist_ok=True)
+        for key, (row_ids, min_date, max_date) in sorted(self._segment_groups().items()):
+            compressed = key != active
+            to_archive = archive_before is not None and key not in (active, UNDATED) and max_date < archive_before
+            segment = self._segments.get(key)
+            if (segment is None or key in changed or segment["format"] != self.snapshot_format.name
+                    or segment["compressed"] != compressed):
+                segment = self._write_segment(generation, key, row_ids, min_date, max_date, compressed, archive=to_archive)
+            elif to_archive:
+                segment = self._archive_segment(segment)
+            if to_archive:
+                archived.append(segment)
+                archived_ids.extend(row_ids)
+            else:
+                segments.append(segment)
+
+        expired = []
+        if self.delete_after_days:
+            delete_before = (today - datetime.timedelta(days=self.delete_after_days)).isoformat()
+            expired = [segment for segment in archived if segment["max_date"] < delete_before]
+            archived = [segment for segment in archived if segment["max_date"] >= delete_before]
+
+        manifest = {
+            "next_id": self._next_id,
+            "period": self.segment_period,
+            "active": active,
+            "segments": segments,
+            "archived": archived
+        }
+        self._write_json(_manifest_name(generation), manifest)
+
+        referenced = {segment["file"] for segment in segments + archived}
+        obsolete = [
+            name
+            for segment in list(self._segments.values()) + expired
+            if segment["file"] not in referenced
+            for name in (segment["file"], segment["file"] + ".index")
+        ]
+        return manifest, archived_ids, obsolete
+
+    def _load(self):
+        """Load the live segments and replay the WAL of the current generation"""
+        self._close_wal()
+
+        # Another process may compact (and delete the files) between reading
+        # CURRENT and opening the segments; retry with the new generation
+        for attempt in range(5):
+            current_stamp = self._stat_current()
+            generation, snapshot_format = self._read_current()
+            try:
+                manifest = self._read_manifest(generation)
+                if manifest is None:
+                    # Stores written before segments hold one snapshot file
+                    rows = snapshot_format.read(self._path(_snapshot_name(generation, snapshot_format.extension)))
+                    company_index = None
+                else:
+                    rows, company_index = self._read_segments(manifest["segments"])
+                break
+            except FileNotFoundError:
+                if attempt == 4:
+                    raise
+
+        self._generation = generation
+        self._current_stamp = current_stamp
+        self._format = snapshot_format
+        self._segmented = manifest is not None
+        self._segments = {segment["key"]: segment for segment in manifest["segments"]} if manifest else {}
+        self._archived = manifest["archived"] if manifest else []
+        self._active_key = manifest["active"] if manifest else None
+        self._dirty = set()
+        self._moved_keys = set()
+        self._rows = rows
+        self._company_index = company_index if company_index is not None else self._read_index(generation, rows)
+        self._build_secondary_indexes()
+        self._next_id = max(max(rows) + 1 if rows else 0, manifest["next_id"] if manifest else 0)
+        self._wal_offset = 0
+        self._wal_records = 0
+        for observer in self._observers:
+            observer.load(rows)
+        self._replay_wal()
+
+    def _read_manifest(self, generation):
+        """The manifest of ``generation``, or None for a store written before segments"""
+        try:
+            with open(self._path(_manifest_name(generation)), "rb") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            if os.path.exists(self._path(_wal_name(generation))):
+                return None
+            raise
+
+    def _read_segments(self, segments):
+        """
+        Read segment files and their company indexes.
+
+        Returns:
+            tuple: ({row_id: row}, company index)
+        """
+        rows = {}
+        index = {}
+        for segment in segments:
+            segment_rows = get_snapshot_format(segment["format"]).read(self._path(segment["file"]))
+            rows.update(segment_rows)
+            try:
+                with open(self._path(segment["file"] + ".index"), "rb") as f:
+                    segment_index = json.load(f)
+            except ValueError:
+                logger.warning(f"Rebuilding company index of {segment['file']}")
+                segment_index = {}
+                for row_id, row in sorted(segment_rows.items()):
+                    segment_index.setdefault(normalize_company_name(row.get("company_name")), []).append(row_id)
+            for key, row_ids in segment_index.items():
+                index.setdefault(key, []).extend(row_ids)
+        return rows, index
+
+    def _read_index(self, generation, rows):
+        """Load the persisted company index, rebuilding it if it is missing"""
+        try:
+            with open(self._path(_index_name(generation)), "rb") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            logger.warning(f"Rebuilding company index for generation {generation}")
+            index = {}
+            for row_id, row in sorted(rows.items()):
+                index.setdefault(normalize_company_name(row.get("company_name")), []).append(row_id)
+            return index
+
+    def _replay_wal(self, recover=False):
+        """
+        Apply WAL records written since the last replay.
+
+        Args:
+            recover (bool): Truncate a torn trailing record left by a crash;
+                only safe while holding the file lock
+        """
+        path = self._path(_wal_name(self._generation))
+        with open(path, "rb") as f:
+            f.seek(self._wal_offset)
+            data = f.read()
+
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            if line:
+                self._apply(json.loads(line))
+                self._wal_records += 1
+        self._wal_offset += end
+
+        if recover and end < len(data):
+            logger.warning(f"Truncating torn record at end of {path}")
+            with open(path, "r+b") as f:
+                f.truncate(self._wal_offset)
+
+    def _apply(self, record):
+        op = record["op"]
+        if op == "insert":
+            row_id = record["id"]
+            row = record["row"]
+            self._rows[row_id] = row
+            self._dirty.add(row_id)
+            self._add_to_company_index(row_id, row.get("company_name"))
+            self._index_row(row_id, row)
+            self._next_id = max(self._next_id, row_id + 1)
+        elif op == "update":
+            fields = record["fields"]
+            for row_id in record["ids"]:
+                row = self._rows.get(row_id)
+                if row is None:
+                    continue
+                self._dirty.add(row_id)
+                if "company_name" in fields:
+                    self._reindex(row_id, row.get("company_name"), fields["company_name"])
+                if "prediction_date" in fields:
+                    # The row leaves its segment, which must be rewritten too
+                    self._moved_keys.add(segment_key(row.get("prediction_date"), self.segment_period))
+                    self._move_date(row_id, row.get("prediction_date"), fields["prediction_date"])
+                row.update(fields)
+                if "actual_price" in fields:
+                    if row["actual_price"] is None:
+                        self._priced.discard(row_id)
+                    else:
+                        self._priced.add(row_id)
+        else:
+            raise ValueError(f"Unknown log record type: {op}")
+        for observer in self._observers:
+            observer.apply(record, self._rows)
+
+    def _add_to_company_index(self, row_id, company_name):
+        key = normalize_company_name(company_name)
+        ids = self._company_index.get(key)
+        if ids is None:
+            self._company_index[key] = ids = []
+            bisect.insort(self._company_keys, key)
+        ids.append(row_id)
+
+    def _reindex(self, row_id, old_name, new_name):
+        old_key = normalize_company_name(old_name)
+        ids = self._company_index.get(old_key, [])
+        if row_id in ids:
+            ids.remove(row_id)
+            if not ids:
+                del self._company_index[old_key]
+                self._company_keys.remove(old_key)
+        self._add_to_company_index(row_id, new_name)
+
+    def _build_secondary_indexes(self):
+        self._company_keys = sorted(self._company_index)
+        self._ids = []
+        self._date_index = {}
+        self._dates = []
+        self._priced = set()
+        self._undated = set()
+        for row_id in sorted(self._rows):
+            self._index_row(row_id, self._rows[row_id])
+
+    def _index_row(self, row_id, row):
+        """Add a new row to the id, date and priced indexes"""
+        if self._ids and row_id < self._ids[-1]:
+            bisect.insort(self._ids, row_id)
+        else:
+            self._ids.append(row_id)
+        self._move_date(row_id, None, row.get("prediction_date"))
+        if row.get("actual_price") is not None:
+            self._priced.add(row_id)
+
+    def _move_date(self, row_id, old_date, new_date):
+        if old_date is not None:
+            ids = self._date_index.get(old_date, [])
+            if row_id in ids:
+                ids.remove(row_id)
+                if not ids:
+                    del self._date_index[old_date]
+                    self._dates.remove(old_date)
+        else:
+            self._undated.discard(row_id)
+        if new_date is not None:
+            ids = self._date_index.get(new_date)
+            if ids is None:
+                self._date_index[new_date] = ids = []
+                bisect.insort(self._dates, new_date)
+            bisect.insort(ids, row_id)
+        else:
+            self._undated.add(row_id)
+
+    def _stat_current(self):
+        """Identity of the CURRENT file; it changes whenever a compaction replaces it"""
+        try:
+            stat = os.stat(self._path(CURRENT_FILE))
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _up_to_date(self):
+        """True if no other process has written since the last read (two stat calls, no reads)"""
+        if self._current_stamp is None or self._stat_current() != self._current_stamp:
+            return False
+        try:
+            return os.stat(self._path(_wal_name(self._generation))).st_size == self._wal_offset
+        except FileNotFoundError:
+            return False
+
+    def refresh(self, recover=False):
+        """Pick up records written since the last read"""
+        with self._lock:
+            if self._generation is None:
+                self.open()
+            if not recover and self._up_to_date():
+                return
+            if self._read_current()[0] != self._generation:
+                self._load()
+            self._replay_wal(recover=recover)
+
+    def version(self):
+        """
+        Identity of the current state of the log, for HTTP validators.
+
+        It changes with every write, by this or another process (the WAL
+        grows or a compaction replaces CURRENT), and costs two ``stat``
+        calls when nothing was written.
+
+        Returns:
+            tuple: (generation, WAL offset, CURRENT file identity)
+        """
+        with self._lock:
+            self.refresh()
+            return self._generation, self._wal_offset, self._current_stamp
+
+    def add_observer(self, observer):
+        """
+        Register an observer of every row change.
+
+        Args:
+            observer: Object with ``load(rows)``, called with the ``{row_id: row}``
+                snapshot dict on every (re)load, and ``apply(record, rows)``,
+                called with each insert or update record after it is applied
+                to ``rows``; observers must not modify ``rows``
+        """
+        with self._lock:
+            self._observers.append(observer)
+            if self._generation is not None:
+                observer.load(self._rows)
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def _wal(self):
+        if self._wal_file is None:
+            self._wal_file = open(self._path(_wal_name(self._generation)), "ab")
+        return self._wal_file
+
+    def _close_wal(self):
+        if self._wal_file is not None:
+            self._wal_file.close()
+            self._wal_file = None
+
+    def _append_records(self, records):
+        """Append encoded records to the WAL in one write and apply them"""
+        payload = b"".join(_encode(record) for record in records)
+        wal = self._wal()
+        wal.write(payload)
+        wal.flush()
+        if self.fsync:
+            os.fsync(wal.fileno())
+
+        for record in records:
+            self._apply(record)
+        self._wal_offset += len(payload)
+        self._wal_records += len(records)
+
+        if self._wal_records >= self.compact_threshold or self._rotation_due():
+            # The records are durable and applied, so the commit has succeeded;
+            # a failed compaction (e.g. a full disk) is retried at the next write
+            try:
+                self._compact()
+            except Exception as e:
+                logger.error(f"Compaction of the prediction log failed, will retry: {str(e)}")
+
+    def _rotation_due(self):
+        """True once the calendar has moved past the active segment's period"""
+        return self._active_key is not None and segment_key(datetime.date.today().isoformat(), self.segment_period) != self._active_key
+
+    def _commit(self, ops):
+        """
+        Apply a batch of operations as one locked, durable WAL write.
+
+        Args:
+            ops (list): Operation tuples: ``("insert", row)``,
+                ``("insert_distinct", row, key_columns)``, ``("update", row_ids, fields)``
+                or ``("update_company", company_name, fields)``
+
+        Returns:
+            list: Per-operation results (new row id, or number of rows updated)
+        """
+        with self._lock, self._file_lock:
+            self.refresh(recover=True)
+
+            records = []
+            results = []
+            hits = {}
+            next_id = self._next_id
+            for op in ops:
+                kind = op[0]
+                if kind == "insert_distinct":
+                    row_id = self._match_row(op[1], op[2], records)
+                    if row_id is not None:
+                        # Count the repeat on the row already logged
+                        hits[row_id] = hits.get(row_id, self._hit_count(row_id, records)) + 1
+                        records.append({"op": "update", "ids": [row_id], "fields": {"hit_count": hits[row_id], "last_seen": op[1].get("last_seen")}})
+                        results.append(row_id)
+                        continue
+                    kind = "insert"
+                if kind == "insert":
+                    records.append({"op": "insert", "id": next_id, "row": {c: op[1].get(c) for c in COLUMNS}})
+                    results.append(next_id)
+                    next_id += 1
+                    continue
+
+                if kind == "update":
+                    row_ids = list(op[1])
+                elif kind == "update_company":
+                    row_ids = self._match_company(op[1], records)
+                else:
+                    raise ValueError(f"Unknown log operation: {kind}")
+                fields = op[-1]
+                if row_ids:
+                    records.append({"op": "update", "ids": row_ids, "fields": fields})
+                results.append(len(row_ids))
+
+            if records:
+                self._append_records(records)
+            return results
+
+    def _match_company(self, company_name, pending=()):
+        """Ids of stored and pending inserted rows for ``company_name`` (normalised)"""
+        key = normalize_company_name(company_name)
+        row_ids = list(self._company_index.get(key, ()))
+        row_ids += [
+            r["id"] for r in pending
+            if r["op"] == "insert" and normalize_company_name(r["row"].get("company_name")) == key
+        ]
+        return row_ids
+
+    def _match_row(self, row, key_columns, pending=()):
+        """Id of the latest stored or pending row for the same company with equal ``key_columns``, or None"""
+        pending_rows = {r["id"]: r["row"] for r in pending if r["op"] == "insert"}
+        for row_id in sorted(self._match_company(row.get("company_name"), pending), reverse=True):
+            existing = pending_rows.get(row_id) or self._rows[row_id]
+            if all(coerce_value(c, existing.get(c)) == coerce_value(c, row.get(c)) for c in key_columns):
+                return row_id
+        return None
+
+    def _hit_count(self, row_id, pending=()):
+        """Times a stored or pending row has been logged (rows from before hit counting count once)"""
+        row = next((r["row"] for r in pending if r["op"] == "insert" and r["id"] == row_id), None) or self._rows[row_id]
+        return int(row.get("hit_count") or 1)
+
+    def _submit(self, op, wait=True):
+        if self._committer is None:
+            return self._commit([op])[0]
+        future = self._committer.submit(op)
+        if wait:
+            return future.result()
+        future.add_done_callback(_log_failure)
+        return future
+
+    def append(self, row):
+        """
+        Append a new prediction row.
+
+        Args:
+            row (dict): Row values keyed by column name
+
+        Returns:
+            int: Id assigned to the row
+        """
+        return self._submit(("insert", row))
+
+    def append_distinct(self, row, key_columns, wait=True):
+        """
+        Append a prediction row unless an equal one is already logged.
+
+        A row for the same company (normalised, as in ``update_company``)
+        whose ``key_columns`` all hold the same values counts as equal; instead
+        of a new row, that row's ``hit_count`` is incremented and its
+        ``last_seen`` set from ``row``. The match is resolved under the write
+        lock, so concurrent repeats from any process land on one row.
+
+        Args:
+            row (dict): Row values keyed by column name
+            key_columns (list): Columns compared besides the company name
+            wait (bool): Wait for the write; when False and group commit is
+                on, return as soon as it is queued (failures are logged)
+
+        Returns:
+            int: Id of the new or matching row, or a Future of it when not waiting
+        """
+        return self._submit(("insert_distinct", row, key_columns), wait)
+
+    def update(self, row_ids, fields):
+        """
+        Record an update of ``fields`` on the given rows.
+
+        Args:
+            row_ids (list): Ids of the rows to update
+            fields (dict): Column values to set
+
+        Returns:
+            int: Number of rows updated
+        """
+        if not row_ids:
+            return 0
+        return self._submit(("update", row_ids, fields))
+
+    def update_rows(self, updates):
+        """
+        Apply different updates to many rows in a single locked WAL write.
+
+        Args:
+            updates (list): List of (row_ids, fields) tuples
+
+        Returns:
+            list: Number of rows updated for each entry
+        """
+        if not updates:
+            return []
+        return self._commit([("update", row_ids, fields) for row_ids, fields in updates])
+
+    def update_company(self, company_name, fields):
+        """
+        Record an update of ``fields`` on every row for ``company_name``.
+
+        Names are matched after normalisation (see ``normalize_company_name``).
+        The match is resolved under the write lock, so rows appended by other
+        processes just before the update are included.
+
+        Returns:
+            int: Number of rows updated
+        """
+        return self._submit(("update_company", company_name, fields))
+
+    def update_companies(self, updates):
+        """
+        Apply many company updates in a single locked WAL write.
+
+        Args:
+            updates (list): List of (company_name, fields) tuples
+
+        Returns:
+            list: Number of rows updated for each entry
+        """
+        if not updates:
+            return []
+        return self._commit([("update_company", name, fields) for name, fields in updates])
+
+    def compact(self):
+        """Fold the WAL into a fresh snapshot and start a new generation"""
+        with self._lock, self._file_lock:
+            self.refresh(recover=True)
+            self._compact()
+
+    def _compact(self):
+        generation = self._generation + 1
+        manifest, archived_ids, obsolete = self._write_generation(generation)
+        open(self._path(_wal_name(generation)), "ab").close()
+        self._write_current(generation, self.snapshot_format)
+        self._current_stamp = self._stat_current()
+
+        old_generation = self._generation
+        if self._segmented:
+            obsolete.append(_manifest_name(old_generation))
+        else:
+            obsolete += [_snapshot_name(old_generation, self._format.extension), _index_name(old_generation)]
+        obsolete.append(_wal_name(old_generation))
+        self._close_wal()
+        self._generation = generation
+        self._format = self.snapshot_format
+        self._segmented = True
+        self._segments = {segment["key"]: segment for segment in manifest["segments"]}
+        self._archived = manifest["archived"]
+        self._active_key = manifest["active"]
+        self._dirty = set()
+        self._moved_keys = set()
+        self._wal_offset = 0
+        self._wal_records = 0
+
+        for name in obsolete:
+            try:
+                os.remove(self._path(name))
+            except FileNotFoundError:
+                pass
+
+        if archived_ids:
+            self._drop_rows(archived_ids)
+            logger.info(f"Archived {len(archived_ids)} rows older than {self.archive_after_days} days")
+
+        logger.info(f"Compacted prediction log into generation {generation} "
+                    f"({len(self._rows)} rows in {len(self._segments)} segments)")
+
+    def _drop_rows(self, row_ids):
+        """Remove archived rows from memory and rebuild the indexes and observers"""
+        for row_id in row_ids:
+            self._rows.pop(row_id, None)
+        self._company_index = {}
+        for row_id, row in sorted(self._rows.items()):
+            self._company_index.setdefault(normalize_company_name(row.get("company_name")), []).append(row_id)
+        self._build_secondary_indexes()
+        for observer in self._observers:
+            observer.load(self._rows)
+
+    def close(self):
+        self._close_wal()
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def rows(self):
+        """
+        Get all rows in insertion order.
+
+        Returns:
+            list: List of (row_id, row dict) tuples; the dicts are copies
+        """
+        with self._lock:
+            self.refresh()
+            return [(row_id, dict(row)) for row_id, row in sorted(self._rows.items())]
+
+    def find_company(self, company_name):
+        """
+        Find the ids of rows for a company, matched after normalisation.
+
+        Returns:
+            list: Matching row ids
+        """
+        with self._lock:
+            self.refresh()
+            return self._match_company(company_name)
+
+    def company_rows(self, company_name):
+        """
+        Get the rows for a company, matched after normalisation.
+
+        Returns:
+            list: (row_id, row dict) tuples in insertion order; the dicts are copies
+        """
+        with self._lock:
+            self.refresh()
+            return [(row_id, dict(self._rows[row_id])) for row_id in sorted(self._match_company(company_name))]
+
+    def query(self, cursor=None, limit=100, descending=False, company_prefix=None,
+              date_from=None, date_to=None, has_actual=None, columns=None):
+        """
+        Get one page of rows matching the filters, using the indexes.
+
+        Args:
+            cursor (int, optional): Id of the last row of the previous page
+            limit (int): Maximum rows returned
+            descending (bool): Newest rows first
+            company_prefix (str, optional): Normalised company name prefix
+            date_from (str, optional): Earliest prediction date (YYYY-MM-DD, inclusive)
+            date_to (str, optional): Latest prediction date (YYYY-MM-DD, inclusive)
+            has_actual (bool, optional): Only rows with (True) or without (False) an actual price
+            columns (list, optional): Columns to return; all by default
+
+        Returns:
+            tuple: (rows, next_cursor); each row carries its ``id`` and
+                next_cursor is None on the last page
+        """
+        with self._lock:
+            self.refresh()
+
+            # Candidate ids from the index filters, as a sorted list
+            candidates = None
+            if company_prefix:
+                prefix = normalize_company_name(company_prefix)
+                start = bisect.bisect_left(self._company_keys, prefix)
+                ids = []
+                for key in self._company_keys[start:]:
+                    if not key.startswith(prefix):
+                        break
+                    ids.extend(self._company_index[key])
+                candidates = set(ids)
+            if date_from or date_to:
+                start = bisect.bisect_left(self._dates, date_from) if date_from else 0
+                end = bisect.bisect_right(self._dates, date_to) if date_to else len(self._dates)
+                ids = set()
+                for date in self._dates[start:end]:
+                    ids.update(self._date_index[date])
+                candidates = ids if candidates is None else candidates & ids
+            if has_actual and (candidates is None or len(self._priced) < len(candidates)):
+                candidates = set(self._priced) if candidates is None else candidates & self._priced
+            ordered = self._ids if candidates is None else sorted(candidates)
+
+            # Walk from the cursor in the requested order
+            if descending:
+                end = bisect.bisect_left(ordered, cursor) if cursor is not None else len(ordered)
+                walk = (ordered[i] for i in range(end - 1, -1, -1))
+            else:
+                start = bisect.bisect_right(ordered, cursor) if cursor is not None else 0
+                walk = (ordered[i] for i in range(start, len(ordered)))
+
+            page = []
+            last_id = None
+            for row_id in walk:
+                if has_actual is not None and (row_id in self._priced) != has_actual:
+                    continue
+                if len(page) == limit:
+                    return page, last_id
+                row = self._rows[row_id]
+                if columns:
+                    page.append({"id": row_id, **{c: row.get(c) for c in columns}})
+                else:
+                    page.append({"id": row_id, **row})
+                last_id = row_id
+            return page, None
+
+    def _snapshot_files(self):
+        """(format, path) of every file holding the live snapshot"""
+        if not self._segmented:
+            return [(self._format, self._path(_snapshot_name(self._generation, self._format.extension)))]
+        return [(get_snapshot_format(segment["format"]), self._path(segment["file"])) for segment in self._segments.values()]
+
+    def segments(self):
+        """
+        Get the manifest entries of the live and archived segments.
+
+        Returns:
+            dict: ``live`` and ``archived`` lists of segment metadata (key,
+                file, format, compressed, rows, bytes and id, date and
+                company name ranges)
+        """
+        with self._lock:
+            self.refresh()
+            return {"live": list(self._segments.values()), "archived": list(self._archived)}
+
+    def read_archive(self, date_from=None, date_to=None, company_name=None):
+        """
+        Read archived rows, skipping segments that cannot match.
+
+        Segments are skipped on their manifest date range and, for
+        ``company_name``, their company name range and then their company
+        index, so only segments that may hold matching rows are decompressed.
+
+        Args:
+            date_from (str, optional): Earliest prediction date (YYYY-MM-DD, inclusive)
+            date_to (str, optional): Latest prediction date (YYYY-MM-DD, inclusive)
+            company_name (str, optional): Company name, matched after normalisation
+
+        Returns:
+            list: Matching (row_id, row dict) tuples in id order
+        """
+        with self._lock:
+            self.refresh()
+            archived = list(self._archived)
+
+        key = normalize_company_name(company_name) if company_name is not None else None
+        rows = []
+        for segment in archived:
+            if date_from and segment["max_date"] < date_from or date_to and segment["min_date"] > date_to:
+                continue
+            try:
+                if key is not None:
+                    if not segment["min_company"] <= key <= segment["max_company"]:
+                        continue
+                    with open(self._path(segment["file"] + ".index"), "rb") as f:
+                        if key not in json.load(f):
+                            continue
+                segment_rows = get_snapshot_format(segment["format"]).read(self._path(segment["file"]))
+            except FileNotFoundError:
+                # Deleted by the retention policy since the refresh
+                continue
+            for row_id, row in segment_rows.items():
+                day = row.get("prediction_date") or ""
+                if date_from and day < date_from or date_to and day > date_to:
+                    continue
+                if key is not None and normalize_company_name(row.get("company_name")) != key:
+                    continue
+                rows.append((row_id, row))
+        return sorted(rows, key=lambda item: item[0])
+
+    def read_table(self, columns=None, filter=None):
+        """
+        Read the rows as a pyarrow Table for analytics.
+
+        Rows come from the live segments, memory-mapped for Arrow IPC and
+        with column and filter pushdown for Parquet, with rows changed in
+        the WAL since the snapshot replaced by their current values.
+        Archived segments are not included.
+
+        Args:
+            columns (list, optional): Columns to return (``id`` is always included)
+            filter (pyarrow.compute.Expression, optional): Row filter, e.g.
+                ``pc.field("actual_price").is_valid()``
+
+        Returns:
+            pyarrow.Table: Matching rows ordered by id
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        selected = ["id"] + [c for c in columns if c != "id"] if columns else None
+        for attempt in range(5):
+            with self._lock:
+                self.refresh()
+                files = self._snapshot_files()
+                overlay = [(row_id, self._rows[row_id]) for row_id in sorted(self._dirty) if row_id in self._rows]
+            try:
+                tables = [snapshot_format.read_table(path, columns=selected, filter=filter) for snapshot_format, path in files]
+                break
+            except FileNotFoundError:
+                # Compacted by another process since the refresh
+                if attempt == 4:
+                    raise
+
+        if not tables:
+            table = pa.Table.from_pylist([], schema=arrow_schema())
+            table = table.select(selected) if selected else table
+        elif len(tables) == 1:
+            table = tables[0]
+        else:
+            table = pa.concat_tables(tables).sort_by("id")
+
+        if overlay:
+            changed = pa.array([row_id for row_id, _ in overlay], pa.int64())
+            table = table.filter(pc.invert(pc.is_in(table.column("id"), value_set=changed)))
+            recent = arrow_table(overlay)
+            if filter is not None:
+                recent = recent.filter(filter)
+            table = pa.concat_tables([table, recent.select(table.column_names)])
+            table = table.sort_by("id")
+        return table
@@ -0,0 +1,71 @@
+"""
+Migrate the prediction history to another snapshot format.
+
+Imports ``data/ipo_predictions.csv`` if the store does not exist yet, then
+rewrites the live snapshot in the requested format. Usage (from the app
+directory):
+
+    python migrate_history.py --format parquet [--store data/predictions] [--csv data/ipo_predictions.csv]
+        [--segment-period week] [--archive-after-days 365] [--delete-after-days 0]
+
+Segmenting, archiving, retention and fsync follow the server's settings
+(``IPO_LOG_SEGMENT_PERIOD``, ``IPO_LOG_ARCHIVE_AFTER_DAYS``,
+``IPO_LOG_DELETE_AFTER_DAYS``, ``IPO_LOG_FSYNC``) unless overridden. Set
+``IPO_LOG_FORMAT`` to the same format afterwards so later compactions
+keep it.
+"""
+import time
+import argparse
+import logging
+
+from ipo_logger import (LOG_ARCHIVE_AFTER_DAYS, LOG_DELETE_AFTER_DAYS, LOG_FILE, LOG_FSYNC, LOG_SEGMENT_PERIOD,
+                        STORE_DIR)
+from log_store import PredictionLogStore
+from storage_backends import SNAPSHOT_FORMATS
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def migrate(store_dir, snapshot_format, legacy_csv=None, segment_period=LOG_SEGMENT_PERIOD,
+            archive_after_days=LOG_ARCHIVE_AFTER_DAYS, delete_after_days=LOG_DELETE_AFTER_DAYS, fsync=LOG_FSYNC):
+    """
+    Rewrite the store's snapshot (and pending WAL records) in ``snapshot_format``.
+
+    Args:
+        store_dir (str): Directory of the prediction log store
+        snapshot_format (str): "jsonl", "arrow" or "parquet"
+        legacy_csv (str, optional): CSV log imported if the store is new
+        segment_period (str): Time span of a segment: "day", "week" or "month"
+        archive_after_days (int): Archive closed segments older than this (0 keeps them live)
+        delete_after_days (int): Delete archived segments older than this (0 keeps them)
+        fsync (bool): Whether writes are fsynced
+
+    Returns:
+        int: Number of rows migrated
+    """
+    store = PredictionLogStore(store_dir, legacy_csv=legacy_csv, fsync=fsync, group_commit=False,
+                               snapshot_format=snapshot_format, segment_period=segment_period,
+                               archive_after_days=archive_after_days, delete_after_days=delete_after_days).open()
+    try:
+        store.compact()
+        return len(store.rows())
+    finally:
+        store.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--format", choices=sorted(SNAPSHOT_FORMATS), default="parquet")
+    parser.add_argument("--store", default=STORE_DIR)
+    parser.add_argument("--csv", default=LOG_FILE)
+    parser.add_argument("--segment-period", choices=["day", "week", "month"], default=LOG_SEGMENT_PERIOD)
+    parser.add_argument("--archive-after-days", type=int, default=LOG_ARCHIVE_AFTER_DAYS)
+    parser.add_argument("--delete-after-days", type=int, default=LOG_DELETE_AFTER_DAYS)
+    args = parser.parse_args()
+
+    start = time.time()
+    rows = migrate(args.store, args.format, legacy_csv=args.csv, segment_period=args.segment_period,
+                   archive_after_days=args.archive_after_days, delete_after_days=args.delete_after_days)
+    logger.info(f"Migrated {rows} rows in {args.store} to {args.format} in {time.time() - start:.2f}s")
+
+if __name__ == "__main__":
+    main()
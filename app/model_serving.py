@@ -0,0 +1,206 @@
+import os
+import time
+import logging
+import threading
+
+from batching import MicroBatcher
+
+logger = logging.getLogger(__name__)
+
+# Path of the trained model artifact written by train_model.py
+MODEL_FILE = os.environ.get("IPO_MODEL_FILE", "models/ipo_model.joblib")
+
+# Seconds between checks for a new or retrained model artifact
+MODEL_CHECK_INTERVAL = float(os.environ.get("IPO_MODEL_CHECK_INTERVAL", 30))
+
+# Concurrent /api/predict calls are coalesced for up to this many milliseconds
+INFERENCE_BATCH_WINDOW_MS = float(os.environ.get("IPO_INFERENCE_BATCH_WINDOW_MS", 2))
+
+# Maximum requests scored by one predict call
+INFERENCE_BATCH_MAX_SIZE = int(os.environ.get("IPO_INFERENCE_BATCH_MAX_SIZE", 64))
+
+# Model input columns, in the order produced by prepare_features
+FEATURE_NAMES = ['issue_price', 'market_cap', 'gmp_percentage', 'roce', 'roe', 'industry_growth']
+
+def prepare_features(data, sentiment_score=None):
+    """
+    Prepare features for prediction.
+
+    Args:
+        data (dict, list or DataFrame): Input data from a request, a list of
+            them, or a DataFrame with one IPO per row
+        sentiment_score (float, optional): News sentiment score (not used by the current feature set)
+
+    Returns:
+        numpy.ndarray: Prepared features array, one row per input
+    """
+    import numpy as np
+
+    try:
+        if hasattr(data, 'columns'):
+            # DataFrame input is converted column-wise without a Python loop
+            columns = {name: data[name].to_numpy(dtype=np.float64) for name in ('issue_price', 'gmp', 'market_cap', 'roce', 'roe', 'industry_growth')}
+            return np.column_stack([
+                columns['issue_price'],
+                columns['market_cap'],
+                (columns['gmp'] / columns['issue_price']) * 100,
+                columns['roce'],
+                columns['roe'],
+                columns['industry_growth']
+            ])
+
+        records = [data] if isinstance(data, dict) else data
+
+        # Extract and validate numeric values
+        features = np.empty((len(records), len(FEATURE_NAMES)), dtype=np.float64)
+        for i, record in enumerate(records):
+            issue_price = float(record['issue_price'])
+            gmp = float(record['gmp'])
+
+            features[i] = (
+                issue_price,
+                float(record['market_cap']),
+                (gmp / issue_price) * 100,  # GMP percentage
+                float(record['roce']),
+                float(record['roe']),
+                float(record['industry_growth'])
+            )
+
+        return features
+
+    except Exception as e:
+        logger.error(f"Error preparing features: {str(e)}")
+        raise
+
+class ModelServer:
+    """
+    Trained listing-gain model loaded from a joblib artifact.
+
+    Arrays are memory-mapped read-only (``mmap_mode='r'``) so every worker
+    process serving the same artifact shares its pages.
+
+    Args:
+        bundle (dict): Artifact contents with ``scaler``, ``model`` and metadata
+    """
+
+    def __init__(self, bundle):
+        self.scaler = bundle['scaler']
+        self.model = bundle['model']
+        # Artifacts saved with n_jobs=-1 would start a joblib pool for every
+        # batch in every worker
+        if hasattr(self.model, 'n_jobs'):
+            self.model.n_jobs = 1
+        self.version = bundle.get('version', 'unknown')
+        self.trained_at = bundle.get('trained_at')
+        self.n_samples = bundle.get('n_samples')
+
+    @classmethod
+    def load(cls, path=MODEL_FILE):
+        import joblib
+
+        return cls(joblib.load(path, mmap_mode='r'))
+
+    def predict_returns(self, features):
+        """
+        Predict listing gains for a feature matrix in one batched call.
+
+        Args:
+            features (numpy.ndarray): Output of ``prepare_features``
+
+        Returns:
+            numpy.ndarray: Predicted listing gain as a fraction of the issue price
+        """
+        return self.model.predict(self.scaler.transform(features))
+
+    def predict_prices(self, features):
+        """
+        Predict listing prices for a feature matrix.
+
+        Returns:
+            numpy.ndarray: Predicted listing prices in ₹
+        """
+        return features[:, 0] * (1 + self.predict_returns(features))
+
+
+_model = None
+_model_mtime = None
+_next_check = 0.0
+_model_lock = threading.Lock()
+
+def get_model():
+    """
+    Get this worker's model server, or None when no artifact exists.
+
+    The artifact is loaded once and reloaded only when its mtime changes;
+    the file is checked at most every ``MODEL_CHECK_INTERVAL`` seconds.
+    """
+    global _model, _model_mtime, _next_check
+
+    now = time.monotonic()
+    if now < _next_check:
+        return _model
+
+    with _model_lock:
+        _next_check = now + MODEL_CHECK_INTERVAL
+        try:
+            mtime = os.stat(MODEL_FILE).st_mtime_ns
+        except FileNotFoundError:
+            if _model is not None:
+                logger.warning(f"Model artifact {MODEL_FILE} removed, falling back to heuristic scoring")
+            _model, _model_mtime = None, None
+            return None
+
+        if mtime != _model_mtime:
+            try:
+                _model = ModelServer.load(MODEL_FILE)
+                logger.info(f"Loaded model version {_model.version} from {MODEL_FILE}")
+            except Exception as e:
+                logger.error(f"Error loading model from {MODEL_FILE}: {str(e)}")
+            _model_mtime = mtime
+
+    return _model
+
+
+def _predict_batch(items):
+    """Score queued (model, features) items with one predict call per model"""
+    import numpy as np
+
+    results = [None] * len(items)
+    groups = {}
+    for i, (model, features) in enumerate(items):
+        groups.setdefault(id(model), (model, []))[1].append(i)
+
+    for model, positions in groups.values():
+        features = np.vstack([items[i][1] for i in positions])
+        for i, price in zip(positions, model.predict_prices(features).tolist()):
+            results[i] = price
+    return results
+
+
+inference_batcher = MicroBatcher(
+    _predict_batch,
+    window=INFERENCE_BATCH_WINDOW_MS / 1000,
+    max_batch=INFERENCE_BATCH_MAX_SIZE,
+    name="model-inference",
+    # Scoring has no side effects, so one bad row need not fail its batch
+    retry_items=True
+)
+
+def predict_price(model, features):
+    """
+    Predict the listing price of one IPO through the request coalescer.
+
+    Concurrent callers are stacked into a single feature matrix and scored
+    with one ``predict`` call; set ``IPO_INFERENCE_BATCH_WINDOW_MS=0`` to
+    score each request directly.
+
+    Args:
+        model (ModelServer): Model returned by ``get_model``
+        features (numpy.ndarray): 1 x n feature row from ``prepare_features``
+
+    Returns:
+        float: Predicted listing price in ₹
+    """
+    if INFERENCE_BATCH_WINDOW_MS <= 0:
+        return float(model.predict_prices(features)[0])
+    return inference_batcher.submit((model, features)).result()
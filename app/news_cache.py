@@ -0,0 +1,177 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+
+from log_store import normalize_company_name
+
+logger = logging.getLogger(__name__)
+
+# SQLite file shared by every worker process
+NEWS_CACHE_DB = os.environ.get("IPO_NEWS_CACHE_DB", "data/news_cache.sqlite3")
+
+# Seconds a cached result is fresh
+NEWS_CACHE_TTL = float(os.environ.get("IPO_NEWS_CACHE_TTL", 30 * 60))
+
+# Seconds past the TTL during which a stale result is served while it is refreshed
+NEWS_CACHE_STALE_TTL = float(os.environ.get("IPO_NEWS_CACHE_STALE_TTL", 6 * 60 * 60))
+
+# Maximum number of cached companies; least recently used entries are evicted
+NEWS_CACHE_MAX_ENTRIES = int(os.environ.get("IPO_NEWS_CACHE_MAX_ENTRIES", 1000))
+
+# Seconds after which another worker may take over an unfinished refresh
+REFRESH_LEASE = 60
+
+
+class NewsCache:
+    """
+    On-disk TTL cache of news results with stale-while-revalidate.
+
+    Entries are keyed by normalised company name and shared by all worker
+    processes through SQLite. A fresh entry is returned directly; a stale one
+    (older than ``ttl`` but within ``stale_ttl`` more seconds) is returned
+    immediately while a single background refresh runs, claimed across
+    processes with a short lease; anything older is fetched synchronously.
+
+    Args:
+        path (str): SQLite database file
+        ttl (float): Seconds an entry is fresh
+        stale_ttl (float): Seconds past ``ttl`` an entry may still be served
+        max_entries (int): Maximum number of entries kept
+    """
+
+    def __init__(self, path=NEWS_CACHE_DB, ttl=NEWS_CACHE_TTL, stale_ttl=NEWS_CACHE_STALE_TTL,
+                 max_entries=NEWS_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._counters_lock = threading.Lock()
+        self._counters = {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0, "errors": 0, "evictions": 0}
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS news_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, fetched_at REAL NOT NULL, "
+                "accessed_at REAL NOT NULL, refresh_started REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS news_cache_accessed ON news_cache (accessed_at)")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _count(self, name):
+        with self._counters_lock:
+            self._counters[name] += 1
+
+    def get(self, company_name):
+        """
+        Look up a cached value.
+
+        Returns:
+            tuple: (value, age in seconds), or (None, None) when not cached
+        """
+        key = normalize_company_name(company_name)
+        row = self._connection().execute(
+            "SELECT value, fetched_at FROM news_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None, None
+        return json.loads(row[0]), time.time() - row[1]
+
+    def put(self, company_name, value):
+        """Store a value and evict the least recently used entries over the limit"""
+        key = normalize_company_name(company_name)
+        now = time.time()
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO news_cache (key, value, fetched_at, accessed_at, refresh_started) "
+            "VALUES (?, ?, ?, ?, NULL)",
+            (key, json.dumps(value), now, now)
+        )
+        evicted = conn.execute(
+            "DELETE FROM news_cache WHERE key IN ("
+            "SELECT key FROM news_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        ).rowcount
+        if evicted > 0:
+            with self._counters_lock:
+                self._counters["evictions"] += evicted
+
+    def _touch(self, key):
+        self._connection().execute("UPDATE news_cache SET accessed_at = ? WHERE key = ?", (time.time(), key))
+
+    def _claim_refresh(self, key):
+        """Claim the refresh of ``key`` for this process; False if another worker holds it"""
+        now = time.time()
+        claimed = self._connection().execute(
+            "UPDATE news_cache SET refresh_started = ? WHERE key = ? "
+            "AND (refresh_started IS NULL OR refresh_started < ?)",
+            (now, key, now - REFRESH_LEASE)
+        ).rowcount
+        return claimed == 1
+
+    def _refresh(self, company_name, fetch):
+        try:
+            self.put(company_name, fetch(company_name))
+            self._count("refreshes")
+        except Exception as e:
+            self._count("errors")
+            logger.error(f"Error refreshing cached news for {company_name}: {str(e)}")
+
+    def get_or_fetch(self, company_name, fetch):
+        """
+        Get a cached value, fetching or refreshing it as needed.
+
+        Args:
+            company_name (str): Company to look up
+            fetch (callable): Called with ``company_name`` to produce a fresh value;
+                exceptions are not cached
+
+        Returns:
+            Cached or freshly fetched value
+        """
+        key = normalize_company_name(company_name)
+        value, age = self.get(company_name)
+
+        if value is not None and age < self.ttl:
+            self._count("hits")
+            self._touch(key)
+            return value
+
+        if value is not None and age < self.ttl + self.stale_ttl:
+            self._count("stale_hits")
+            self._touch(key)
+            if self._claim_refresh(key):
+                threading.Thread(
+                    target=self._refresh, args=(company_name, fetch), name="news-cache-refresh", daemon=True
+                ).start()
+            return value
+
+        self._count("misses")
+        value = fetch(company_name)
+        self.put(company_name, value)
+        return value
+
+    def stats(self):
+        """
+        Get cache counters for this process and the number of cached entries.
+
+        Returns:
+            dict: hits, stale_hits, misses, refreshes, errors, evictions and entries
+        """
+        with self._counters_lock:
+            counters = dict(self._counters)
+        counters["entries"] = self._connection().execute("SELECT COUNT(*) FROM news_cache").fetchone()[0]
+        return counters
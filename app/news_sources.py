@@ -0,0 +1,424 @@
+import os
+import time
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+
+from log_store import normalize_company_name
+
+logger = logging.getLogger(__name__)
+
+# Worker threads shared by all concurrent news fetches
+NEWS_FETCH_WORKERS = int(os.environ.get("IPO_NEWS_FETCH_WORKERS", 16))
+
+# Seconds a single source request may take
+NEWS_SOURCE_TIMEOUT = float(os.environ.get("IPO_NEWS_SOURCE_TIMEOUT", 8))
+
+# Overall seconds fetch_combined_news waits for sources before returning what arrived
+NEWS_DEADLINE = float(os.environ.get("IPO_NEWS_DEADLINE", 5))
+
+# NewsAPI-compatible endpoint, used when NEWS_API_KEY is set
+NEWS_API_URL = os.environ.get("NEWS_API_URL", "https://newsapi.org/v2/everything")
+
+# Headlines whose shingle sets overlap at least this much are treated as duplicates
+DUPLICATE_TITLE_THRESHOLD = float(os.environ.get("IPO_NEWS_DUPLICATE_THRESHOLD", 0.6))
+
+# Extra RSS feeds queried for every company: comma-separated URL templates with a {query} placeholder
+NEWS_RSS_FEEDS = [url.strip() for url in os.environ.get("IPO_NEWS_RSS_FEEDS", "").split(",") if url.strip()]
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket.
+
+    Args:
+        rate (float): Requests allowed per second
+        burst (int): Requests that may be made back to back
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout=None):
+        """
+        Wait for a token.
+
+        Returns:
+            bool: False if no token became available within ``timeout`` seconds
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                delay = (1 - self._tokens) / self.rate
+            if deadline is not None and time.monotonic() + delay > deadline:
+                return False
+            time.sleep(delay)
+
+
+class SingleFlight:
+    """
+    Collapses identical in-flight calls into one.
+
+    While a call for a key is running, later callers with the same key wait
+    for and share its result instead of starting their own.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn, *args):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+
+        if not leader:
+            return future.result()
+
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                del self._calls[key]
+        return future.result()
+
+
+class NewsSource:
+    """
+    Base class of news source adapters.
+
+    Subclasses implement ``fetch`` and return articles as dicts with title,
+    description, date, url and source keys.
+
+    Args:
+        name (str): Source name, used in logs and as part of the coalescing key
+        rate (float): Requests per second allowed against this source
+        burst (int): Requests that may be made back to back
+        timeout (float): Seconds a single request may take
+    """
+
+    def __init__(self, name, rate=2.0, burst=4, timeout=NEWS_SOURCE_TIMEOUT):
+        self.name = name
+        self.timeout = timeout
+        self.limiter = RateLimiter(rate, burst)
+
+    def fetch(self, company_name):
+        raise NotImplementedError
+
+
+class GNewsSource(NewsSource):
+    """Google News through the GNews client (the original news source)"""
+
+    def __init__(self, period='3d', max_results=5, **kwargs):
+        super().__init__("gnews", **kwargs)
+        self.period = period
+        self.max_results = max_results
+
+    def fetch(self, company_name):
+        from gnews import GNews
+        from sentiment_analysis import parse_gnews_date
+
+        google_news = GNews(language='en', country='IN', period=self.period, max_results=self.max_results)
+        articles = google_news.get_news(f"{company_name} IPO listing") or []
+
+        return [{
+            'title': article.get('title', ''),
+            'description': article.get('description', ''),
+            'date': parse_gnews_date(article.get('published date', '')),
+            'url': article.get('url', ''),
+            'source': article.get('publisher', {}).get('title', '')
+        } for article in articles]
+
+
+class RSSSource(NewsSource):
+    """
+    Any RSS/Atom search feed.
+
+    Args:
+        url_template (str): Feed URL with a ``{query}`` placeholder
+        max_results (int): Maximum articles returned
+    """
+
+    def __init__(self, url_template, name=None, max_results=5, **kwargs):
+        from urllib.parse import urlparse
+
+        super().__init__(name or urlparse(url_template).netloc or "rss", **kwargs)
+        self.url_template = url_template
+        self.max_results = max_results
+
+    def fetch(self, company_name):
+        import feedparser
+        import requests
+        from urllib.parse import quote_plus
+
+        url = self.url_template.format(query=quote_plus(f"{company_name} IPO"))
+        response = requests.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        feed = feedparser.parse(response.content)
+
+        articles = []
+        for entry in feed.entries[:self.max_results]:
+            published = entry.get('published_parsed')
+            articles.append({
+                'title': entry.get('title', ''),
+                'description': entry.get('summary', ''),
+                'date': time.strftime('%Y-%m-%d %H:%M', published) if published else '',
+                'url': entry.get('link', ''),
+                'source': entry.get('source', {}).get('title', '') or self.name
+            })
+        return articles
+
+
+class NewsAPISource(NewsSource):
+    """
+    NewsAPI-style JSON search endpoint (``/v2/everything``).
+
+    Args:
+        api_key (str): API key sent as ``apiKey``
+        url (str): Endpoint URL
+        max_results (int): Maximum articles returned
+    """
+
+    def __init__(self, api_key, url=NEWS_API_URL, max_results=5, **kwargs):
+        super().__init__("newsapi", **kwargs)
+        self.api_key = api_key
+        self.url = url
+        self.max_results = max_results
+
+    def fetch(self, company_name):
+        import requests
+
+        response = requests.get(self.url, timeout=self.timeout, params={
+            'q': f'"{company_name}" IPO',
+            'language': 'en',
+            'sortBy': 'publishedAt',
+            'pageSize': self.max_results,
+            'apiKey': self.api_key
+        })
+        response.raise_for_status()
+
+        articles = []
+        for article in response.json().get('articles', [])[:self.max_results]:
+            published = article.get('publishedAt') or ''
+            articles.append({
+                'title': article.get('title') or '',
+                'description': article.get('description') or '',
+                'date': published[:16].replace('T', ' '),
+                'url': article.get('url') or '',
+                'source': (article.get('source') or {}).get('name', '') or self.name
+            })
+        return articles
+
+
+class FakeNewsSource(NewsSource):
+    """
+    Offline source for tests and benchmarks.
+
+    Args:
+        name (str): Source name
+        articles (list or callable): Articles returned, or a function of the company name
+        delay (float): Seconds to sleep before answering, to simulate slow sources
+        error (Exception, optional): Raised instead of answering
+    """
+
+    def __init__(self, name, articles=(), delay=0.0, error=None, **kwargs):
+        kwargs.setdefault("rate", 1e9)
+        kwargs.setdefault("burst", 1_000_000)
+        super().__init__(name, **kwargs)
+        self.articles = articles
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+
+    def fetch(self, company_name):
+        self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        articles = self.articles(company_name) if callable(self.articles) else self.articles
+        return [dict(article) for article in articles]
+
+
+def default_sources():
+    """GNews, NewsAPI when ``NEWS_API_KEY`` is set, and any feeds in ``IPO_NEWS_RSS_FEEDS``"""
+    sources = [GNewsSource()]
+    if os.getenv('NEWS_API_KEY'):
+        sources.append(NewsAPISource(os.getenv('NEWS_API_KEY')))
+    return sources + [RSSSource(url) for url in NEWS_RSS_FEEDS]
+
+
+def _normalize_title(title):
+    # Feeds often append " - Publisher" to headlines; ignore it when comparing
+    title = title.rsplit(" - ", 1)[0] if " - " in title else title
+    return "".join(ch for ch in title.casefold() if ch.isalnum() or ch.isspace()).split()
+
+
+def title_shingles(title, size=3):
+    """
+    Word shingles of a normalised headline.
+
+    Returns:
+        frozenset: Hashes of every run of ``size`` consecutive words
+            (the whole title when it is shorter)
+    """
+    words = _normalize_title(title)
+    if len(words) <= size:
+        return frozenset([hash(tuple(words))])
+    return frozenset(hash(tuple(words[i:i + size])) for i in range(len(words) - size + 1))
+
+
+def dedupe_articles(articles, threshold=DUPLICATE_TITLE_THRESHOLD):
+    """
+    Drop incomplete articles and near-identical headlines.
+
+    Two headlines are duplicates when the Jaccard similarity of their word
+    shingles reaches ``threshold``; the first one seen is kept.
+
+    Returns:
+        list: Remaining articles in their original order
+    """
+    kept = []
+    kept_shingles = []
+    for article in articles:
+        if not article.get('title') or not article.get('description'):
+            continue
+
+        shingles = title_shingles(article['title'])
+        duplicate = False
+        for other in kept_shingles:
+            overlap = len(shingles & other)
+            if overlap and overlap / len(shingles | other) >= threshold:
+                duplicate = True
+                break
+        if duplicate:
+            continue
+
+        kept.append(article)
+        kept_shingles.append(shingles)
+    return kept
+
+
+class NewsFetcher:
+    """
+    Concurrent news fetcher for many companies and sources.
+
+    Every (company, source) pair runs on a shared thread pool, subject to the
+    source's rate limit and timeout. Identical in-flight requests for the
+    same company and source are collapsed into one upstream call.
+
+    Args:
+        sources (list, optional): NewsSource adapters; defaults to ``default_sources()``
+        max_workers (int): Size of the thread pool
+    """
+
+    def __init__(self, sources=None, max_workers=NEWS_FETCH_WORKERS):
+        self.sources = sources if sources is not None else default_sources()
+        self.max_workers = max_workers
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._single_flight = SingleFlight()
+
+    def _pool(self):
+        # Thread pools do not survive fork(), so each worker process creates its own
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="news-fetch")
+                self._pid = os.getpid()
+            return self._executor
+
+    def _fetch_source(self, source, company_name):
+        key = (source.name, normalize_company_name(company_name))
+        return self._single_flight.do(key, self._call_source, source, company_name)
+
+    @staticmethod
+    def _call_source(source, company_name):
+        if not source.limiter.acquire(timeout=source.timeout):
+            raise TimeoutError(f"rate limit wait exceeded for {source.name}")
+        start = time.perf_counter()
+        articles = source.fetch(company_name)
+        logger.info(f"Fetched {len(articles)} articles for {company_name} from {source.name} in {time.perf_counter() - start:.2f}s")
+        return articles
+
+    def submit(self, company_name, sources=None):
+        """
+        Start fetching one company from every source.
+
+        Returns:
+            dict: Future per source name
+        """
+        pool = self._pool()
+        return {
+            source.name: pool.submit(self._fetch_source, source, company_name)
+            for source in (sources if sources is not None else self.sources)
+        }
+
+    def fetch(self, company_name, timeout=None):
+        """
+        Fetch one company from every source concurrently.
+
+        Raises only if every source failed; sources that fail or exceed
+        ``timeout`` are skipped.
+
+        Returns:
+            list: Articles from all sources that answered
+        """
+        articles = self.fetch_many([company_name], timeout=timeout)[company_name]
+        if isinstance(articles, Exception):
+            raise articles
+        return articles
+
+    def fetch_many(self, company_names, timeout=None):
+        """
+        Fetch many companies from every source concurrently.
+
+        Args:
+            company_names (list): Companies to fetch
+            timeout (float, optional): Overall seconds to wait; defaults to the
+                slowest source timeout plus the rate limit wait
+
+        Returns:
+            dict: Articles per company name; a company whose sources all failed
+                maps to the exception raised
+        """
+        if timeout is None:
+            timeout = 2 * max((source.timeout for source in self.sources), default=0)
+
+        futures = {name: self.submit(name) for name in company_names}
+        wait([f for per_source in futures.values() for f in per_source.values()], timeout=timeout)
+
+        results = {}
+        for name, per_source in futures.items():
+            articles = []
+            errors = []
+            for source_name, future in per_source.items():
+                if not future.done():
+                    errors.append(TimeoutError(f"{source_name} timed out"))
+                elif future.exception() is not None:
+                    errors.append(future.exception())
+                else:
+                    articles.extend(future.result())
+
+            for error in errors:
+                logger.warning(f"News source failed for {name}: {error}")
+            if errors and len(errors) == len(per_source):
+                results[name] = errors[0]
+            else:
+                results[name] = articles
+        return results
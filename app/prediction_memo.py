@@ -0,0 +1,83 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+
+from log_store import normalize_company_name
+
+# Number of distinct predictions whose responses are memoized per process
+PREDICTION_MEMO_SIZE = int(os.environ.get("IPO_PREDICTION_MEMO_SIZE", 10000))
+
+
+class PredictionMemo:
+    """
+    LRU memo of single prediction responses.
+
+    Entries are keyed by a hash of the normalised company name, the scorer
+    inputs as floats and the prediction source (model version and weights
+    fingerprint), so resubmitting the same form is answered without scoring
+    again, and a new model or any edit of the weights never serves a stale
+    price.
+
+    Args:
+        size (int): Maximum memoized predictions (0 disables the memo)
+    """
+
+    def __init__(self, size=PREDICTION_MEMO_SIZE):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._memo = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(company_name, inputs, prediction_source):
+        """
+        Memo key of one prediction.
+
+        Args:
+            company_name (str): Company name, normalised before hashing
+            inputs (tuple): Scorer inputs, in a fixed order
+            prediction_source (str): ``heuristic:<weights version>`` or ``model:<version>``,
+                followed by ``:<weights fingerprint>`` (``ScoringKernel.fingerprint``)
+        """
+        text = "\0".join([normalize_company_name(company_name), prediction_source] + [repr(float(value)) for value in inputs])
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+    def get(self, key):
+        """The memoized value for ``key``, or None"""
+        with self._lock:
+            value = self._memo.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._memo.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        if self.size <= 0:
+            return
+        with self._lock:
+            self._memo[key] = value
+            self._memo.move_to_end(key)
+            while len(self._memo) > self.size:
+                self._memo.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._memo.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._memo),
+                'max_size': self.size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None
+            }
+
+
+prediction_memo = PredictionMemo()
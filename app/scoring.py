@@ -0,0 +1,295 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Input columns of the heuristic scorer, in feature order
+FACTORS = ['issue_price', 'gmp', 'market_cap', 'roce', 'roe', 'industry_growth']
+
+# Path of the weights config; edits are picked up without restarting workers
+WEIGHTS_FILE = os.environ.get("IPO_WEIGHTS_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "weights.json"))
+
+# Seconds between checks of the weights config for changes
+RELOAD_INTERVAL = float(os.environ.get("IPO_WEIGHTS_RELOAD_INTERVAL", 1.0))
+
+# Weights based on historical IPO behavior, used when no config file exists
+DEFAULT_CONFIG = {
+    "version": "default",
+    "weights": {
+        "gmp": 0.60,              # 60% weight - Most important factor
+        "market_cap": 0.20,       # 20% weight - Inverse relationship
+        "roce": 0.10,             # 10% weight
+        "roe": 0.05,              # 5% weight
+        "industry_growth": 0.05   # 5% weight
+    },
+    "gmp_clamp": [-50, 100],        # GMP % capped between -50% and +100%
+    "market_cap_scaling": 2000,
+    "metric_floor": -50,            # ROCE/ROE below -50% are capped
+    "small_cap_threshold": 500,     # Market cap in Cr
+    "small_cap_bonus": 1.10,        # 10% bonus for small caps
+    "score_clamp": [-0.5, 2]        # Limit between -50% and +200%
+}
+
+
+class ScoringKernel:
+    """
+    Heuristic weighted scorer with its constants precomputed from a config.
+
+    ``score`` handles one IPO with plain Python floats and ``score_batch``
+    handles arrays with NumPy; both perform the same operations in the same
+    order, so they agree bit for bit.
+
+    Args:
+        config (dict): Weights config in the shape of ``DEFAULT_CONFIG``
+    """
+
+    def __init__(self, config=None):
+        config = {**DEFAULT_CONFIG, **(config or {})}
+        weights = {**DEFAULT_CONFIG["weights"], **config["weights"]}
+
+        self.config = config
+        self.version = str(config["version"])
+        # Changes with any edit of the config, even one that keeps its version
+        self.fingerprint = hashlib.blake2b(json.dumps(config, sort_keys=True).encode("utf-8"), digest_size=8).hexdigest()
+        self.weights = weights
+
+        # Precompute everything that does not depend on the request
+        self.gmp_weight = float(weights["gmp"])
+        self.gmp_min, self.gmp_max = (float(v) for v in config["gmp_clamp"])
+        self.market_cap_factor = float(config["market_cap_scaling"]) * float(weights["market_cap"])
+        self.roce_weight = float(weights["roce"])
+        self.roe_weight = float(weights["roe"])
+        self.industry_growth_weight = float(weights["industry_growth"])
+        self.metric_floor = float(config["metric_floor"])
+        self.small_cap_threshold = float(config["small_cap_threshold"])
+        self.small_cap_bonus = float(config["small_cap_bonus"])
+        self.score_min, self.score_max = (float(v) for v in config["score_clamp"])
+        self.small_cap_label = f"{round((self.small_cap_bonus - 1) * 100, 2):g}%"
+
+    def score(self, issue_price, gmp, market_cap, roce, roe, industry_growth):
+        """
+        Score a single IPO.
+
+        Args:
+            issue_price (float): IPO issue price in ₹
+            gmp (float): Grey Market Premium in ₹
+            market_cap (float): Market capitalization in Cr
+            roce (float): Return on Capital Employed in %
+            roe (float): Return on Equity in %
+            industry_growth (float): Industry growth rate in %
+
+        Returns:
+            tuple: (predicted_price, weighted_score, contributions) where
+                contributions is a tuple of the gmp, market cap, roce, roe and
+                industry growth contributions in %
+        """
+        # 1. GMP Contribution (clamped)
+        gmp_contribution = min(max((gmp / issue_price) * 100, self.gmp_min), self.gmp_max) * self.gmp_weight
+
+        # 2. Market Cap Contribution (inverse relationship)
+        market_cap_contribution = self.market_cap_factor / max(market_cap, 1)
+
+        # 3. Financial Metrics (ROCE and ROE) with negative values floored
+        roce_contribution = max(roce, self.metric_floor) * self.roce_weight
+        roe_contribution = max(roe, self.metric_floor) * self.roe_weight
+
+        # 4. Industry Growth
+        industry_growth_contribution = industry_growth * self.industry_growth_weight
+
+        contributions = (
+            gmp_contribution,
+            market_cap_contribution,
+            roce_contribution,
+            roe_contribution,
+            industry_growth_contribution
+        )
+        return self._combine(issue_price, market_cap, contributions)
+
+    def rescore_gmp(self, issue_price, gmp, market_cap, contributions):
+        """
+        Re-score an IPO whose GMP changed, recomputing only the GMP term.
+
+        Args:
+            issue_price (float): IPO issue price in ₹
+            gmp (float): New Grey Market Premium in ₹
+            market_cap (float): Market capitalization in Cr
+            contributions (tuple): Contributions returned by ``score`` for
+                the same IPO; only the first (GMP) one is replaced
+
+        Returns:
+            tuple: Same as ``score``, bit for bit
+        """
+        gmp_contribution = min(max((gmp / issue_price) * 100, self.gmp_min), self.gmp_max) * self.gmp_weight
+        return self._combine(issue_price, market_cap, (gmp_contribution,) + tuple(contributions[1:]))
+
+    def _combine(self, issue_price, market_cap, contributions):
+        gmp_contribution, market_cap_contribution, roce_contribution, roe_contribution, industry_growth_contribution = contributions
+        weighted_score = (
+            gmp_contribution +
+            market_cap_contribution +
+            roce_contribution +
+            roe_contribution +
+            industry_growth_contribution
+        ) / 100
+
+        # Small caps protection and final clamp
+        if market_cap < self.small_cap_threshold:
+            weighted_score *= self.small_cap_bonus
+        weighted_score = max(self.score_min, min(self.score_max, weighted_score))
+
+        predicted_price = issue_price * (1 + weighted_score)
+        return predicted_price, weighted_score, contributions
+
+    def breakdown(self, market_cap, weighted_score, contributions):
+        """
+        Format the calculation breakdown returned by the prediction endpoints.
+
+        Returns:
+            dict: Rounded contributions in %
+        """
+        gmp, market_cap_contribution, roce, roe, industry_growth = contributions
+        return {
+            "gmp_contribution": round(gmp, 2),
+            "market_cap_contribution": round(market_cap_contribution, 2),
+            "roce_contribution": round(roce, 2),
+            "roe_contribution": round(roe, 2),
+            "industry_growth_contribution": round(industry_growth, 2),
+            "small_cap_bonus": self.small_cap_label if market_cap < self.small_cap_threshold else "0%",
+            "total_contribution": round(weighted_score * 100, 2)
+        }
+
+    def score_batch(self, issue_price, gmp, market_cap, roce, roe, industry_growth):
+        """
+        Score many IPOs at once.
+
+        Args:
+            issue_price, gmp, market_cap, roce, roe, industry_growth (array-like):
+                Same units as ``score``
+
+        Returns:
+            dict: Arrays of predicted_price, expected_return, weighted_score,
+                small_cap and each factor's contribution (in %)
+        """
+        # NumPy is only needed for batches, so it is not imported at startup
+        import numpy as np
+
+        issue_price = np.asarray(issue_price, dtype=np.float64)
+        gmp = np.asarray(gmp, dtype=np.float64)
+        market_cap = np.asarray(market_cap, dtype=np.float64)
+        roce = np.asarray(roce, dtype=np.float64)
+        roe = np.asarray(roe, dtype=np.float64)
+        industry_growth = np.asarray(industry_growth, dtype=np.float64)
+
+        gmp_contribution = np.minimum(np.maximum((gmp / issue_price) * 100, self.gmp_min), self.gmp_max) * self.gmp_weight
+        market_cap_contribution = self.market_cap_factor / np.maximum(market_cap, 1)
+        roce_contribution = np.maximum(roce, self.metric_floor) * self.roce_weight
+        roe_contribution = np.maximum(roe, self.metric_floor) * self.roe_weight
+        industry_growth_contribution = industry_growth * self.industry_growth_weight
+
+        weighted_score = (
+            gmp_contribution +
+            market_cap_contribution +
+            roce_contribution +
+            roe_contribution +
+            industry_growth_contribution
+        ) / 100
+
+        small_cap = market_cap < self.small_cap_threshold
+        weighted_score = np.where(small_cap, weighted_score * self.small_cap_bonus, weighted_score)
+        weighted_score = np.maximum(self.score_min, np.minimum(self.score_max, weighted_score))
+
+        predicted_price = issue_price * (1 + weighted_score)
+        expected_return = ((predicted_price - issue_price) / issue_price) * 100
+
+        return {
+            'predicted_price': predicted_price,
+            'expected_return': expected_return,
+            'weighted_score': weighted_score,
+            'small_cap': small_cap,
+            'gmp_contribution': gmp_contribution,
+            'market_cap_contribution': market_cap_contribution,
+            'roce_contribution': roce_contribution,
+            'roe_contribution': roe_contribution,
+            'industry_growth_contribution': industry_growth_contribution
+        }
+
+    def score_frame(self, df):
+        """
+        Score every row of a DataFrame holding the ``FACTORS`` columns.
+
+        Returns:
+            pandas.DataFrame: One column per output of ``score_batch``, same index as ``df``
+        """
+        import numpy as np
+        import pandas as pd
+
+        result = self.score_batch(*(df[column].to_numpy(dtype=np.float64) for column in FACTORS))
+        return pd.DataFrame(result, index=df.index)
+
+
+def load_config(path=WEIGHTS_FILE):
+    """
+    Load a weights config, falling back to the defaults if the file is missing.
+
+    Returns:
+        dict: Weights config
+    """
+    if not os.path.exists(path):
+        return dict(DEFAULT_CONFIG)
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+_kernel = None
+_kernel_mtime = None
+_next_check = 0.0
+_reload_lock = threading.Lock()
+
+def get_kernel():
+    """
+    Get the shared scoring kernel, reloading it if the weights config changed.
+
+    The config file's mtime is checked at most once every ``RELOAD_INTERVAL``
+    seconds, so the common path is a clock read and a comparison.
+    """
+    global _kernel, _kernel_mtime, _next_check
+
+    now = time.monotonic()
+    if _kernel is not None and now < _next_check:
+        return _kernel
+
+    with _reload_lock:
+        _next_check = now + RELOAD_INTERVAL
+        try:
+            mtime = os.stat(WEIGHTS_FILE).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+
+        if _kernel is None or mtime != _kernel_mtime:
+            try:
+                kernel = ScoringKernel(load_config(WEIGHTS_FILE))
+            except Exception as e:
+                if _kernel is None:
+                    raise
+                logger.error(f"Error reloading weights config, keeping version {_kernel.version}: {str(e)}")
+            else:
+                if _kernel is not None:
+                    logger.info(f"Reloaded weights config version {kernel.version}")
+                _kernel = kernel
+            _kernel_mtime = mtime
+
+    return _kernel
+
+
+def score_batch(issue_price, gmp, market_cap, roce, roe, industry_growth):
+    """Score many IPOs with the shared kernel (see ``ScoringKernel.score_batch``)"""
+    return get_kernel().score_batch(issue_price, gmp, market_cap, roce, roe, industry_growth)
+
+
+def score_frame(df):
+    """Score a DataFrame with the shared kernel (see ``ScoringKernel.score_frame``)"""
+    return get_kernel().score_frame(df)
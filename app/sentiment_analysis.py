@@ -1,12 +1,14 @@
 import os
 from dotenv import load_dotenv
-from gnews import GNews
-from textblob import TextBlob
 import logging
 import time
 from datetime import datetime, timedelta
 import json
 from functools import lru_cache
+from news_cache import NewsCache
+from news_sources import NEWS_DEADLINE, NewsFetcher, dedupe_articles
+from sentiment_engine import categorize, score_texts
+from instrumentation import stage
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -15,6 +17,12 @@ logger = logging.getLogger(__name__)
 # Load environment variables and verify API keys
 load_dotenv()
 
+# News results shared by all workers, keyed by normalised company name
+news_cache = NewsCache()
+
+# Concurrent, rate-limited fetcher over GNews, NewsAPI and any configured RSS feeds
+news_fetcher = NewsFetcher()
+
 def verify_api_keys():
     """Verify that all required API keys are present in .env file."""
     required_keys = ['NEWS_API_KEY']
@@ -43,103 +51,123 @@ def parse_gnews_date(date_str):
         except ValueError:
             return ''
 
-@lru_cache(maxsize=100)
-def fetch_ipo_news(company_name):
+def _fetch_combined(company_name, fetcher=None, deadline=None):
     """
-    Fetch IPO-related news articles from GNews API with caching.
+    Fan out to every source and de-duplicate whatever arrived before the deadline.
+
+    Raises when every source failed so that failures are never cached.
     """
-    try:
-        logger.info(f"Fetching news for {company_name}")
-        
-        # Initialize GNews with optimized settings
-        google_news = GNews(
-            language='en',
-            country='IN',
-            period='3d',  # Reduced to 3 days
-            max_results=5  # Reduced to 5 articles
-        )
-        
-        # Optimized search query
-        query = f"{company_name} IPO listing"
-        articles = google_news.get_news(query)
-        
-        if not articles:
-            logger.warning(f"No articles found for {company_name}")
-            return []
-            
-        processed_articles = []
-        seen_titles = set()
-        
-        for article in articles:
-            if not article.get('title') or not article.get('description'):
-                continue
-                
-            title = article.get('title', '').lower()
-            if title in seen_titles:
-                continue
-            seen_titles.add(title)
-            
-            processed_articles.append({
-                'title': article.get('title', ''),
-                'description': article.get('description', ''),
-                'date': parse_gnews_date(article.get('published date', '')),
-                'url': article.get('url', ''),
-                'source': article.get('publisher', {}).get('title', '')
-            })
-            
-        return processed_articles
+    logger.info(f"Fetching news for {company_name}")
+    fetcher = fetcher or news_fetcher
+    articles = fetcher.fetch(company_name, timeout=NEWS_DEADLINE if deadline is None else deadline)
+    
+    if not articles:
+        logger.warning(f"No articles found for {company_name}")
         
+    return dedupe_articles(articles)
+
+def fetch_combined_news(company_name, fetcher=None, deadline=None):
+    """
+    Fetch IPO-related news from all sources in parallel under one deadline.
+
+    Sources are queried concurrently; after ``deadline`` seconds the articles
+    that arrived are returned and slower sources are ignored. Near-identical
+    headlines from different sources are collapsed. Results from the default
+    sources go through the shared news cache.
+
+    Args:
+        company_name (str): Company to search for
+        fetcher (NewsFetcher, optional): Fetcher with custom sources (e.g. FakeNewsSource);
+            bypasses the cache
+        deadline (float, optional): Overall seconds to wait, default ``IPO_NEWS_DEADLINE``
+
+    Returns:
+        list: Article dicts
+    """
+    try:
+        with stage("news_fetch"):
+            if fetcher is not None:
+                return _fetch_combined(company_name, fetcher, deadline)
+            return news_cache.get_or_fetch(company_name, lambda name: _fetch_combined(name, deadline=deadline))
     except Exception as e:
-        logger.error(f"Error in fetch_ipo_news: {str(e)}")
+        logger.error(f"Error in fetch_combined_news: {str(e)}")
         return []
 
-def analyze_sentiment(articles):
+def fetch_ipo_news(company_name):
     """
-    Analyze sentiment of news articles with optimized processing.
+    Fetch IPO-related news articles with the shared on-disk TTL cache.
+    """
+    return fetch_combined_news(company_name)
+
+def refresh_news(company_names, timeout=None):
+    """
+    Fetch news for many companies concurrently and store it in the cache.
+
+    Args:
+        company_names (list): Companies to refresh
+        timeout (float, optional): Overall seconds to wait for all sources
+
+    Returns:
+        dict: Articles per company; companies whose sources all failed are omitted
+    """
+    refreshed = {}
+    for company_name, articles in news_fetcher.fetch_many(company_names, timeout=timeout).items():
+        if isinstance(articles, Exception):
+            logger.error(f"Error refreshing news for {company_name}: {str(articles)}")
+            continue
+        refreshed[company_name] = dedupe_articles(articles)
+        news_cache.put(company_name, refreshed[company_name])
+    return refreshed
+
+def analyze_sentiment(articles, backend=None):
+    """
+    Analyze sentiment of news articles with batched, memoized scoring.
     """
     if not articles:
         return [], 0.0
         
-    analyzed_articles = []
-    total_sentiment = 0
-    valid_articles = 0
-    
+    # Combine title and description for analysis, skipping texts that are too short
+    valid = []
     for article in articles:
         try:
-            # Combine title and description for analysis
             text = f"{article['title']} {article['description']}"
-            
-            # Skip if text is too short
-            if len(text.strip()) < 20:
-                continue
-                
-            # Analyze sentiment
-            blob = TextBlob(text)
-            sentiment = blob.sentiment.polarity
-            
-            # Categorize sentiment
-            if sentiment > 0.2:
-                sentiment_category = "Positive"
-            elif sentiment < -0.2:
-                sentiment_category = "Negative"
-            else:
-                sentiment_category = "Neutral"
-                
-            analyzed_article = {
-                **article,
-                'sentiment_score': round(sentiment, 2),
-                'sentiment': sentiment_category
-            }
-            analyzed_articles.append(analyzed_article)
-            
-            total_sentiment += sentiment
-            valid_articles += 1
-            
         except Exception as e:
             logger.error(f"Error analyzing article: {str(e)}")
             continue
-    
-    average_sentiment = round(total_sentiment / valid_articles, 2) if valid_articles > 0 else 0.0
+        if len(text.strip()) < 20:
+            continue
+        valid.append((article, text))
+        
+    if not valid:
+        return [], 0.0
+        
+    # Score every text in one batch
+    try:
+        with stage("sentiment"):
+            scored = list(zip(valid, score_texts([text for _, text in valid], backend=backend)))
+    except Exception as e:
+        # Score the articles one at a time, so only the ones that fail are skipped
+        logger.warning(f"Error analyzing articles as a batch, scoring them one by one: {str(e)}")
+        scored = []
+        for article, text in valid:
+            try:
+                scored.append(((article, text), score_texts([text], backend=backend)[0]))
+            except Exception as e:
+                logger.error(f"Error analyzing article: {str(e)}")
+        if not scored:
+            return [], 0.0
+        
+    analyzed_articles = []
+    sentiments = []
+    for (article, _), sentiment in scored:
+        sentiments.append(sentiment)
+        analyzed_articles.append({
+            **article,
+            'sentiment_score': round(sentiment, 2),
+            'sentiment': categorize(sentiment)
+        })
+        
+    average_sentiment = round(sum(sentiments) / len(sentiments), 2)
     return analyzed_articles, average_sentiment
 
 def get_news_sentiment(company_name):
@@ -0,0 +1,161 @@
+import os
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Scoring backend: "textblob" (polarity) or "vader" (NLTK VADER compound score)
+SENTIMENT_BACKEND = os.environ.get("IPO_SENTIMENT_BACKEND", "textblob")
+
+# Number of distinct texts whose scores are memoized per process
+SENTIMENT_MEMO_SIZE = int(os.environ.get("IPO_SENTIMENT_MEMO_SIZE", 100000))
+
+# Batches with at least this many unscored texts are spread over a process pool
+PARALLEL_THRESHOLD = int(os.environ.get("IPO_SENTIMENT_PARALLEL_THRESHOLD", 2000))
+
+# Texts sent to a pool worker at a time
+CHUNK_SIZE = 500
+
+# Category thresholds on the polarity score
+POSITIVE_THRESHOLD = 0.2
+NEGATIVE_THRESHOLD = -0.2
+
+_analyzers = {}
+
+def _analyzer(backend):
+    """Build (once per process) the scoring function of a backend"""
+    if backend not in _analyzers:
+        if backend == "textblob":
+            from textblob import TextBlob
+
+            _analyzers[backend] = lambda text: TextBlob(text).sentiment.polarity
+        elif backend == "vader":
+            from nltk.sentiment.vader import SentimentIntensityAnalyzer
+
+            try:
+                vader = SentimentIntensityAnalyzer()
+            except LookupError:
+                logger.error("VADER lexicon not installed (python -m nltk.downloader vader_lexicon); using TextBlob")
+                _analyzers[backend] = _analyzer("textblob")
+            else:
+                _analyzers[backend] = lambda text: vader.polarity_scores(text)["compound"]
+        else:
+            raise ValueError(f"Unknown sentiment backend: {backend}")
+    return _analyzers[backend]
+
+def _score_chunk(backend, texts):
+    score = _analyzer(backend)
+    return [score(text) for text in texts]
+
+def categorize(score):
+    """Map a polarity score to Positive, Negative or Neutral"""
+    if score > POSITIVE_THRESHOLD:
+        return "Positive"
+    elif score < NEGATIVE_THRESHOLD:
+        return "Negative"
+    return "Neutral"
+
+
+class SentimentEngine:
+    """
+    Batch sentiment scorer with memoization and optional process parallelism.
+
+    Scores are memoized by a hash of the backend name and text, so repeated
+    headlines are scored once per process. Large batches of unscored texts
+    are split into chunks and scored across a process pool.
+
+    Args:
+        backend (str): "textblob" or "vader"
+        memo_size (int): Maximum memoized scores
+        processes (int, optional): Pool size; defaults to the CPU count
+    """
+
+    def __init__(self, backend=SENTIMENT_BACKEND, memo_size=SENTIMENT_MEMO_SIZE, processes=None):
+        self.backend = backend
+        self.memo_size = memo_size
+        self.processes = processes
+        self._memo = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pool_pid = None
+
+    def _key(self, text):
+        return hashlib.blake2b(f"{self.backend}\0{text}".encode("utf-8"), digest_size=16).digest()
+
+    def _executor(self):
+        from concurrent.futures import ProcessPoolExecutor
+
+        with self._lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                self._pool = ProcessPoolExecutor(self.processes)
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def score_texts(self, texts, parallel=None):
+        """
+        Score a list of texts.
+
+        Args:
+            texts (list): Texts to score
+            parallel (bool, optional): Force or disable the process pool; by
+                default it is used when at least ``PARALLEL_THRESHOLD`` texts need scoring
+
+        Returns:
+            list: Polarity score per text, in order
+        """
+        keys = [self._key(text) for text in texts]
+        scores = [None] * len(texts)
+        missing = {}
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                score = self._memo.get(key)
+                if score is None:
+                    missing.setdefault(key, []).append(i)
+                else:
+                    self._memo.move_to_end(key)
+                    scores[i] = score
+
+        if missing:
+            pending = [(key, texts[positions[0]]) for key, positions in missing.items()]
+            pending_texts = [text for _, text in pending]
+
+            if parallel is None:
+                parallel = len(pending) >= PARALLEL_THRESHOLD and (self.processes or os.cpu_count() or 1) > 1
+            if parallel:
+                chunks = [pending_texts[i:i + CHUNK_SIZE] for i in range(0, len(pending_texts), CHUNK_SIZE)]
+                results = [
+                    score
+                    for chunk_scores in self._executor().map(_score_chunk, [self.backend] * len(chunks), chunks)
+                    for score in chunk_scores
+                ]
+            else:
+                results = _score_chunk(self.backend, pending_texts)
+
+            with self._lock:
+                for (key, _), score in zip(pending, results):
+                    for i in missing[key]:
+                        scores[i] = score
+                    self._memo[key] = score
+                while len(self._memo) > self.memo_size:
+                    self._memo.popitem(last=False)
+
+        return scores
+
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+def get_engine(backend=None):
+    """Get the shared engine for a backend (default ``IPO_SENTIMENT_BACKEND``)"""
+    backend = backend or SENTIMENT_BACKEND
+    with _engines_lock:
+        if backend not in _engines:
+            _engines[backend] = SentimentEngine(backend)
+        return _engines[backend]
+
+def score_texts(texts, backend=None, parallel=None):
+    """Score texts with the shared engine (see ``SentimentEngine.score_texts``)"""
+    return get_engine(backend).score_texts(texts, parallel=parallel)
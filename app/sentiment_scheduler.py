@@ -0,0 +1,252 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from log_store import normalize_company_name
+from news_cache import NEWS_CACHE_DB
+
+logger = logging.getLogger(__name__)
+
+# Seconds between background refreshes of open IPOs
+SENTIMENT_REFRESH_INTERVAL = float(os.environ.get("IPO_SENTIMENT_REFRESH_INTERVAL", 15 * 60))
+
+# Seconds a worker keeps precomputed sentiment in memory before re-reading SQLite
+LOCAL_CACHE_SECONDS = float(os.environ.get("IPO_SENTIMENT_LOCAL_CACHE_SECONDS", 5))
+
+# Companies a worker keeps precomputed sentiment for in memory (least recently used are dropped)
+LOCAL_CACHE_SIZE = int(os.environ.get("IPO_SENTIMENT_LOCAL_CACHE_SIZE", 1024))
+
+# Set IPO_SENTIMENT_SCHEDULER=0 to disable the background refresh loop
+SCHEDULER_ENABLED = os.environ.get("IPO_SENTIMENT_SCHEDULER", "1") != "0"
+
+
+class SentimentStore:
+    """
+    Precomputed sentiment per company, shared by workers through SQLite.
+
+    Reads go through a small in-process LRU of ``local_cache_size``
+    companies whose entries are trusted for ``local_cache_seconds``, so the
+    request path is a dict lookup.
+
+    Args:
+        path (str): SQLite database file (shared with the news cache by default)
+        local_cache_seconds (float): Seconds an in-process entry is reused
+        local_cache_size (int): Maximum companies kept in memory
+    """
+
+    def __init__(self, path=NEWS_CACHE_DB, local_cache_seconds=LOCAL_CACHE_SECONDS, local_cache_size=LOCAL_CACHE_SIZE):
+        self.path = path
+        self.local_cache_seconds = local_cache_seconds
+        self.local_cache_size = local_cache_size
+        self._local = threading.local()
+        self._memory = OrderedDict()
+        self._memory_lock = threading.Lock()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sentiment ("
+                "key TEXT PRIMARY KEY, company_name TEXT NOT NULL, score REAL NOT NULL, "
+                "articles TEXT NOT NULL, computed_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS scheduler_lease (name TEXT PRIMARY KEY, owner TEXT, expires_at REAL)"
+            )
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def put(self, company_name, score, articles):
+        key = normalize_company_name(company_name)
+        now = time.time()
+        self._connection().execute(
+            "INSERT OR REPLACE INTO sentiment (key, company_name, score, articles, computed_at) VALUES (?, ?, ?, ?, ?)",
+            (key, company_name, score, json.dumps(articles), now)
+        )
+        self._remember(key, (score, articles, now, time.monotonic()))
+
+    def _remember(self, key, entry):
+        with self._memory_lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.local_cache_size:
+                self._memory.popitem(last=False)
+
+    def get(self, company_name):
+        """
+        Get precomputed sentiment.
+
+        Returns:
+            tuple: (score, articles, age in seconds), or None if never computed
+        """
+        key = normalize_company_name(company_name)
+        with self._memory_lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+        if entry is None or time.monotonic() - entry[3] > self.local_cache_seconds:
+            row = self._connection().execute(
+                "SELECT score, articles, computed_at FROM sentiment WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                with self._memory_lock:
+                    self._memory.pop(key, None)
+                return None
+            entry = (row[0], json.loads(row[1]), row[2], time.monotonic())
+            self._remember(key, entry)
+
+        score, articles, computed_at, _ = entry
+        return score, articles, time.time() - computed_at
+
+    def claim_lease(self, name, seconds):
+        """Claim a named lease across workers; True if this process now holds it"""
+        now = time.time()
+        owner = str(os.getpid())
+        conn = self._connection()
+        conn.execute("INSERT OR IGNORE INTO scheduler_lease (name, owner, expires_at) VALUES (?, NULL, 0)", (name,))
+        claimed = conn.execute(
+            "UPDATE scheduler_lease SET owner = ?, expires_at = ? WHERE name = ? AND (expires_at < ? OR owner = ?)",
+            (owner, now + seconds, name, now, owner)
+        ).rowcount
+        return claimed == 1
+
+
+class SentimentScheduler:
+    """
+    Background refresher of news sentiment for open IPOs.
+
+    Every ``interval`` seconds one worker (elected through a lease in the
+    store) fetches news for every logged company without an actual price,
+    scores it and stores the result. Requests for companies that have no
+    precomputed sentiment can queue a one-off refresh with ``request_refresh``.
+
+    Args:
+        store (SentimentStore): Where results are stored
+        interval (float): Seconds between refresh cycles
+    """
+
+    def __init__(self, store, interval=SENTIMENT_REFRESH_INTERVAL):
+        self.store = store
+        self.interval = interval
+        self._thread = None
+        self._pid = None
+        self._executor = None
+        self._in_flight = set()
+        self._lock = threading.Lock()
+
+    def _ensure_executor(self):
+        # Threads do not survive fork(), so each worker process creates its own
+        if self._executor is None or self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._executor = ThreadPoolExecutor(2, thread_name_prefix="sentiment-refresh")
+            self._in_flight = set()
+            self._thread = None
+        return self._executor
+
+    def start(self):
+        """Start the refresh loop in this process (idempotent, fork-aware)"""
+        with self._lock:
+            self._ensure_executor()
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="sentiment-scheduler", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                if self.store.claim_lease("sentiment-refresh", self.interval):
+                    self.refresh_open_companies()
+            except Exception as e:
+                logger.error(f"Error in sentiment refresh cycle: {str(e)}")
+            time.sleep(self.interval)
+
+    def refresh_open_companies(self):
+        """
+        Refresh sentiment for every logged company without an actual price.
+
+        Returns:
+            int: Number of companies refreshed
+        """
+        from ipo_logger import get_open_companies
+        from sentiment_analysis import refresh_news, analyze_sentiment
+
+        companies = get_open_companies()
+        if not companies:
+            return 0
+
+        start = time.time()
+        refreshed = refresh_news(companies)
+        for company_name, articles in refreshed.items():
+            analyzed_articles, score = analyze_sentiment(articles)
+            self.store.put(company_name, score, analyzed_articles)
+
+        logger.info(f"Refreshed sentiment for {len(refreshed)}/{len(companies)} open IPOs in {time.time() - start:.2f}s")
+        return len(refreshed)
+
+    def refresh(self, company_name):
+        """Fetch, score and store sentiment for one company"""
+        from sentiment_analysis import fetch_combined_news, analyze_sentiment
+
+        analyzed_articles, score = analyze_sentiment(fetch_combined_news(company_name))
+        self.store.put(company_name, score, analyzed_articles)
+
+    def request_refresh(self, company_name):
+        """Queue a background refresh for one company unless one is already running"""
+        key = normalize_company_name(company_name)
+        with self._lock:
+            executor = self._ensure_executor()
+            if key in self._in_flight:
+                return
+            self._in_flight.add(key)
+
+        def run():
+            try:
+                self.refresh(company_name)
+            except Exception as e:
+                logger.error(f"Error refreshing sentiment for {company_name}: {str(e)}")
+            finally:
+                with self._lock:
+                    self._in_flight.discard(key)
+
+        executor.submit(run)
+
+
+sentiment_store = SentimentStore()
+scheduler = SentimentScheduler(sentiment_store)
+
+def get_precomputed_sentiment(company_name):
+    """
+    Get precomputed sentiment, queueing a background refresh on a miss.
+
+    Only open IPOs in the prediction log (see ``ipo_logger.is_open_company``)
+    are refreshed on a miss, so request names cannot make the service fetch
+    news for arbitrary companies. A company predicted for the first time is
+    picked up once its prediction is logged.
+
+    Returns:
+        tuple: (score, articles, age in seconds), or None when nothing is
+            precomputed yet
+    """
+    from ipo_logger import is_open_company
+
+    result = sentiment_store.get(company_name)
+    if result is None and is_open_company(company_name):
+        scheduler.request_refresh(company_name)
+    return result
+
+def start_scheduler():
+    """Start the background refresh loop unless IPO_SENTIMENT_SCHEDULER=0"""
+    if SCHEDULER_ENABLED:
+        scheduler.start()
@@ -0,0 +1,324 @@
+"""
+Async (ASGI) prediction service.
+
+Serves the routes of the Flask API (api.py) together with the precomputed
+news sentiment that main.py used to add to predictions, from one event
+loop per worker. The request handling itself is shared with api.py
+(see handlers.py) and runs on thread pools, so a slow log write, sentiment
+lookup or model call never blocks the loop:
+
+- sentiment lookups run on a small pool of their own, so a slow news or
+  sentiment store cannot take the threads that write the log
+- everything else that blocks (scoring, model calls, log writes and reads)
+  runs on the handler pool
+
+Each route admits a bounded number of concurrent requests and queues a
+few more for a short time; past that it answers 429 with a Retry-After
+header instead of letting requests pile up. Run from the app directory:
+
+    uvicorn service:app --port 10000 [--workers 4]
+"""
+import io
+import os
+import math
+import asyncio
+import logging
+import functools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+import handlers
+import instrumentation
+from sentiment_scheduler import start_scheduler
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Threads per worker running blocking handlers (scoring, model calls, log reads and writes)
+HANDLER_WORKERS = int(os.environ.get("IPO_SERVICE_HANDLER_WORKERS", 8))
+
+# Threads per worker looking up news sentiment
+SENTIMENT_WORKERS = int(os.environ.get("IPO_SERVICE_SENTIMENT_WORKERS", 4))
+
+# Requests each route runs at once per worker, overridable as "predict=32,history=16"
+ROUTE_LIMITS = {
+    "predict": 64,
+    "predict_batch": 4,
+    "update_price": 16,
+    "update_prices": 4,
+    "gmp": 4,
+    "history": 32,
+    "stats": 16
+}
+ROUTE_LIMITS.update({
+    name.strip(): int(limit)
+    for name, _, limit in (part.partition("=") for part in os.environ.get("IPO_SERVICE_ROUTE_LIMITS", "").split(",") if part.strip())
+})
+
+# Seconds a request waits for a free slot on its route before it is rejected with 429
+QUEUE_TIMEOUT = float(os.environ.get("IPO_SERVICE_QUEUE_TIMEOUT", 0.5))
+
+# Seconds clients are told to wait before retrying a rejected request
+RETRY_AFTER = float(os.environ.get("IPO_SERVICE_RETRY_AFTER", 1))
+
+
+class RouteLimiter:
+    """
+    Caps the requests a route runs at once.
+
+    Up to ``limit`` requests run concurrently; up to ``limit`` more wait at
+    most ``timeout`` seconds for a slot. Anything beyond that is rejected
+    right away, so clients back off instead of queueing behind a saturated
+    worker.
+
+    Args:
+        name (str): Route name, for stats
+        limit (int): Concurrent requests
+        timeout (float): Seconds a request may wait for a slot
+    """
+
+    def __init__(self, name, limit, timeout=QUEUE_TIMEOUT):
+        self.name = name
+        self.limit = limit
+        self.timeout = timeout
+        self.running = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self._semaphore = asyncio.Semaphore(limit)
+
+    async def acquire(self):
+        """Wait for a slot; False if the request should be rejected"""
+        if self._semaphore.locked():
+            if self.waiting >= self.limit:
+                self.rejected += 1
+                return False
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.timeout)
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                return False
+            finally:
+                self.waiting -= 1
+        else:
+            await self._semaphore.acquire()
+        self.running += 1
+        self.admitted += 1
+        return True
+
+    def release(self):
+        self.running -= 1
+        self._semaphore.release()
+
+    def stats(self):
+        return {
+            'limit': self.limit,
+            'running': self.running,
+            'waiting': self.waiting,
+            'admitted': self.admitted,
+            'rejected': self.rejected
+        }
+
+
+# Route limiters and thread pools, created in each worker process when the app starts
+limiters = {}
+_handler_pool = None
+_sentiment_pool = None
+
+def limited(name):
+    """Run an endpoint under the route limiter ``name``, answering 429 when it is full"""
+    def decorator(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(request):
+            limiter = limiters[name]
+            if not await limiter.acquire():
+                retry_after = math.ceil(RETRY_AFTER)
+                return JSONResponse(
+                    {'error': 'Too many requests, please retry later', 'retry_after': retry_after},
+                    status_code=429,
+                    headers={'Retry-After': str(retry_after)}
+                )
+            try:
+                response = await endpoint(request)
+            except BaseException:
+                limiter.release()
+                raise
+            if isinstance(response, StreamingResponse):
+                # A streamed body is produced as it is sent, so the slot is held until then
+                return _ReleaseAfterSend(response, limiter)
+            limiter.release()
+            return response
+        return wrapper
+    return decorator
+
+
+class _ReleaseAfterSend:
+    """ASGI response that frees a route slot once ``response`` is sent, fails or is cut off"""
+
+    def __init__(self, response, limiter):
+        self.response = response
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await self.response(scope, receive, send)
+        finally:
+            self.limiter.release()
+
+
+async def run_blocking(executor, fn, *args):
+    """Run a blocking call on ``executor`` with the request's context, so its stages reach the trace"""
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(executor, functools.partial(context.run, fn, *args))
+
+async def _json(request):
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+def _respond(result):
+    body, status = result
+    return JSONResponse(body, status_code=status)
+
+async def _cached(request, key, build):
+    """Serve a read endpoint through the ETag-validated response cache"""
+    status, body, headers = await run_blocking(
+        _handler_pool, handlers.cached_read, key, build,
+        request.headers.get('if-none-match'), request.headers.get('accept-encoding')
+    )
+    return Response(body, status_code=status, headers=headers)
+
+
+@limited("predict")
+async def predict(request):
+    data = await _json(request)
+
+    sentiment = None
+    if isinstance(data, dict) and data.get('company_name'):
+        try:
+            sentiment = await run_blocking(_sentiment_pool, handlers.lookup_sentiment, data['company_name'])
+        except Exception as e:
+            logger.error(f"Error reading sentiment for {data['company_name']}: {str(e)}")
+
+    return _respond(await run_blocking(_handler_pool, handlers.predict, data, sentiment))
+
+@limited("predict_batch")
+async def predict_batch(request):
+    if request.headers.get('content-type', '').startswith('multipart/form-data'):
+        async with request.form() as form:
+            upload = form.get('file')
+            if upload is None or isinstance(upload, str):
+                return JSONResponse({'error': 'No rows to score'}, status_code=400)
+            csv_file = io.BytesIO(await upload.read())
+        return _respond(await run_blocking(_handler_pool, functools.partial(handlers.predict_batch, csv_file=csv_file)))
+    return _respond(await run_blocking(_handler_pool, handlers.predict_batch, await _json(request)))
+
+@limited("update_price")
+async def update_price(request):
+    data = await _json(request)
+    if not isinstance(data, dict):
+        return JSONResponse({'error': 'Request body must be a JSON object'}, status_code=400)
+    return _respond(await run_blocking(_handler_pool, handlers.update_price, data))
+
+@limited("update_prices")
+async def update_prices(request):
+    return _respond(await run_blocking(_handler_pool, handlers.update_prices, await _json(request)))
+
+@limited("gmp")
+async def ingest_gmp(request):
+    return _respond(await run_blocking(_handler_pool, handlers.ingest_gmp, await _json(request)))
+
+@limited("history")
+async def gmp_trajectory(request):
+    return _respond(await run_blocking(_handler_pool, handlers.gmp_trajectory, request.query_params))
+
+@limited("history")
+async def history(request):
+    try:
+        query, limit, ndjson = handlers.parse_history_args(request.query_params)
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+
+    if ndjson:
+        # Starlette iterates a plain generator on its thread pool
+        return StreamingResponse(handlers.history_lines(query, limit), media_type='application/x-ndjson')
+    return await _cached(request, handlers.history_key(query, limit), functools.partial(handlers.history_page, query, limit))
+
+@limited("stats")
+async def history_stats(request):
+    return _respond(await run_blocking(_handler_pool, handlers.history_stats))
+
+@limited("stats")
+async def accuracy(request):
+    return await _cached(request, ('accuracy',), handlers.accuracy)
+
+@limited("stats")
+async def model_stats(request):
+    return _respond(await run_blocking(_handler_pool, handlers.model_stats))
+
+async def service_stats(request):
+    return JSONResponse({name: limiter.stats() for name, limiter in limiters.items()})
+
+async def metrics(request):
+    return PlainTextResponse(instrumentation.render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+def create_app(warm=False):
+    """
+    Build the ASGI app.
+
+    Args:
+        warm (bool): Load the heavy modules, model and prediction log at startup
+            instead of on the first request
+
+    Returns:
+        Starlette: The app with the API routes, CORS and instrumentation configured
+    """
+    @asynccontextmanager
+    async def lifespan(app):
+        global _handler_pool, _sentiment_pool
+        limiters.update({name: RouteLimiter(name, limit) for name, limit in ROUTE_LIMITS.items()})
+        _handler_pool = ThreadPoolExecutor(HANDLER_WORKERS, thread_name_prefix="service-handler")
+        _sentiment_pool = ThreadPoolExecutor(SENTIMENT_WORKERS, thread_name_prefix="service-sentiment")
+        if warm:
+            await run_blocking(_handler_pool, handlers.warm_up)
+        # Refresh news sentiment for open IPOs in the background
+        start_scheduler()
+        try:
+            yield
+        finally:
+            _handler_pool.shutdown(wait=False)
+            _sentiment_pool.shutdown(wait=False)
+
+    routes = [
+        Route('/api/predict', predict, methods=['POST']),
+        Route('/api/predict/batch', predict_batch, methods=['POST']),
+        Route('/api/update-price', update_price, methods=['POST']),
+        Route('/api/update-prices', update_prices, methods=['POST']),
+        Route('/api/gmp', ingest_gmp, methods=['POST']),
+        Route('/api/gmp/trajectory', gmp_trajectory, methods=['GET']),
+        Route('/api/history', history, methods=['GET']),
+        Route('/api/history/stats', history_stats, methods=['GET']),
+        Route('/api/accuracy', accuracy, methods=['GET']),
+        Route('/api/model/stats', model_stats, methods=['GET']),
+        Route('/api/service/stats', service_stats, methods=['GET'])
+    ]
+    if instrumentation.METRICS_ENABLED:
+        routes.append(Route('/metrics', metrics, methods=['GET']))
+
+    middleware = [Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])]
+    if instrumentation.STAGES_ENABLED:
+        middleware.append(Middleware(instrumentation.TraceMiddleware))
+
+    return Starlette(routes=routes, middleware=middleware, lifespan=lifespan)
+
+app = create_app()
@@ -0,0 +1,206 @@
+import os
+import gzip
+import json
+
+# Columns of a prediction row: those of the legacy CSV log, in its order, then the ones added since
+COLUMNS = [
+    "company_name", "issue_price", "predicted_price", "actual_price",
+    "prediction_date", "listing_date", "market_cap", "gmp",
+    "industry_growth", "roce", "roe", "sentiment_score",
+    "hit_count", "last_seen", "latest_gmp", "rescored_price"
+]
+
+# Column types; dates stay ISO strings (YYYY-MM-DD) so they compare lexically,
+# last_seen is a Unix time so repeats do not intern a new string each
+STRING_COLUMNS = {"company_name", "prediction_date", "listing_date"}
+
+
+def _require_pyarrow():
+    """Import pyarrow, which only the columnar formats need"""
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError("The arrow and parquet log formats require pyarrow (pip install pyarrow)")
+    return pyarrow
+
+
+def arrow_schema():
+    """Explicit Arrow schema of a snapshot: the row id followed by ``COLUMNS``"""
+    pa = _require_pyarrow()
+    return pa.schema(
+        [pa.field("id", pa.int64(), nullable=False)] +
+        [pa.field(c, pa.string() if c in STRING_COLUMNS else pa.float64()) for c in COLUMNS]
+    )
+
+
+def coerce_value(column, value):
+    """Coerce a stored value to its column type (None when it does not fit)"""
+    if value is None:
+        return None
+    if column in STRING_COLUMNS:
+        return str(value)
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if value != value else value
+
+
+def conform_table(table, columns=None):
+    """
+    Add the ``COLUMNS`` missing from a snapshot written before they existed.
+
+    Missing columns are filled with nulls of the schema type; the result has
+    ``columns`` (default: the whole schema) in order.
+    """
+    import pyarrow as pa
+
+    schema = arrow_schema()
+    for field in schema:
+        if field.name not in table.column_names:
+            table = table.append_column(field, pa.nulls(len(table), field.type))
+    return table.select(columns or schema.names)
+
+
+def arrow_table(rows):
+    """Build a pyarrow Table with the snapshot schema from ``(row_id, row)`` pairs"""
+    import pyarrow as pa
+
+    return pa.Table.from_pylist(
+        [{"id": row_id, **{c: coerce_value(c, row.get(c)) for c in COLUMNS}} for row_id, row in rows],
+        schema=arrow_schema()
+    )
+
+
+class JsonlSnapshot:
+    """One JSON object per row; the original snapshot format, gzipped when compressed"""
+
+    name = "jsonl"
+    extension = "jsonl"
+
+    def file_extension(self, compressed=False):
+        return self.extension + ".gz" if compressed else self.extension
+
+    def write(self, path, rows, compressed=False):
+        with open(path, "wb") as raw:
+            f = gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6, mtime=0) if compressed else raw
+            # One write per block of lines rather than per row, which gzip makes costly
+            lines = []
+            for row_id, row in rows:
+                lines.append(json.dumps({"id": row_id, **{c: row.get(c) for c in COLUMNS}}, separators=(",", ":")))
+                if len(lines) == 4096:
+                    f.write(("\n".join(lines) + "\n").encode("utf-8"))
+                    lines = []
+            if lines:
+                f.write(("\n".join(lines) + "\n").encode("utf-8"))
+            if compressed:
+                f.close()
+            raw.flush()
+            os.fsync(raw.fileno())
+
+    def read(self, path):
+        rows = {}
+        with (gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")) as f:
+            for line in f:
+                record = json.loads(line)
+                rows[record.pop("id")] = record
+        return rows
+
+    def read_table(self, path, columns=None, filter=None):
+        table = arrow_table(self.read(path).items())
+        if filter is not None:
+            table = table.filter(filter)
+        return table.select(columns) if columns else table
+
+
+class ArrowSnapshot:
+    """
+    Arrow IPC file with an explicit schema.
+
+    Reads memory-map the file, so column selection is zero-copy and pages are
+    shared between processes reading the same snapshot. Compressed files
+    (closed log segments) use zstd buffers, which are decoded on read.
+    """
+
+    name = "arrow"
+    extension = "arrow"
+
+    def file_extension(self, compressed=False):
+        return self.extension
+
+    def write(self, path, rows, compressed=False):
+        import pyarrow as pa
+
+        table = arrow_table(rows)
+        # Compressed buffers are decoded on read, so only closed segments use them
+        options = pa.ipc.IpcWriteOptions(compression="zstd" if compressed else None)
+        with pa.OSFile(path, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema, options=options) as writer:
+                writer.write_table(table)
+        with open(path, "rb+") as f:
+            os.fsync(f.fileno())
+
+    def read_table(self, path, columns=None, filter=None):
+        import pyarrow as pa
+
+        table = conform_table(pa.ipc.open_file(pa.memory_map(path, "r")).read_all())
+        if filter is not None:
+            table = table.filter(filter)
+        return table.select(columns) if columns else table
+
+    def read(self, path):
+        table = self.read_table(path)
+        ids = table.column("id").to_pylist()
+        values = {c: table.column(c).to_pylist() for c in COLUMNS}
+        return {row_id: {c: values[c][i] for c in COLUMNS} for i, row_id in enumerate(ids)}
+
+
+class ParquetSnapshot(ArrowSnapshot):
+    """
+    Parquet file with an explicit schema, zstd-compressed for closed segments.
+
+    Reads push column selection and filters down to the Parquet reader, so
+    only the needed columns and row groups are decoded.
+    """
+
+    name = "parquet"
+    extension = "parquet"
+
+    # Rows per row group; smaller groups let filters skip more data
+    row_group_size = 64 * 1024
+
+    def write(self, path, rows, compressed=False):
+        import pyarrow.parquet as pq
+
+        pq.write_table(arrow_table(rows), path, compression="zstd" if compressed else "none", row_group_size=self.row_group_size)
+        with open(path, "rb+") as f:
+            os.fsync(f.fileno())
+
+    def read_table(self, path, columns=None, filter=None):
+        import pyarrow.parquet as pq
+
+        # Only read the columns the file has; conform_table fills in the rest
+        present = set(pq.read_schema(path, memory_map=True).names)
+        selected = [c for c in columns if c in present] if columns else None
+        table = pq.read_table(path, columns=selected, filters=filter, memory_map=True)
+        return conform_table(table, columns)
+
+
+SNAPSHOT_FORMATS = {fmt.name: fmt for fmt in (JsonlSnapshot(), ArrowSnapshot(), ParquetSnapshot())}
+
+
+def get_snapshot_format(name):
+    """
+    Get a snapshot format by name ("jsonl", "arrow" or "parquet").
+
+    Raises:
+        ValueError: If the format is unknown
+        ImportError: If the format needs pyarrow and it is not installed
+    """
+    try:
+        fmt = SNAPSHOT_FORMATS[name]
+    except KeyError:
+        raise ValueError(f"Unknown prediction log format: {name}")
+    if name != "jsonl":
+        _require_pyarrow()
+    return fmt
@@ -0,0 +1,27 @@
+import os
+import sys
+
+# The app modules import each other by bare name, as when run from app/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+
+@pytest.fixture
+def prediction_log(tmp_path, monkeypatch):
+    """Point ``ipo_logger`` (and the GMP store) at an empty log under ``tmp_path``"""
+    import gmp_series
+    import ipo_logger
+    from accuracy import AccuracyTracker
+
+    monkeypatch.setattr(ipo_logger, "STORE_DIR", str(tmp_path / "predictions"))
+    monkeypatch.setattr(ipo_logger, "LOG_FILE", str(tmp_path / "ipo_predictions.csv"))
+    monkeypatch.setattr(ipo_logger, "LOG_FSYNC", False)
+    monkeypatch.setattr(ipo_logger, "_store", None)
+    monkeypatch.setattr(ipo_logger, "_history_cache", None)
+    monkeypatch.setattr(ipo_logger, "_accuracy", AccuracyTracker())
+    monkeypatch.setattr(gmp_series, "GMP_DIR", str(tmp_path / "gmp"))
+    monkeypatch.setattr(gmp_series, "_store", None)
+    yield ipo_logger
+    if ipo_logger._store is not None:
+        ipo_logger._store.close()
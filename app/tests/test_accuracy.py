@@ -0,0 +1,78 @@
+import random
+
+import pytest
+
+from accuracy import AccuracyTracker
+from log_store import PredictionLogStore
+
+
+def flatten(summary):
+    """(group, label, metric) -> value of a summary, for comparisons with a tolerance"""
+    flat = {("overall", None, metric): value for metric, value in summary["overall"].items()}
+    for group in ("by_market_cap", "by_gmp_band"):
+        for label, figures in summary[group].items():
+            flat.update({(group, label, metric): value for metric, value in figures.items()})
+    return flat
+
+
+def assert_same(actual, expected):
+    actual, expected = flatten(actual), flatten(expected)
+    assert actual.keys() == expected.keys()
+    for key, value in expected.items():
+        assert actual[key] == (None if value is None else pytest.approx(value, abs=1e-3)), key
+
+
+def recompute_overall(rows):
+    """Accuracy of the priced rows, computed from scratch"""
+    priced = [row for row in rows if row["actual_price"] is not None]
+    errors = [row["predicted_price"] - row["actual_price"] for row in priced]
+    hits = [(row["predicted_price"] > row["issue_price"]) == (row["actual_price"] > row["issue_price"]) for row in priced]
+    return {
+        "count": len(priced),
+        "mae": sum(abs(e) for e in errors) / len(priced),
+        "bias": sum(errors) / len(priced),
+        "mape": sum(abs(e) / row["actual_price"] * 100 for e, row in zip(errors, priced)) / len(priced),
+        "hit_rate": sum(hits) / len(priced)
+    }
+
+
+def test_running_accuracy_matches_a_full_recompute(tmp_path):
+    rng = random.Random(7)
+    store = PredictionLogStore(str(tmp_path), fsync=False, group_commit=False, compact_threshold=10**6).open()
+    tracker = AccuracyTracker()
+    store.add_observer(tracker)
+
+    for i in range(60):
+        issue = rng.choice([100, 250, 500])
+        store.append({
+            "company_name": f"Company {i % 20}", "issue_price": issue, "predicted_price": issue * rng.uniform(0.7, 1.6),
+            "market_cap": rng.choice([None, 200, 1500, 20000]), "gmp": rng.choice([None, -10, 20, 80, 300]),
+            "prediction_date": "2026-09-01"
+        })
+    # Prices recorded, corrected, withdrawn and recorded again, and other fields edited
+    for _ in range(150):
+        row_id = rng.randrange(60)
+        fields = rng.choice([
+            {"actual_price": round(rng.uniform(50, 900), 2)},
+            {"actual_price": None},
+            {"market_cap": rng.choice([100, 3000, 9000])},
+            {"gmp": rng.choice([0, 30, 120])}
+        ])
+        store.update([row_id], fields)
+    store.update_company("company 3", {"actual_price": 321.0})
+
+    rows = dict(store.rows())
+    fresh = AccuracyTracker()
+    fresh.load(rows)
+    assert_same(tracker.summary(), fresh.summary())
+    overall = recompute_overall(list(rows.values()))
+    assert tracker.summary()["overall"] == {metric: pytest.approx(value, abs=1e-3) for metric, value in overall.items()}
+    assert sum(figures["count"] for figures in tracker.summary()["by_market_cap"].values()) == overall["count"]
+
+    # A tracker loaded from the compacted snapshot agrees too
+    store.compact()
+    store.close()
+    reopened = PredictionLogStore(str(tmp_path), group_commit=False).open()
+    loaded = AccuracyTracker()
+    reopened.add_observer(loaded)
+    assert_same(loaded.summary(), tracker.summary())
@@ -0,0 +1,40 @@
+import pytest
+
+from batching import MicroBatcher
+
+
+def process(items):
+    if "bad" in items:
+        raise ValueError("bad item")
+    return [item.upper() for item in items]
+
+
+def test_failing_batch_fails_every_caller_by_default():
+    calls = []
+    batcher = MicroBatcher(lambda items: calls.append(items) or process(items), window=0.05)
+    futures = [batcher.submit(item) for item in ("a", "bad", "c")]
+
+    for future in futures:
+        with pytest.raises(ValueError, match="bad item"):
+            future.result(timeout=5)
+    # Nothing is retried, so side effects of the failed call are not repeated
+    assert calls == [["a", "bad", "c"]]
+
+
+def test_failing_item_does_not_fail_its_batch_with_retries():
+    batcher = MicroBatcher(process, window=0.05, retry_items=True)
+    futures = [batcher.submit(item) for item in ("a", "bad", "c")]
+
+    assert futures[0].result(timeout=5) == "A"
+    with pytest.raises(ValueError, match="bad item"):
+        futures[1].result(timeout=5)
+    assert futures[2].result(timeout=5) == "C"
+
+
+def test_missing_results_fail_the_callers_instead_of_hanging():
+    batcher = MicroBatcher(lambda items: [], window=0.05)
+    futures = [batcher.submit(item) for item in ("x", "y")]
+
+    for future in futures:
+        with pytest.raises(RuntimeError, match="0 results for 2 items"):
+            future.result(timeout=5)
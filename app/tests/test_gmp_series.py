@@ -0,0 +1,45 @@
+import gmp_series
+
+
+def _predict(ipo_logger, company_name, gmp, predicted_price):
+    ipo_logger.log_prediction({
+        'company_name': company_name, 'issue_price': 100.0, 'predicted_price': predicted_price,
+        'market_cap': 800.0, 'gmp': gmp, 'industry_growth': 12.0, 'roce': 18.0, 'roe': 15.0,
+        'sentiment_score': 0.0
+    })
+
+
+def _row(ipo_logger, company_name):
+    return ipo_logger.get_store().company_rows(company_name)[-1][1]
+
+
+def test_rescore_keeps_the_values_predicted_with(prediction_log):
+    _predict(prediction_log, "Alpha Ltd", 20.0, 130.0)
+
+    result = gmp_series.record_snapshots([{'company_name': "Alpha Ltd", 'timestamp': 1000.0, 'gmp': 60.0}])
+
+    row = _row(prediction_log, "Alpha Ltd")
+    assert result['rescored'] == 1
+    assert (row['gmp'], row['predicted_price']) == (20.0, 130.0)
+    assert row['latest_gmp'] == 60.0
+    assert row['rescored_price'] > 130.0
+
+
+def test_rescores_of_an_interrupted_upload_are_applied_by_the_next(prediction_log):
+    _predict(prediction_log, "Alpha Ltd", 20.0, 130.0)
+    _predict(prediction_log, "Beta Ltd", 20.0, 130.0)
+    row_id = prediction_log.get_store().company_rows("Alpha Ltd")[-1][0]
+
+    # A writer that stops after appending its record, before updating the log
+    store = gmp_series.get_gmp_store()
+    with store.writing():
+        store.append([{'company_name': "Alpha Ltd", 'timestamp': 1000.0, 'gmp': 60.0, 'predicted_price': 150.0}],
+                     [(row_id, 60.0, 150.0)])
+    assert _row(prediction_log, "Alpha Ltd").get('rescored_price') is None
+
+    gmp_series.record_snapshots([{'company_name': "Beta Ltd", 'timestamp': 1000.0, 'gmp': 40.0}])
+
+    row = _row(prediction_log, "Alpha Ltd")
+    assert (row['latest_gmp'], row['rescored_price']) == (60.0, 150.0)
+    assert _row(prediction_log, "Beta Ltd")['latest_gmp'] == 40.0
+    assert store.replay_rescores(prediction_log.get_store().update_rows) == 0
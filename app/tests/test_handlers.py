@@ -0,0 +1,99 @@
+import pytest
+
+from handlers import MAX_HISTORY_LIMIT, parse_history_args
+
+
+@pytest.mark.parametrize("limit", ["abc", "1.5", "0", "-3", str(MAX_HISTORY_LIMIT + 1)])
+def test_invalid_page_limit_is_rejected(limit):
+    with pytest.raises(ValueError, match=f"^limit must be an integer between 1 and {MAX_HISTORY_LIMIT}$"):
+        parse_history_args({"limit": limit})
+
+
+@pytest.mark.parametrize("cursor", ["x", "-1", "2e3"])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError, match="^cursor must be"):
+        parse_history_args({"cursor": cursor})
+
+
+def test_valid_paging_arguments_are_parsed():
+    query, limit, ndjson = parse_history_args({"cursor": "42", "limit": str(MAX_HISTORY_LIMIT)})
+    assert (query["cursor"], limit, ndjson) == (42, MAX_HISTORY_LIMIT, False)
+
+    query, limit, _ = parse_history_args({"cursor": "", "limit": ""})
+    assert (query["cursor"], limit) == (None, None)
+
+
+def test_ndjson_limit_is_not_capped_at_a_page():
+    _, limit, ndjson = parse_history_args({"format": "ndjson", "limit": str(MAX_HISTORY_LIMIT * 5)})
+    assert (limit, ndjson) == (MAX_HISTORY_LIMIT * 5, True)
+
+    with pytest.raises(ValueError, match="^limit must be a positive integer$"):
+        parse_history_args({"format": "ndjson", "limit": "0"})
+
+
+def test_weights_edit_that_keeps_the_version_is_not_served_from_the_memo(prediction_log, tmp_path, monkeypatch):
+    import json
+    import os
+
+    import handlers
+    import scoring
+    from prediction_memo import PredictionMemo
+
+    weights = tmp_path / "weights.json"
+    config = dict(scoring.DEFAULT_CONFIG)
+    weights.write_text(json.dumps(config))
+    monkeypatch.setattr(scoring, "WEIGHTS_FILE", str(weights))
+    monkeypatch.setattr(scoring, "RELOAD_INTERVAL", 0)
+    monkeypatch.setattr(scoring, "_kernel", None)
+    monkeypatch.setattr(handlers, "get_model", lambda: None)
+    monkeypatch.setattr(handlers, "prediction_memo", PredictionMemo())
+    data = {"company_name": "Alpha Ltd", "issue_price": 100, "market_cap": 400, "gmp": 20, "roce": 15, "roe": 12, "industry_growth": 8}
+
+    before, status = handlers.predict(dict(data))
+    assert status == 200
+
+    config["weights"] = {**config["weights"], "gmp": 0.9}
+    weights.write_text(json.dumps(config))
+    stat = os.stat(weights)
+    os.utime(weights, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    after, _ = handlers.predict(dict(data))
+
+    assert after["prediction_source"] == before["prediction_source"] == "heuristic:default"
+    assert after["predicted_price"] > before["predicted_price"]
+
+
+BATCH_ROWS = [
+    {"company_name": "Zeta Ltd", "issue_price": 100, "market_cap": 400, "gmp": 20, "roce": 15, "roe": 12, "industry_growth": 8},
+    {"company_name": "Alpha Ltd", "issue_price": 57.5, "market_cap": 25000, "gmp": -4.25, "roce": 7.3, "roe": -2, "industry_growth": 0},
+    {"company_name": "Mu Ltd", "issue_price": 320, "market_cap": 999.99, "gmp": 640, "roce": 41.7, "roe": 33.3, "industry_growth": 19.5},
+    {"company_name": "Beta Ltd", "issue_price": 12.34, "market_cap": 1000, "gmp": 0, "roce": 0, "roe": 0, "industry_growth": -3.1}
+]
+
+
+def test_batch_matches_single_predictions_row_for_row(prediction_log, monkeypatch):
+    import io
+
+    import pandas as pd
+
+    import handlers
+    from prediction_memo import PredictionMemo
+
+    monkeypatch.setattr(handlers, "get_model", lambda: None)
+    monkeypatch.setattr(handlers, "prediction_memo", PredictionMemo())
+
+    batch, status = handlers.predict_batch([dict(row) for row in BATCH_ROWS])
+    assert status == 200
+    assert [p["company_name"] for p in batch["predictions"]] == ["Zeta Ltd", "Alpha Ltd", "Mu Ltd", "Beta Ltd"]
+
+    for row, predicted in zip(BATCH_ROWS, batch["predictions"]):
+        single, _ = handlers.predict(dict(row))
+        assert predicted["predicted_price"] == single["predicted_price"]
+        assert predicted["expected_return"] == single["expected_return"]
+        assert predicted["calculation_breakdown"] == single["calculation_breakdown"]
+        assert batch["prediction_source"] == single["prediction_source"]
+
+    # Column arrays and CSV uploads are the same rows in another shape
+    columns = {field: [row[field] for row in BATCH_ROWS] for field in BATCH_ROWS[0]}
+    assert handlers.predict_batch(columns)[0] == batch
+    csv_file = io.BytesIO(pd.DataFrame(BATCH_ROWS).to_csv(index=False).encode("utf-8"))
+    assert handlers.predict_batch(csv_file=csv_file)[0] == batch
@@ -0,0 +1,78 @@
+import time
+import multiprocessing
+
+import history_cache
+from log_store import PredictionLogStore
+
+
+def write_predictions(store_dir, log_file, worker, rows):
+    """Log predictions and listing prices through ``ipo_logger``, as a worker process does"""
+    import ipo_logger
+
+    ipo_logger.STORE_DIR = store_dir
+    ipo_logger.LOG_FILE = log_file
+    ipo_logger.LOG_FSYNC = False
+    # Compact often, so readers also have to pick up new snapshot generations
+    ipo_logger.COMPACT_THRESHOLD = 50
+    for i in range(rows):
+        ipo_logger.log_prediction({
+            "company_name": f"Writer {worker} Company {i}",
+            "issue_price": 100 + i % 50,
+            "predicted_price": 120 + i % 70,
+            "gmp": i % 40
+        })
+        if i % 5 == 4:
+            ipo_logger.update_actual_price(f"writer {worker} company {i - 2}", 150 + i % 30, "2024-06-01")
+    ipo_logger.get_store().close()
+
+
+def store_rows(store_dir):
+    store = PredictionLogStore(store_dir, group_commit=False).open()
+    try:
+        return [row for _, row in store.rows()]
+    finally:
+        store.close()
+
+
+def test_cache_matches_the_store_with_concurrent_writer_processes(prediction_log):
+    writers, rows = 3, 200
+    cache = prediction_log.get_history_cache()
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=write_predictions, args=(prediction_log.STORE_DIR, prediction_log.LOG_FILE, worker, rows))
+        for worker in range(writers)
+    ]
+    for process in processes:
+        process.start()
+
+    # Poll while the writers run, so their inserts, updates and compactions are
+    # applied to the cache piecemeal rather than in one load at the end
+    while any(process.is_alive() for process in processes):
+        prediction_log.get_history_cache().open_companies()
+        time.sleep(0.005)
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+    assert prediction_log.get_history_cache() is cache
+    expected = store_rows(prediction_log.STORE_DIR)
+    assert len(expected) == writers * rows
+    assert cache.rows() == expected
+    assert sorted(cache.open_companies()) == sorted(row["company_name"] for row in expected if row["actual_price"] is None)
+
+
+def test_reads_fall_back_to_the_store_past_the_memory_limit(prediction_log, monkeypatch):
+    monkeypatch.setattr(history_cache, "HISTORY_CACHE_MAX_MB", 0.2)
+    rows = history_cache.INITIAL_CAPACITY + 10
+    for i in range(rows):
+        prediction_log.log_prediction({"company_name": f"Company {i}", "issue_price": 100, "predicted_price": 110 + i})
+    prediction_log.update_actual_price("company 3", 150)
+
+    # Growing past the initial capacity would exceed the limit
+    assert prediction_log.get_history_cache() is None
+    assert not prediction_log._history_cache.stats()["enabled"]
+    history = prediction_log.get_prediction_history()
+    assert history == store_rows(prediction_log.STORE_DIR)
+    assert len(history) == rows
+    open_companies = prediction_log.get_open_companies()
+    assert len(open_companies) == rows - 1 and "Company 3" not in open_companies
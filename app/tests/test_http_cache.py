@@ -0,0 +1,130 @@
+import gzip
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from starlette.applications import Starlette
+from starlette.routing import Route
+
+import handlers
+import http_cache
+from http_cache import ResponseCache, etag_matches, make_etag, negotiate_encoding
+
+
+def flask_get(path, headers):
+    import api
+
+    response = api.app.test_client().get(path, headers=headers)
+    return response.status_code, {k.lower(): v for k, v in response.headers.items()}, response.get_data()
+
+
+def asgi_get(path, headers):
+    import service
+
+    sent = []
+    requests = [{"type": "http.request", "body": b"", "more_body": False}]
+
+    async def receive():
+        if requests:
+            return requests.pop()
+        await asyncio.sleep(60)
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+        "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+        "client": ("127.0.0.1", 1234), "server": ("127.0.0.1", 80)
+    }
+    asyncio.run(Starlette(routes=[Route("/api/history", service.history)])(scope, receive, send))
+    response_headers = {k.decode(): v.decode() for k, v in sent[0]["headers"]}
+    return sent[0]["status"], response_headers, b"".join(m.get("body", b"") for m in sent[1:])
+
+
+@pytest.fixture(params=["flask", "asgi"])
+def get(request, prediction_log, monkeypatch):
+    """GET a path through the Flask or the ASGI app, with a fresh response cache and a few logged predictions"""
+    monkeypatch.setattr(handlers, "response_cache", ResponseCache())
+    monkeypatch.setattr(http_cache, "COMPRESS_MIN_BYTES", 64)
+    for i in range(5):
+        prediction_log.log_prediction({"company_name": f"Company {i} Ltd", "issue_price": 100, "predicted_price": 120 + i})
+    if request.param == "flask":
+        yield flask_get
+        return
+
+    import service
+    pool = ThreadPoolExecutor(2)
+    monkeypatch.setattr(service, "_handler_pool", pool, raising=False)
+    monkeypatch.setitem(service.limiters, "history", service.RouteLimiter("history", 4))
+    yield asgi_get
+    pool.shutdown()
+
+
+def test_etag_is_tied_to_the_key_and_the_log_version():
+    etag = make_etag(("history",), (1, 2))
+    assert etag.startswith('W/"') and etag == make_etag(("history",), (1, 2))
+    assert etag != make_etag(("history",), (1, 3))
+    assert etag != make_etag(("accuracy",), (1, 2))
+
+
+def test_if_none_match_is_compared_weakly():
+    etag = make_etag(("history",), 1)
+    assert etag_matches(etag, etag)
+    assert etag_matches(etag[2:], etag)
+    assert etag_matches(f'W/"other", {etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('W/"other"', etag)
+    assert not etag_matches(None, etag)
+
+
+def test_encoding_negotiation(monkeypatch):
+    monkeypatch.setattr(http_cache, "brotli", None)
+    assert negotiate_encoding("gzip, deflate") == "gzip"
+    # brotli is optional: without it a client offering br gets gzip or identity
+    assert negotiate_encoding("br, gzip") == "gzip"
+    assert negotiate_encoding("br") is None
+    assert negotiate_encoding("gzip;q=0, deflate") is None
+    assert negotiate_encoding("*") == "gzip"
+    assert negotiate_encoding(None) is None
+
+    monkeypatch.setattr(http_cache, "brotli", object())
+    assert negotiate_encoding("gzip, br") == "br"
+    assert negotiate_encoding("gzip, br;q=0") == "gzip"
+
+
+def test_unchanged_history_is_answered_304(get, prediction_log):
+    status, headers, body = get("/api/history", {})
+    assert status == 200 and b"Company 4 Ltd" in body
+    assert headers["cache-control"] == "no-cache" and "content-encoding" not in headers
+
+    status, again, body = get("/api/history", {"If-None-Match": headers["etag"]})
+    assert (status, body, again["etag"]) == (304, b"", headers["etag"])
+
+    prediction_log.log_prediction({"company_name": "Company 5 Ltd", "issue_price": 100, "predicted_price": 130})
+    status, changed, body = get("/api/history", {"If-None-Match": headers["etag"]})
+    assert status == 200 and b"Company 5 Ltd" in body
+    assert changed["etag"] != headers["etag"]
+
+
+def test_history_is_gzipped_for_clients_that_accept_it(get, monkeypatch):
+    monkeypatch.setattr(http_cache, "brotli", None)
+    _, _, plain = get("/api/history", {})
+
+    status, headers, body = get("/api/history", {"Accept-Encoding": "br, gzip"})
+
+    assert status == 200
+    assert (headers["content-encoding"], headers["vary"]) == ("gzip", "Accept-Encoding")
+    assert gzip.decompress(body) == plain
+
+
+def test_history_is_brotli_compressed_when_brotli_is_installed(get):
+    brotli = pytest.importorskip("brotli")
+    _, _, plain = get("/api/history", {})
+
+    status, headers, body = get("/api/history", {"Accept-Encoding": "gzip, br"})
+
+    assert (status, headers["content-encoding"]) == (200, "br")
+    assert brotli.decompress(body) == plain
@@ -0,0 +1,57 @@
+import asyncio
+
+from starlette.applications import Starlette
+from starlette.responses import StreamingResponse
+from starlette.routing import Route
+
+import instrumentation
+from instrumentation import Histogram, TraceMiddleware
+
+
+async def slow_stream(request):
+    async def lines():
+        for i in range(3):
+            await asyncio.sleep(0.1)
+            yield f'{{"row": {i}}}\n'
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+def get(app, path):
+    """Run one GET request through an ASGI app; returns the messages it sent"""
+    sent = []
+    requests = [{"type": "http.request", "body": b"", "more_body": False}]
+
+    async def receive():
+        if requests:
+            return requests.pop()
+        # The client stays connected until the response is complete
+        await asyncio.sleep(60)
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"", "headers": [],
+        "client": ("127.0.0.1", 1234), "server": ("127.0.0.1", 80)
+    }
+    asyncio.run(app(scope, receive, send))
+    return sent
+
+
+def test_streamed_response_is_timed_until_its_last_chunk(monkeypatch):
+    histogram = Histogram("test_request_seconds", "", "endpoint")
+    monkeypatch.setattr(instrumentation, "request_seconds", histogram)
+    monkeypatch.setattr(instrumentation, "METRICS_ENABLED", True)
+    monkeypatch.setattr(instrumentation, "TRACE_HEADERS", True)
+    app = TraceMiddleware(Starlette(routes=[Route("/stream", slow_stream)]))
+
+    sent = get(app, "/stream")
+
+    assert b"".join(m.get("body", b"") for m in sent if m["type"] == "http.response.body").count(b"\n") == 3
+    headers = dict(sent[0]["headers"])
+    assert b"x-request-id" in headers and b"total;dur=" in headers[b"server-timing"]
+    counts, total = histogram._series["slow_stream"]
+    assert sum(counts) == 1
+    assert total >= 0.3
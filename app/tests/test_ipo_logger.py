@@ -0,0 +1,53 @@
+import datetime
+
+
+def test_batch_price_updates_report_each_company_in_order(prediction_log):
+    for i, name in enumerate(("Alpha Ltd", "Beta  Industries", "Alpha Ltd")):
+        prediction_log.log_prediction({"company_name": name, "issue_price": 100, "predicted_price": 120 + i})
+
+    results = prediction_log.update_actual_prices([
+        {"company_name": "Nobody Ltd", "actual_price": 99},
+        {"company_name": " alpha LTD ", "actual_price": 130, "listing_date": "2026-10-01"},
+        {"company_name": "beta industries", "actual_price": 210},
+        {"company_name": "Gamma Ltd", "actual_price": 50}
+    ])
+
+    assert results == [
+        (False, "Company not found in logs"),
+        (True, "Actual price updated successfully"),
+        (True, "Actual price updated successfully"),
+        (False, "Company not found in logs")
+    ]
+    rows = prediction_log.get_prediction_history()
+    assert [(r["company_name"], r["actual_price"], r["listing_date"]) for r in rows] == [
+        ("Alpha Ltd", 130.0, "2026-10-01"),
+        ("Beta  Industries", 210.0, None),
+        ("Alpha Ltd", 130.0, "2026-10-01")
+    ]
+
+
+def test_batch_update_of_one_company_twice_keeps_the_last_price(prediction_log):
+    prediction_log.log_prediction({"company_name": "Alpha Ltd", "issue_price": 100, "predicted_price": 120})
+
+    results = prediction_log.update_actual_prices([
+        {"company_name": "Alpha Ltd", "actual_price": 125},
+        {"company_name": "ALPHA LTD", "actual_price": 128}
+    ])
+
+    assert [success for success, _ in results] == [True, True]
+    assert prediction_log.get_prediction_history()[0]["actual_price"] == 128.0
+
+
+def test_archived_company_is_reported_as_archived(prediction_log, monkeypatch):
+    monkeypatch.setattr(prediction_log, "LOG_ARCHIVE_AFTER_DAYS", 30)
+    old = (datetime.date.today() - datetime.timedelta(days=120)).isoformat()
+    store = prediction_log.get_store()
+    store.append({"company_name": "Old Ltd", "issue_price": 100, "predicted_price": 110, "prediction_date": old})
+    prediction_log.log_prediction({"company_name": "New Ltd", "issue_price": 100, "predicted_price": 120})
+    store.compact()
+
+    assert prediction_log.update_actual_price("old ltd", 105) == (False, "Company predictions are archived")
+    assert prediction_log.update_actual_prices([
+        {"company_name": "Old Ltd", "actual_price": 105},
+        {"company_name": "New Ltd", "actual_price": 125}
+    ]) == [(False, "Company predictions are archived"), (True, "Actual price updated successfully")]
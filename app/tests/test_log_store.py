@@ -0,0 +1,139 @@
+import threading
+
+from log_store import PredictionLogStore
+
+
+def row(company_name, predicted_price=120.0, prediction_date="2026-10-01"):
+    return {"company_name": company_name, "issue_price": 100.0, "predicted_price": predicted_price,
+            "prediction_date": prediction_date, "gmp": 10.0}
+
+
+def test_failed_compaction_does_not_fail_or_repeat_a_durable_write(tmp_path, monkeypatch):
+    store = PredictionLogStore(str(tmp_path), fsync=False, compact_threshold=1, commit_window=0.05).open()
+
+    def full_disk():
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(store, "_compact", full_disk)
+    threads = [threading.Thread(target=store.append, args=(row(f"Company {i}"),)) for i in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    store.append_distinct(row("Company 0"), ["issue_price", "predicted_price"])
+
+    assert len(store.rows()) == 3
+    assert store.company_rows("company 0")[0][1]["hit_count"] == 2
+    # Three inserts and one hit_count update, each written once
+    assert sum(len(wal.read_bytes().splitlines()) for wal in tmp_path.glob("wal-*.jsonl")) == 4
+    store.close()
+
+    reopened = PredictionLogStore(str(tmp_path), group_commit=False).open()
+    assert sorted(r["company_name"] for _, r in reopened.rows()) == ["Company 0", "Company 1", "Company 2"]
+
+
+def generation(directory):
+    return int((directory / "CURRENT").read_text().split()[0])
+
+
+def wal_lines(directory):
+    return (directory / f"wal-{generation(directory):06d}.jsonl").read_bytes().splitlines()
+
+
+def test_writes_are_replayed_from_the_wal_after_reopening(tmp_path):
+    store = PredictionLogStore(str(tmp_path), fsync=False, group_commit=False).open()
+    first = store.append(row("Alpha Ltd"))
+    store.append(row("Beta Ltd"))
+    store.update_company("ALPHA  ltd", {"actual_price": 135.0})
+    store.close()
+    assert len(wal_lines(tmp_path)) == 3
+
+    reopened = PredictionLogStore(str(tmp_path), group_commit=False).open()
+    assert generation(tmp_path) == 0
+    assert [r["company_name"] for _, r in reopened.rows()] == ["Alpha Ltd", "Beta Ltd"]
+    assert reopened.company_rows("alpha ltd") == [(first, {**reopened.rows()[0][1], "actual_price": 135.0})]
+    # New ids continue after the replayed ones
+    assert reopened.append(row("Gamma Ltd")) == first + 2
+
+
+def test_other_handles_pick_up_writes_on_refresh(tmp_path):
+    writer = PredictionLogStore(str(tmp_path), fsync=False, group_commit=False).open()
+    reader = PredictionLogStore(str(tmp_path), group_commit=False).open()
+    writer.append(row("Alpha Ltd"))
+    writer.compact()
+    writer.append(row("Beta Ltd"))
+
+    reader.refresh()
+    assert [r["company_name"] for _, r in reader.rows()] == ["Alpha Ltd", "Beta Ltd"]
+
+
+def test_compaction_folds_the_wal_into_a_new_generation(tmp_path):
+    store = PredictionLogStore(str(tmp_path), fsync=False, group_commit=False).open()
+    for i in range(3):
+        store.append(row(f"Company {i}"))
+    store.update_company("company 1", {"actual_price": 150.0})
+    before = [r for _, r in store.rows()]
+
+    store.compact()
+
+    assert generation(tmp_path) == 1
+    assert wal_lines(tmp_path) == []
+    assert not (tmp_path / "wal-000000.jsonl").exists()
+    assert [r for _, r in store.rows()] == before
+    reopened = PredictionLogStore(str(tmp_path), group_commit=False).open()
+    assert [r for _, r in reopened.rows()] == before
+
+
+def test_store_compacts_once_the_wal_reaches_the_threshold(tmp_path):
+    store = PredictionLogStore(str(tmp_path), fsync=False, group_commit=False, compact_threshold=3).open()
+    for i in range(2):
+        store.append(row(f"Company {i}"))
+    assert generation(tmp_path) == 0
+
+    store.append(row("Company 2"))
+
+    assert generation(tmp_path) == 1
+    assert len(PredictionLogStore(str(tmp_path), group_commit=False).open().rows()) == 3
+
+
+def test_legacy_csv_is_imported_only_when_the_store_is_created(tmp_path):
+    csv_path = tmp_path / "ipo_predictions.csv"
+    csv_path.write_text(
+        "company_name,issue_price,predicted_price,actual_price,prediction_date,listing_date,market_cap,gmp\n"
+        "Alpha Ltd,100,120,130,2024-05-01,2024-05-10,400,20\n"
+        "Beta Ltd,200,210,,2024-06-01,,900,\n"
+    )
+    store_dir = str(tmp_path / "predictions")
+
+    store = PredictionLogStore(store_dir, legacy_csv=str(csv_path), fsync=False, group_commit=False).open()
+    rows = [r for _, r in store.rows()]
+    assert [(r["company_name"], r["actual_price"], r["gmp"]) for r in rows] == [("Alpha Ltd", 130.0, 20.0), ("Beta Ltd", None, None)]
+    store.append(row("Gamma Ltd"))
+    store.close()
+
+    # The CSV is still there on the next start, but the store already exists
+    reopened = PredictionLogStore(store_dir, legacy_csv=str(csv_path), group_commit=False).open()
+    assert [r["company_name"] for _, r in reopened.rows()] == ["Alpha Ltd", "Beta Ltd", "Gamma Ltd"]
+
+
+def test_repeated_prediction_bumps_hit_count_and_last_seen(tmp_path):
+    store = PredictionLogStore(str(tmp_path), fsync=False, group_commit=False).open()
+    key_columns = ["issue_price", "predicted_price", "gmp"]
+    first = store.append_distinct({**row("Alpha Ltd"), "hit_count": 1, "last_seen": 100.0}, key_columns)
+
+    repeat = store.append_distinct({**row(" alpha ltd "), "hit_count": 1, "last_seen": 200.0}, key_columns)
+    other = store.append_distinct({**row("Alpha Ltd", predicted_price=125.0), "hit_count": 1, "last_seen": 300.0}, key_columns)
+    store.append_distinct({**row("Alpha Ltd"), "hit_count": 1, "last_seen": 400.0}, key_columns)
+
+    assert repeat == first and other != first
+    rows = dict(store.rows())
+    assert len(rows) == 2
+    assert (rows[first]["hit_count"], rows[first]["last_seen"]) == (3, 400.0)
+    assert (rows[other]["hit_count"], rows[other]["last_seen"]) == (1, 300.0)
+
+    # The count carries over a compaction and a reopen
+    store.compact()
+    store.append_distinct({**row("Alpha Ltd"), "hit_count": 1, "last_seen": 500.0}, key_columns)
+    store.close()
+    reopened = PredictionLogStore(str(tmp_path), group_commit=False).open()
+    assert [(r["hit_count"], r["last_seen"]) for _, r in reopened.rows()] == [(4, 500.0), (1, 300.0)]
@@ -0,0 +1,22 @@
+import datetime
+
+from log_store import PredictionLogStore, segment_key
+from migrate_history import migrate
+
+
+def test_migration_segments_the_history_with_the_given_settings(tmp_path):
+    csv_path = tmp_path / "ipo_predictions.csv"
+    old, recent, newer = ((datetime.date.today() - datetime.timedelta(days=days)).isoformat() for days in (400, 20, 10))
+    csv_path.write_text(
+        "company_name,issue_price,predicted_price,actual_price,prediction_date\n"
+        f"Alpha Ltd,100,120,130,{old}\n"
+        f"Beta Ltd,200,210,,{recent}\n"
+        f"Gamma Ltd,300,330,,{newer}\n"
+    )
+    store_dir = str(tmp_path / "predictions")
+
+    assert migrate(store_dir, "jsonl", legacy_csv=str(csv_path), segment_period="week", archive_after_days=365) == 2
+
+    segments = PredictionLogStore(store_dir, group_commit=False, segment_period="week").open().segments()
+    assert sorted(segment["key"] for segment in segments["live"]) == [segment_key(recent, "week"), segment_key(newer, "week")]
+    assert [segment["rows"] for segment in segments["archived"]] == [1]
@@ -0,0 +1,19 @@
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.preprocessing import StandardScaler
+
+import train_model
+from model_serving import ModelServer
+
+
+def test_loaded_model_predicts_single_threaded(tmp_path):
+    rng = np.random.default_rng(0)
+    features, target = rng.random((40, 3)), rng.random(40)
+    model = RandomForestRegressor(n_estimators=5, random_state=0, n_jobs=-1).fit(features, target)
+    path = str(tmp_path / "model.joblib")
+    train_model.save({"scaler": StandardScaler().fit(features), "model": model}, path)
+
+    server = ModelServer.load(path)
+
+    assert server.model.n_jobs == 1
+    assert np.allclose(server.predict_returns(features[:4]), model.predict(StandardScaler().fit(features).transform(features[:4])))
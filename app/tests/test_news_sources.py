@@ -0,0 +1,148 @@
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from news_sources import FakeNewsSource, NewsAPISource, NewsFetcher, RSSSource
+
+RSS = """<?xml version="1.0"?>
+<rss version="2.0"><channel><title>Stub</title>
+<item><title>{query} listing day preview</title><description>Subscription details for {query}</description>
+<link>http://stub/{query}</link><pubDate>Thu, 01 Oct 2026 10:00:00 GMT</pubDate></item>
+</channel></rss>"""
+
+
+class StubNewsServer(ThreadingHTTPServer):
+    """Local news API and RSS feed that counts requests and can answer slowly"""
+
+    daemon_threads = True
+    block_on_close = False
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.delay = 0.0
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def count(self, path):
+        with self.lock:
+            return sum(1 for request_path, _, _ in self.requests if request_path == path)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        parts = urlparse(self.path)
+        query = parse_qs(parts.query)["q"][0]
+        with server.lock:
+            server.requests.append((parts.path, query, time.monotonic()))
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            time.sleep(server.delay)
+            if parts.path == "/rss":
+                body, content_type = RSS.format(query=query).encode("utf-8"), "application/rss+xml"
+            else:
+                body = json.dumps({"articles": [{
+                    "title": f"{query} GMP rises ahead of listing",
+                    "description": f"Grey market update for {query}",
+                    "publishedAt": "2026-10-01T10:00:00Z",
+                    "url": f"http://stub/{query}",
+                    "source": {"name": "Stub"}
+                }]}).encode("utf-8")
+                content_type = "application/json"
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub():
+    server = StubNewsServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_fetch_many_queries_companies_and_sources_concurrently(stub):
+    stub.delay = 0.2
+    sources = [NewsAPISource("key", url=f"{stub.url}/newsapi"), RSSSource(f"{stub.url}/rss?q={{query}}", name="stub-rss")]
+    companies = ["Alpha Ltd", "Beta Ltd", "Gamma Ltd"]
+
+    start = time.monotonic()
+    results = NewsFetcher(sources, max_workers=8).fetch_many(companies)
+    elapsed = time.monotonic() - start
+
+    for company in companies:
+        assert sorted(article["source"] for article in results[company]) == ["Stub", "stub-rss"]
+        assert all(company in article["title"] for article in results[company])
+    assert stub.count("/newsapi") == 3 and stub.count("/rss") == 3
+    # Six 0.2 s requests one after another would take 1.2 s
+    assert stub.max_in_flight >= 2
+    assert elapsed < 0.8
+
+
+def test_rate_limiter_spaces_requests_to_a_source(stub):
+    source = NewsAPISource("key", url=f"{stub.url}/newsapi", rate=5, burst=1)
+
+    NewsFetcher([source], max_workers=8).fetch_many([f"Company {i} Ltd" for i in range(4)])
+
+    times = sorted(requested for _, _, requested in stub.requests)
+    assert len(times) == 4
+    # One request every 0.2 s at 5 per second, allowing for timer jitter
+    assert all(later - earlier >= 0.15 for earlier, later in zip(times, times[1:]))
+
+
+def test_slow_source_times_out_without_holding_up_the_others(stub):
+    stub.delay = 1.0
+    slow = NewsAPISource("key", url=f"{stub.url}/newsapi", timeout=0.2)
+    fetcher = NewsFetcher([slow], max_workers=4)
+
+    start = time.monotonic()
+    result = fetcher.fetch_many(["Alpha Ltd"])["Alpha Ltd"]
+    assert isinstance(result, Exception)
+    assert time.monotonic() - start < 0.9
+
+    # With a source that answers, the timed-out one is skipped
+    instant = FakeNewsSource("instant", [{"title": "Instant", "description": "d", "date": "", "url": "", "source": "instant"}])
+    fetcher = NewsFetcher([slow, instant], max_workers=4)
+    assert [article["source"] for article in fetcher.fetch("Beta Ltd")] == ["instant"]
+
+
+def test_identical_in_flight_queries_share_one_upstream_request(stub):
+    stub.delay = 0.3
+    fetcher = NewsFetcher([NewsAPISource("key", url=f"{stub.url}/newsapi")], max_workers=8)
+    results = []
+
+    def fetch(name):
+        results.append(fetcher.fetch(name))
+
+    threads = [threading.Thread(target=fetch, args=(name,)) for name in ["Alpha Ltd", "alpha ltd", "ALPHA  LTD", "Alpha Ltd", "Alpha Ltd"]]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(results) == 5 and all(len(articles) == 1 for articles in results)
+    assert stub.count("/newsapi") == 1
@@ -0,0 +1,101 @@
+import os
+import types
+import datetime
+
+import pytest
+
+import log_store
+from log_store import PredictionLogStore
+
+
+class FakeDate(datetime.date):
+    current = datetime.date(2026, 4, 15)
+
+    @classmethod
+    def today(cls):
+        return cls.current
+
+
+@pytest.fixture
+def today(monkeypatch):
+    """Set the store's idea of today: ``today(datetime.date(...))``"""
+    monkeypatch.setattr(log_store, "datetime", types.SimpleNamespace(date=FakeDate, timedelta=datetime.timedelta))
+
+    def set_today(day):
+        FakeDate.current = day
+    set_today(datetime.date(2026, 4, 15))
+    return set_today
+
+
+def row(company_name, prediction_date):
+    return {"company_name": company_name, "issue_price": 100.0, "predicted_price": 120.0, "prediction_date": prediction_date}
+
+
+def open_store(directory, **kwargs):
+    return PredictionLogStore(str(directory), fsync=False, group_commit=False, **kwargs).open()
+
+
+def test_first_write_in_a_new_period_rotates_the_active_segment(tmp_path, today):
+    today(datetime.date(2026, 4, 1))
+    store = open_store(tmp_path, segment_period="week")
+    store.append(row("Alpha Ltd", "2026-04-01"))
+    store.append(row("Beta Ltd", "2026-04-02"))
+    assert [s["key"] for s in store.segments()["live"]] == []
+
+    today(datetime.date(2026, 4, 7))
+    store.append(row("Gamma Ltd", "2026-04-07"))
+
+    live = store.segments()["live"]
+    assert [(s["key"], s["rows"], s["compressed"]) for s in live] == [("2026-W14", 2, True), ("2026-W15", 1, False)]
+    reopened = open_store(tmp_path, segment_period="week")
+    assert [r["company_name"] for _, r in reopened.rows()] == ["Alpha Ltd", "Beta Ltd", "Gamma Ltd"]
+
+
+def test_old_segments_move_to_the_archive(tmp_path, today):
+    store = open_store(tmp_path, archive_after_days=30)
+    for company_name, day in [("Alpha Ltd", "2026-01-10"), ("Beta Ltd", "2026-02-20"), ("Alpha Ltd", "2026-03-25"), ("Gamma Ltd", "2026-04-10")]:
+        store.append(row(company_name, day))
+
+    store.compact()
+
+    segments = store.segments()
+    assert [s["key"] for s in segments["archived"]] == ["2026-01", "2026-02"]
+    assert [s["key"] for s in segments["live"]] == ["2026-03", "2026-04"]
+    assert all(os.path.exists(tmp_path / s["file"]) for s in segments["archived"])
+    assert [r["prediction_date"] for _, r in store.rows()] == ["2026-03-25", "2026-04-10"]
+    assert [r["prediction_date"] for _, r in store.read_archive()] == ["2026-01-10", "2026-02-20"]
+    assert [r["prediction_date"] for _, r in store.read_archive(date_from="2026-02-01")] == ["2026-02-20"]
+    assert [r["prediction_date"] for _, r in store.read_archive(company_name="alpha ltd")] == ["2026-01-10"]
+    # A listing price for an archived company does not reach the archive
+    assert store.update_company("Beta Ltd", {"actual_price": 130.0}) == 0
+
+
+def test_archived_segments_past_the_retention_age_are_deleted(tmp_path, today):
+    store = open_store(tmp_path, archive_after_days=30, delete_after_days=60)
+    for day in ("2026-01-10", "2026-02-20", "2026-04-10"):
+        store.append(row("Alpha Ltd", day))
+    store.compact()
+    assert [s["key"] for s in store.segments()["archived"]] == ["2026-02"]
+
+    today(datetime.date(2026, 5, 1))
+    store.compact()
+
+    assert store.segments()["archived"] == []
+    assert os.listdir(tmp_path / "archive") == []
+    assert [r["prediction_date"] for _, r in store.rows()] == ["2026-04-10"]
+
+
+def test_history_includes_archived_rows_of_the_requested_dates(prediction_log, monkeypatch, today):
+    monkeypatch.setattr(prediction_log, "LOG_ARCHIVE_AFTER_DAYS", 30)
+    store = prediction_log.get_store()
+    for company_name, day in [("Alpha Ltd", "2026-01-10"), ("Beta Ltd", "2026-02-20"), ("Gamma Ltd", "2026-04-10")]:
+        store.append(row(company_name, day))
+    store.compact()
+
+    def dates(**kwargs):
+        return [r["prediction_date"] for r in prediction_log.get_prediction_history(**kwargs)]
+
+    assert dates() == ["2026-04-10"]
+    assert dates(include_archived=True) == ["2026-01-10", "2026-02-20", "2026-04-10"]
+    assert dates(include_archived=True, date_from="2026-02-01") == ["2026-02-20", "2026-04-10"]
+    assert dates(include_archived=True, date_to="2026-01-31") == ["2026-01-10"]
@@ -0,0 +1,78 @@
+import time
+
+from news_sources import FakeNewsSource, NewsFetcher
+from sentiment_analysis import fetch_combined_news
+
+
+def article(title, source):
+    return {"title": title, "description": f"{title}, reported by {source}", "date": "2026-10-01 10:00", "url": "", "source": source}
+
+
+def test_deadline_returns_the_sources_that_answered_in_time():
+    fast = FakeNewsSource("fast", [article("Alpha IPO subscribed 40 times on day three", "fast")])
+    slow = FakeNewsSource("slow", [article("Alpha IPO allotment status out", "slow")], delay=1.0)
+
+    start = time.monotonic()
+    articles = fetch_combined_news("Alpha Ltd", fetcher=NewsFetcher([fast, slow]), deadline=0.2)
+
+    assert time.monotonic() - start < 0.8
+    assert [a["source"] for a in articles] == ["fast"]
+    assert slow.calls == 1
+
+
+def test_failing_source_does_not_drop_the_others():
+    failing = FakeNewsSource("failing", error=ConnectionError("upstream down"))
+    working = FakeNewsSource("working", [article("Beta IPO price band fixed at 120 to 126", "working")])
+
+    articles = fetch_combined_news("Beta Ltd", fetcher=NewsFetcher([failing, working]), deadline=1.0)
+
+    assert [a["source"] for a in articles] == ["working"]
+    assert failing.calls == 1
+
+
+def test_every_source_failing_returns_no_articles():
+    failing = FakeNewsSource("failing", error=ConnectionError("upstream down"))
+
+    assert fetch_combined_news("Gamma Ltd", fetcher=NewsFetcher([failing]), deadline=1.0) == []
+
+
+def test_near_identical_headlines_are_collapsed_across_sources():
+    first = FakeNewsSource("first", [
+        article("Delta IPO GMP jumps ahead of listing on Monday", "first"),
+        article("Delta Ltd anchor book raises 300 crore", "first")
+    ])
+    second = FakeNewsSource("second", [
+        article("Delta IPO GMP jumps ahead of listing on Monday - Publisher", "second"),
+        article("Delta IPO: GMP jumps ahead of listing on Monday!", "second"),
+        article("Delta IPO GMP falls as listing nears", "second")
+    ])
+
+    articles = fetch_combined_news("Delta Ltd", fetcher=NewsFetcher([first, second]), deadline=1.0)
+
+    assert sorted(a["title"] for a in articles) == [
+        "Delta IPO GMP falls as listing nears",
+        "Delta IPO GMP jumps ahead of listing on Monday",
+        "Delta Ltd anchor book raises 300 crore"
+    ]
+
+
+def test_article_the_analyzer_fails_on_is_skipped_alone(monkeypatch):
+    import sentiment_analysis
+
+    def score_texts(texts, backend=None):
+        if any("boom" in text for text in texts):
+            raise ValueError("analyzer failed")
+        return [0.5 if "rises" in text else -0.1 for text in texts]
+
+    monkeypatch.setattr(sentiment_analysis, "score_texts", score_texts)
+    articles = [
+        article("Epsilon IPO GMP rises on strong demand", "a"),
+        article("Epsilon IPO boom or bust for retail investors", "b"),
+        article("Epsilon IPO listing delayed by a week", "c")
+    ]
+
+    analyzed, average = sentiment_analysis.analyze_sentiment(articles)
+
+    assert [a["source"] for a in analyzed] == ["a", "c"]
+    assert [a["sentiment_score"] for a in analyzed] == [0.5, -0.1]
+    assert average == 0.2
@@ -0,0 +1,30 @@
+import sentiment_scheduler
+from sentiment_scheduler import SentimentStore, get_precomputed_sentiment
+
+
+def test_local_cache_keeps_the_most_recently_used_companies(tmp_path):
+    store = SentimentStore(str(tmp_path / "sentiment.db"), local_cache_size=2)
+    store.put("Alpha Ltd", 0.5, [])
+    store.put("Beta Ltd", 0.1, [])
+    store.get("Alpha Ltd")
+    store.put("Gamma Ltd", -0.2, [])
+
+    assert list(store._memory) == ["alpha ltd", "gamma ltd"]
+    # Evicted companies are read back from SQLite
+    assert store.get("Beta Ltd")[0] == 0.1
+    assert list(store._memory) == ["gamma ltd", "beta ltd"]
+
+
+def test_misses_only_refresh_open_companies_in_the_log(prediction_log, tmp_path, monkeypatch):
+    requested = []
+    monkeypatch.setattr(sentiment_scheduler, "sentiment_store", SentimentStore(str(tmp_path / "sentiment.db")))
+    monkeypatch.setattr(sentiment_scheduler.scheduler, "request_refresh", requested.append)
+    prediction_log.log_prediction({"company_name": "Alpha Ltd", "issue_price": 100, "predicted_price": 120})
+    prediction_log.log_prediction({"company_name": "Beta Ltd", "issue_price": 100, "predicted_price": 90})
+    prediction_log.update_actual_price("Beta Ltd", 95)
+
+    assert get_precomputed_sentiment("alpha  ltd") is None
+    assert get_precomputed_sentiment("Beta Ltd") is None
+    assert get_precomputed_sentiment("Not An IPO <script>") is None
+
+    assert requested == ["alpha  ltd"]
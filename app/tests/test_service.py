@@ -0,0 +1,65 @@
+import asyncio
+
+from starlette.applications import Starlette
+from starlette.responses import StreamingResponse
+from starlette.routing import Route
+
+import service
+from service import RouteLimiter, limited
+
+
+def request(app, path):
+    """Run one GET request through an ASGI app; returns the messages it sent"""
+    sent = []
+    requests = [{"type": "http.request", "body": b"", "more_body": False}]
+
+    async def receive():
+        if requests:
+            return requests.pop()
+        await asyncio.sleep(60)
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"", "headers": [],
+        "client": ("127.0.0.1", 1234), "server": ("127.0.0.1", 80)
+    }
+    return sent, app(scope, receive, send)
+
+
+def test_streamed_response_holds_its_route_slot_until_sent(monkeypatch):
+    limiter = RouteLimiter("export", 1, timeout=0.05)
+    monkeypatch.setitem(service.limiters, "export", limiter)
+
+    async def scenario():
+        finish = asyncio.Event()
+
+        @limited("export")
+        async def export(request):
+            async def lines():
+                yield b"first\n"
+                await finish.wait()
+                yield b"last\n"
+            return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+        app = Starlette(routes=[Route("/export", export)])
+        first, call = request(app, "/export")
+        streaming = asyncio.ensure_future(call)
+        while not any(m.get("body") == b"first\n" for m in first):
+            await asyncio.sleep(0.01)
+
+        # The first export is still streaming, so a second one is turned away
+        assert limiter.running == 1
+        second, call = request(app, "/export")
+        await call
+        assert second[0]["status"] == 429
+
+        finish.set()
+        await streaming
+        assert b"".join(m.get("body", b"") for m in first) == b"first\nlast\n"
+        assert limiter.running == 0
+
+    asyncio.run(scenario())
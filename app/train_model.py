@@ -0,0 +1,106 @@
+"""
+Train the listing-gain model from logged predictions with known listing prices.
+
+Usage (from the app directory):
+
+    python train_model.py [--output models/ipo_model.joblib] [--min-rows 20]
+"""
+import os
+import argparse
+import logging
+from datetime import datetime
+
+import numpy as np
+
+from ipo_logger import get_prediction_history
+from model_serving import MODEL_FILE, FEATURE_NAMES, prepare_features
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def load_training_rows():
+    """
+    Get logged predictions that have an actual listing price.
+
+    Returns:
+        list: Rows with usable issue and actual prices
+    """
+    rows = []
+    # Archived segments still hold listing outcomes worth learning from
+    for row in get_prediction_history(include_archived=True):
+        try:
+            if row.get('actual_price') is None or float(row['issue_price']) <= 0:
+                continue
+            prepare_features(row)
+        except (TypeError, ValueError, KeyError):
+            continue
+        rows.append(row)
+    return rows
+
+def train(rows, n_estimators=200, random_state=42):
+    """
+    Fit the scaler and model on logged rows.
+
+    Args:
+        rows (list): Rows from load_training_rows
+        n_estimators (int): Number of trees in the forest
+        random_state (int): Seed for reproducible fits
+
+    Returns:
+        dict: Artifact bundle with scaler, model and metadata
+    """
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.preprocessing import StandardScaler
+
+    features = prepare_features(rows)
+    issue_prices = features[:, 0]
+    actual_prices = np.array([float(row['actual_price']) for row in rows])
+
+    # Target is the listing gain, so the model generalises across price levels
+    target = actual_prices / issue_prices - 1
+
+    scaler = StandardScaler()
+    model = RandomForestRegressor(n_estimators=n_estimators, random_state=random_state, n_jobs=-1)
+    model.fit(scaler.fit_transform(features), target)
+    # Fit on every core, but predict single-threaded: serving workers score small
+    # batches, where a joblib pool per call costs more than it saves
+    model.n_jobs = 1
+
+    trained_at = datetime.now()
+    return {
+        'scaler': scaler,
+        'model': model,
+        'features': FEATURE_NAMES,
+        'version': trained_at.strftime("%Y%m%d%H%M%S"),
+        'trained_at': trained_at.isoformat(),
+        'n_samples': len(rows)
+    }
+
+def save(bundle, path):
+    """Save an artifact so that it can be memory-mapped (no compression)"""
+    import joblib
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    joblib.dump(bundle, tmp_path)
+    os.replace(tmp_path, path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the IPO listing-gain model")
+    parser.add_argument("--output", default=MODEL_FILE, help="Path of the model artifact")
+    parser.add_argument("--min-rows", type=int, default=20, help="Minimum labelled rows required to train")
+    parser.add_argument("--n-estimators", type=int, default=200, help="Number of trees in the forest")
+    args = parser.parse_args()
+
+    rows = load_training_rows()
+    if len(rows) < args.min_rows:
+        logger.error(f"Only {len(rows)} predictions have an actual price; need at least {args.min_rows}")
+        return 1
+
+    bundle = train(rows, n_estimators=args.n_estimators)
+    save(bundle, args.output)
+    logger.info(f"Trained model version {bundle['version']} on {bundle['n_samples']} rows, saved to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())